@@ -1,6 +1,6 @@
 import numpy as np
-from scipy.signal import butter, lfilter, welch, periodogram, spectrogram
-from scipy.interpolate import interp1d, griddata
+from scipy.signal import butter, lfilter, sosfilt, sosfiltfilt, welch, periodogram, spectrogram
+from scipy.interpolate import interp1d
 
 # x is assumed to be data (real numbers) arranged along the first dimension of an ndarray
 # this factory makes use of the numpy array properties
@@ -137,40 +137,113 @@ def filter_data(data, fs, lowcut=None, highcut=None, mode='bandpass', order=3):
     return y
 
 
+def _butterworth_sos(fs, mode, lowcut, highcut, order=3):
+    """
+    Build a digital Butterworth filter in second order sections, which are numerically stable at higher orders
+    """
+    nyq = 0.5 * fs
+    freqs = []
+    if lowcut is not None:
+        freqs.append(lowcut / nyq)  # normalize frequency
+    if highcut is not None:
+        freqs.append(highcut / nyq)  # normalize frequency
+    return butter(order, freqs, btype=mode, output="sos")
+
+
+def filtfilt_data(data, fs, lowcut=None, highcut=None, mode='bandpass', order=3, axis=0):
+    """
+    Zero phase Butterworth filter, in second order sections, of all signals of data at once along axis
+    """
+    return sosfiltfilt(_butterworth_sos(fs, mode, lowcut, highcut, order), data, axis=axis)
+
+
+class BlockFilter(object):
+    """
+    Causal filter of consecutive blocks of data arranged along the first dimension.
+    The filter state is kept across blocks, so that filtering the blocks one by one
+    is equivalent to filtering their concatenation at once, with zero initial conditions.
+    """
+
+    def __init__(self, fs, lowcut=None, highcut=None, mode='bandpass', order=3):
+        self.sos = _butterworth_sos(fs, mode, lowcut, highcut, order)
+        self.zi = None
+
+    def __call__(self, x):
+        if self.zi is None:
+            self.zi = np.zeros((self.sos.shape[0], 2) + x.shape[1:])
+        y, self.zi = sosfilt(self.sos, x, axis=0, zi=self.zi)
+        return y
+
+
+class BlockDecimator(object):
+    """
+    Decimation by an integer factor of consecutive blocks of data arranged along the first dimension,
+    with a causal anti-aliasing low pass filter, keeping every q-th point of the concatenation of the blocks.
+    The cut off frequency of the low pass filter is given as a fraction of the decimated Nyquist frequency.
+    """
+
+    def __init__(self, fs, q, order=8, cutoff=0.8):
+        self.q = int(q)
+        if self.q > 1:
+            self.filter = BlockFilter(fs, highcut=cutoff * fs / self.q / 2, mode="lowpass", order=order)
+        # Index of the first point to keep in the next block
+        self.offset = 0
+
+    def __call__(self, x):
+        if self.q == 1:
+            return x
+        y = self.filter(x)[self.offset::self.q]
+        self.offset = (self.offset - x.shape[0]) % self.q
+        return y
+
+
+def running_sum(x, n):
+    """
+    Sum of data arranged along the first dimension over a centered moving window of n points,
+    equal to np.convolve(x[:, i], np.ones((n,)), mode='same') for every column i of x, but in linear time
+    """
+    n_points = x.shape[0]
+    cumsum = np.concatenate([np.zeros((1,) + x.shape[1:]), np.cumsum(x, axis=0)])
+    points = np.arange(n_points)
+    last = np.minimum(points + (n - 1) // 2 + 1, n_points)
+    first = np.maximum(points + (n - 1) // 2 - n + 1, 0)
+    return cumsum[last] - cumsum[first]
+
+
+def _interp_freq(f, s, freq, axis=0, bounds_error=True):
+    # Separable linear interpolation of spectra s, computed at frequencies f, to frequencies freq, along axis
+    return interp1d(f, s, axis=axis, bounds_error=bounds_error, fill_value=np.nan)(freq)
+
+
 def spectral_analysis(x, fs, freq=None, method="periodogram", output="spectrum", nfft=None, window='hanning',
                       nperseg=256, detrend='constant', noverlap=None, f_low=10.0, log_scale=False):
     if freq is None:
         freq = np.linspace(f_low, nperseg, nperseg - f_low - 1)
-        df = freq[1] - freq[0]
-    psd = []
-    for iS in range(x.shape[1]):
-        if method is welch:
-            f, temp_psd = welch(x[:, iS],
-                           fs=fs,  # sample rate
-                           nfft=nfft,
-                           window=window,   # apply a Hanning window before taking the DFT
-                           nperseg=nperseg,        # compute periodograms of 256-long segments of x
-                           detrend=detrend,
-                           scaling="spectrum",
-                           noverlap=noverlap,
-                           return_onesided=True,
-                           axis=0)
-        else:
-            f, temp_psd = periodogram(x[:, iS],
-                                 fs=fs,  # sample rate
-                                 nfft=nfft,
-                                 window=window,  # apply a Hanning window before taking the DFT
-                                 detrend=detrend,
-                                 scaling="spectrum",
-                                 return_onesided=True,
-                                 axis=0)
-        f = interp1d(f, temp_psd)
-        temp_psd = f(freq)
-        if output == "density":
-            temp_psd /= (np.sum(temp_psd) * df)
-        psd.append(temp_psd)
-    # Stack them to a ndarray
-    psd = np.stack(psd, axis=1)
+    df = freq[1] - freq[0]
+    # All channels (columns of x) are analyzed at once
+    if method is welch or method == "welch":
+        f, psd = welch(x,
+                       fs=fs,  # sample rate
+                       nfft=nfft,
+                       window=window,   # apply a Hanning window before taking the DFT
+                       nperseg=nperseg,        # compute periodograms of 256-long segments of x
+                       detrend=detrend,
+                       scaling="spectrum",
+                       noverlap=noverlap,
+                       return_onesided=True,
+                       axis=0)
+    else:
+        f, psd = periodogram(x,
+                             fs=fs,  # sample rate
+                             nfft=nfft,
+                             window=window,  # apply a Hanning window before taking the DFT
+                             detrend=detrend,
+                             scaling="spectrum",
+                             return_onesided=True,
+                             axis=0)
+    psd = _interp_freq(f, psd, freq, axis=0)
+    if output == "density":
+        psd /= (np.sum(psd, axis=0) * df)
     if output == "energy":
         return np.sum(psd, axis=0)
     else:
@@ -180,20 +253,40 @@ def spectral_analysis(x, fs, freq=None, method="periodogram", output="spectrum",
 
 
 def time_spectral_analysis(x, fs, freq=None, mode="psd", nfft=None, window='hanning', nperseg=256, detrend='constant',
-                           noverlap=None, f_low=10.0, calculate_psd=True, log_scale=False):
+                           noverlap=None, f_low=10.0, calculate_psd=True, log_scale=False, chunk_len=None):
+    """
+    Spectrogram of all channels (columns) of x at once, resampled to frequencies freq
+    :param chunk_len: if given, maximum number of time points of x analyzed at once, for long recordings.
+                      Chunks overlap by noverlap points, so that the result is the same as without chunks.
+    :return: stf (times x freq x channels), t, freq[, psd (freq x channels)]
+    """
     # TODO: add a Continuous Wavelet Transform implementation
     if freq is None:
         freq = np.linspace(f_low, nperseg, nperseg - f_low - 1)
+    if noverlap is None:
+        noverlap = nperseg // 8
+    step = nperseg - noverlap
+    n_points = x.shape[0]
+    if chunk_len is None or chunk_len >= n_points:
+        chunk_segments = n_points
+    else:
+        # Each chunk is made of an integer number of whole segments
+        chunk_segments = max((int(chunk_len) - noverlap) // step, 1)
+    n_segments = max((n_points - noverlap) // step, 1)
     stf = []
-    for iS in range(x.shape[1]):
-        f, t, temp_s = spectrogram(x[:, iS], fs=fs, nperseg=nperseg, nfft=nfft, window=window, mode=mode,
-                                noverlap=noverlap, detrend=detrend, return_onesided=True, scaling='spectrum', axis=0)
-        t_mesh, f_mesh = np.meshgrid(t, f, indexing="ij")
-        temp_s = griddata((t_mesh.flatten(), f_mesh.flatten()), temp_s.T.flatten(),
-                          tuple(np.meshgrid(t, freq, indexing="ij")), method='linear')
-        stf.append(temp_s)
-    # Stack them to a ndarray
-    stf = np.stack(stf, axis=2)
+    t = []
+    for first_segment in range(0, n_segments, chunk_segments):
+        start = first_segment * step
+        stop = n_points if chunk_segments >= n_segments else \
+            min(start + (chunk_segments - 1) * step + nperseg, n_points)
+        f, temp_t, temp_s = spectrogram(x[start:stop], fs=fs, nperseg=nperseg, nfft=nfft, window=window, mode=mode,
+                                        noverlap=noverlap, detrend=detrend, return_onesided=True, scaling='spectrum',
+                                        axis=0)
+        # temp_s: frequencies x channels x times -> times x freq x channels
+        stf.append(np.transpose(_interp_freq(f, temp_s, freq, axis=0, bounds_error=False), (2, 0, 1)))
+        t.append(temp_t + start / float(fs))
+    stf = np.concatenate(stf, axis=0)
+    t = np.concatenate(t)
     if log_scale:
         stf = np.log(stf)
     if calculate_psd:
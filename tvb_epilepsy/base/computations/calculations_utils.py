@@ -8,25 +8,21 @@ from tvb_epilepsy.base.utils.log_error_utils import initialize_logger, raise_imp
 
 logger = initialize_logger(__name__)
 
-try:
-    from sympy import Matrix, lambdify, reshape
-    from tvb_epilepsy.base.computations.symbolic_utils import assert_arrays, symbol_eqtn_coupling, symbol_eqtn_x0, \
-    symbol_eqtn_fx1, symbol_eqtn_fy1, symbol_eqtn_fz, symbol_calc_fz_jac_square_taylor, symbol_calc_x0cr_r, \
-    symbol_calc_fx1y1_6d_diff_x1, symbol_calc_fx1z_2d_x1neg_zpos_jac, symbol_eqtn_fx1z_diff, symbol_eqtn_x0cr_r, \
-    symbol_eqtn_fx1z, symbol_calc_2d_taylor, symbol_calc_coupling_diff, symbol_eqtn_fx2, symbol_eqtn_fy2, \
-    symbol_eqtn_fg, symbol_eqtn_fx0, symbol_eqtn_fslope, symbol_eqtn_fIext1, symbol_eqtn_fK, symbol_eqnt_dfun, \
-    symbol_eqtn_fIext2, symbol_calc_jac, symbol_vars
-
-    SYMBOLIC_IMPORT = True
-
-except ImportError:
-    logger.exception("Could not load...")
-    logger.warning("Unable to load symbolic_equations module! Symbolic calculations are not possible!")
-    SYMBOLIC_IMPORT = False
+# sympy and the symbolic equations are imported only at the first symbolic calculation:
+SYMBOLIC_IMPORT = None
 
 
 def confirm_calc_mode(calc_mode):
+    global SYMBOLIC_IMPORT
     if np.all(calc_mode == "symbol"):
+        if SYMBOLIC_IMPORT is None:
+            try:
+                from tvb_epilepsy.base.computations import symbolic_utils
+                SYMBOLIC_IMPORT = True
+            except ImportError:
+                logger.exception("Could not load...")
+                logger.warning("Unable to load symbolic_equations module! Symbolic calculations are not possible!")
+                SYMBOLIC_IMPORT = False
         if SYMBOLIC_IMPORT:
             logger.info("Executing symbolic calculations...")
         else:
@@ -35,17 +31,28 @@ def confirm_calc_mode(calc_mode):
     return calc_mode
 
 
+def symbol_kernel(symbol_function_name, *args, **kwargs):
+    from tvb_epilepsy.base.computations import symbolic_utils
+    return symbolic_utils.symbol_kernel(getattr(symbolic_utils, symbol_function_name), *args, **kwargs)
+
+
+def symbol_vars(*args, **kwargs):
+    from tvb_epilepsy.base.computations.symbolic_utils import symbol_vars
+    return symbol_vars(*args, **kwargs)
+
+
 def calc_coupling(x1, K, w, ix=None, jx=None, shape=None, calc_mode="non_symbol"):
     calc_mode = confirm_calc_mode(calc_mode)
     x1, K = assert_arrays([x1, K], shape)
     n_regions = x1.size
-    w = assert_arrays([w], (x1.size, x1.size))
+    if not (issparse(w)):
+        w = assert_arrays([w], (x1.size, x1.size))
     if ix is None:
         ix = range(n_regions)
     if jx is None:
         jx = range(n_regions)
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_coupling(x1.size, ix, jx, shape=x1.shape)[0](x1, K, w))
+        return np.array(symbol_kernel("symbol_eqtn_coupling", x1.size, ix, jx, shape=x1.shape)(x1, K, w))
     else:
         return eqtn_coupling(x1, K, w, ix, jx)
 
@@ -55,7 +62,7 @@ def calc_x0(x1, z, K=0.0, w=0.0, zmode=np.array("lin"), z_pos=True, shape=None,
     x1, z, K = assert_arrays([x1, z, K], shape)
     w = assert_arrays([w], (z.size, z.size))
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_x0(z.size, zmode, z_pos, "K", z.shape)[0](x1, z, K, w))
+        return np.array(symbol_kernel("symbol_eqtn_x0", z.size, zmode, z_pos, "K", z.shape)(x1, z, K, w))
     else:
         if zmode == np.array("lin") and z_pos is None:
             z_pos = z > 0.0
@@ -68,12 +75,12 @@ def calc_fx1(x1=0.0, z=0.0, y1=0.0, Iext1=I_EXT1_DEF, slope=SLOPE_DEF, a=A_DEF,
     x1, z, y1, Iext1, slope, a, b, d, tau1 = assert_arrays([x1, z, y1, Iext1, slope, a, b, d, tau1], shape)
     if np.all(calc_mode == "symbol"):
         if np.all(model == "2d"):
-            return np.array(symbol_eqtn_fx1(x1.size, model, x1_neg, slope="slope", Iext1="Iext1", shape=x1.shape)[0]
-                            (x1, z, y1, Iext1, slope, a, b, d, tau1))
+            return np.array(symbol_kernel("symbol_eqtn_fx1", x1.size, model, x1_neg, slope="slope", Iext1="Iext1",
+                                          shape=x1.shape)(x1, z, y1, Iext1, slope, a, b, d, tau1))
         else:
             x2 = assert_arrays([x2], x1.shape)
-            return np.array(symbol_eqtn_fx1(x1.size, model, x1_neg, slope="slope", Iext1="Iext1", shape=x1.shape)[0]
-                            (x1, z, y1, x2, Iext1, slope, a, b, d, tau1))
+            return np.array(symbol_kernel("symbol_eqtn_fx1", x1.size, model, x1_neg, slope="slope", Iext1="Iext1",
+                                          shape=x1.shape)(x1, z, y1, x2, Iext1, slope, a, b, d, tau1))
     else:
         if x1_neg is None:
             x1_neg = x1 < 0.0
@@ -88,7 +95,7 @@ def calc_fy1(x1, yc, y1=0, d=D_DEF, tau1=TAU1_DEF, shape=None, calc_mode="non_sy
     calc_mode = confirm_calc_mode(calc_mode)
     x1, yc, y1, d, tau1 = assert_arrays([x1, yc, y1, d, tau1], shape)
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_fy1(x1.size, x1.shape)[0](x1, y1, yc, d, tau1))
+        return np.array(symbol_kernel("symbol_eqtn_fy1", x1.size, x1.shape)(x1, y1, yc, d, tau1))
     else:
         return eqtn_fy1(x1, yc, y1, d, tau1)
 
@@ -99,9 +106,8 @@ def calc_fz(x1=0.0, z=0, x0=0.0, K=0.0, w=0.0, tau1=TAU1_DEF, tau0=TAU0_DEF, zmo
     x1, z, x0, K, tau1, tau0 = assert_arrays([x1, z, x0, K, tau1, tau0], shape)
     w = assert_arrays([w], (z.size, z.size))
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_fz(z.size, zmode, z_pos, x0="x0_values", K="K", shape=z.shape)[0](x1, z, x0,
-                                                                                                      K, w, tau1,
-                                                                                                      tau0))
+        return np.array(symbol_kernel("symbol_eqtn_fz", z.size, zmode, z_pos, x0="x0_values", K="K",
+                                      shape=z.shape)(x1, z, x0, K, w, tau1, tau0))
     else:
         if zmode == np.array("lin") and z_pos is None:
             z_pos = z > 0.0
@@ -112,7 +118,8 @@ def calc_fx2(x2, y2=0.0, z=0.0, g=0.0, Iext2=I_EXT2_DEF, tau1=TAU1_DEF, shape=No
     calc_mode = confirm_calc_mode(calc_mode)
     x2, y2, z, g, Iext2, tau1 = assert_arrays([x2, y2, z, g, Iext2, tau1], shape)
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_fx2(x2.size, Iext2="Iext2", shape=x2.shape)[0](x2, y2, z, g, Iext2, tau1))
+        return np.array(symbol_kernel("symbol_eqtn_fx2", x2.size, Iext2="Iext2", shape=x2.shape)(x2, y2, z, g, Iext2,
+                                                                                               tau1))
     else:
         return eqtn_fx2(x2, y2, z, g, Iext2, tau1)
 
@@ -128,7 +135,7 @@ def calc_fy2(x2, y2=0.0, s=S_DEF, tau1=TAU1_DEF, tau2=TAU2_DEF, x2_neg=None, sha
             logger.warning("\nx2_neg is None and failed to compare x2_neg = x2 < -0.25!" +
                            "\nSetting default x2_neg = False")
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_fy2(x2.size, x2_neg=x2_neg, shape=x2.shape)[0](x2, y2, s, tau1, tau2))
+        return np.array(symbol_kernel("symbol_eqtn_fy2", x2.size, x2_neg=x2_neg, shape=x2.shape)(x2, y2, s, tau1, tau2))
     else:
         return eqtn_fy2(x2, y2, s, tau1, tau2, x2_neg)
 
@@ -137,7 +144,7 @@ def calc_fg(x1, g=0.0, gamma=GAMMA_DEF, tau1=TAU1_DEF, shape=None, calc_mode="no
     calc_mode = confirm_calc_mode(calc_mode)
     x1, g, gamma, tau1 = assert_arrays([x1, g, gamma, tau1], shape)
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_fg(x1.size, x1.shape)[0](x1, g, gamma, tau1))
+        return np.array(symbol_kernel("symbol_eqtn_fg", x1.size, x1.shape)(x1, g, gamma, tau1))
     else:
         return eqtn_fg(x1, g, gamma, tau1)
 
@@ -146,7 +153,7 @@ def calc_fx0(x0_var, x0, tau1=TAU1_DEF, shape=None, calc_mode="non_symbol"):
     calc_mode = confirm_calc_mode(calc_mode)
     x0_var, x0, tau1 = assert_arrays([x0_var, x0, tau1], shape)
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_fx0(x0.size, shape)[0](x0_var, x0, tau1))
+        return np.array(symbol_kernel("symbol_eqtn_fx0", x0.size, shape)(x0_var, x0, tau1))
     else:
         return eqtn_fx0(x0_var, x0, tau1)
 
@@ -158,16 +165,16 @@ def calc_fslope(slope_var, slope, z=0.0, g=0.0, tau1=TAU1_DEF, pmode=np.array("c
     if np.all(calc_mode == "symbol"):
         if pmode == "z":
             z = assert_arrays([z], slope.shape)
-            return np.array(symbol_eqtn_fslope(slope.size, pmode, shape)[0](slope_var, z, tau1))
+            return np.array(symbol_kernel("symbol_eqtn_fslope", slope.size, pmode, shape)(slope_var, z, tau1))
         elif pmode == "g":
             g = assert_arrays([g], slope.shape)
-            return np.array(symbol_eqtn_fslope(slope.size, pmode, shape)[0](slope_var, g, tau1))
+            return np.array(symbol_kernel("symbol_eqtn_fslope", slope.size, pmode, shape)(slope_var, g, tau1))
         elif pmode == "z*g":
             z = assert_arrays([z], slope.shape)
             g = assert_arrays([g], slope.shape)
-            return np.array(symbol_eqtn_fslope(slope.size, pmode, shape)[0](slope_var, z, g, tau1))
+            return np.array(symbol_kernel("symbol_eqtn_fslope", slope.size, pmode, shape)(slope_var, z, g, tau1))
         else:
-            return np.array(symbol_eqtn_fslope(slope.size, pmode, shape)[0](slope_var, slope, tau1))
+            return np.array(symbol_kernel("symbol_eqtn_fslope", slope.size, pmode, shape)(slope_var, slope, tau1))
     else:
         if pmode == "z" or pmode == "g" or pmode == "z*g":
             z, g = assert_arrays([z, g], slope.shape)
@@ -180,7 +187,7 @@ def calc_fIext1(Iext1_var, Iext1, tau1=TAU1_DEF, tau0=TAU0_DEF, shape=None, calc
     calc_mode = confirm_calc_mode(calc_mode)
     Iext1_var, Iext1, tau1, tau0 = assert_arrays([Iext1_var, Iext1, tau1, tau0], shape)
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_fIext1(Iext1.size, shape)[0](Iext1_var, Iext1, tau1, tau0))
+        return np.array(symbol_kernel("symbol_eqtn_fIext1", Iext1.size, shape)(Iext1_var, Iext1, tau1, tau0))
     else:
         return eqtn_fIext1(Iext1_var, Iext1, tau1, tau0)
 
@@ -192,16 +199,16 @@ def calc_fIext2(Iext2_var, Iext2, z=0.0, g=0.0, tau1=TAU1_DEF, pmode=np.array("c
     if np.all(calc_mode == "symbol"):
         if pmode == "z":
             z = assert_arrays([z], Iext2.shape)
-            return np.array(symbol_eqtn_fIext2(Iext2.size, pmode, shape)[0](Iext2_var, z, tau1))
+            return np.array(symbol_kernel("symbol_eqtn_fIext2", Iext2.size, pmode, shape)(Iext2_var, z, tau1))
         elif pmode == "g":
             g = assert_arrays([g], Iext2.shape)
-            return np.array(symbol_eqtn_fIext2(Iext2.size, pmode, shape)[0](Iext2_var, g, tau1))
+            return np.array(symbol_kernel("symbol_eqtn_fIext2", Iext2.size, pmode, shape)(Iext2_var, g, tau1))
         elif pmode == "z*g":
             z = assert_arrays([z], Iext2.shape)
             g = assert_arrays([g], Iext2.shape)
-            return np.array(symbol_eqtn_fIext2(Iext2.size, pmode, shape)[0](Iext2_var, z, g, tau1))
+            return np.array(symbol_kernel("symbol_eqtn_fIext2", Iext2.size, pmode, shape)(Iext2_var, z, g, tau1))
         else:
-            return np.array(symbol_eqtn_fIext2(Iext2.size, pmode, shape)[0](Iext2_var, Iext2, tau1))
+            return np.array(symbol_kernel("symbol_eqtn_fIext2", Iext2.size, pmode, shape)(Iext2_var, Iext2, tau1))
     else:
         if pmode == "z" or pmode == "g" or pmode == "z*g":
             z, g = assert_arrays([z, g], Iext2.shape)
@@ -214,7 +221,7 @@ def calc_fK(K_var, K, tau1=TAU1_DEF, tau0=TAU0_DEF, shape=None, calc_mode="non_s
     calc_mode = confirm_calc_mode(calc_mode)
     K_var, K, tau1, tau0 = assert_arrays([K_var, K, tau1, tau0], shape)
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_fK(K.size, shape)[0](K_var, K, tau1, tau0))
+        return np.array(symbol_kernel("symbol_eqtn_fK", K.size, shape)(K_var, K, tau1, tau0))
     else:
         return eqtn_fK(K_var, K, tau1, tau0)
 
@@ -240,7 +247,8 @@ def calc_dfun(x1, z, yc, Iext1, x0, K, w, model_vars=2,
                                slope, a, b, d, s, Iext2, gamma, tau1, tau0, tau2)
     else:
         if np.all(calc_mode == "symbol"):
-            dfun_sym = symbol_eqnt_dfun(x1.size, model_vars, zmode, x1_neg, z_pos, x2_neg, pmode, shape)[0]
+            dfun_sym = symbol_kernel("symbol_eqnt_dfun", x1.size, model_vars, zmode, x1_neg, z_pos, x2_neg, pmode,
+                                     shape)
             x1, z, yc, Iext1, x0, K, slope, a, b, tau1, tau0 = \
                 assert_arrays([x1, z, yc, Iext1, x0, K, slope, a, b, tau1, tau0], shape)
             w = assert_arrays([w], (z.size, z.size))
@@ -340,7 +348,7 @@ def calc_jac(x1, z, yc, Iext1, x0, K, w, model_vars=2,
         n = model_vars * n_regions
         jac = np.zeros((n, n), dtype=z.dtype)
         ind = lambda x: x * n_regions + np.array(range(n_regions))
-        jac_lambda, jac_sym = symbol_calc_jac(n_regions, model_vars, zmode, x1_neg, z_pos, x2_neg, pmode)[:2]
+        jac_lambda = symbol_kernel("symbol_calc_jac", n_regions, model_vars, zmode, x1_neg, z_pos, x2_neg, pmode)
         y1, x2, y2, g, Iext2, s, gamma, tau2 = \
             assert_arrays([y1, x2, y2, g, Iext2, s, gamma, tau2], z.shape)
         if model_vars == 6:
@@ -396,6 +404,7 @@ def calc_jac(x1, z, yc, Iext1, x0, K, w, model_vars=2,
             return np.concatenate([eqtn_jac_x1_2d(x1, z, slope, a, b, d, tau1, x1_neg),
                                    eqtn_jac_fz_2d(x1, z, tau1, tau0, zmode, z_pos, K, w)])
         else:
+            from sympy import Matrix, lambdify
             if model_vars == 6:
                 sx1, sy1, sz, sx2, sy2, sg = symbol_vars(n_regions, ['x1', 'y1', 'z', 'x2', 'y2', 'g'])[:6]
                 dfun_sym = calc_dfun_array(sx1, sz, yc, Iext1, x0, K, w, model_vars,
@@ -428,13 +437,14 @@ def calc_coupling_diff(K, w, ix=None, jx=None, calc_mode="non_symbol"):
     calc_mode = confirm_calc_mode(calc_mode)
     K = assert_arrays([K])
     n_regions = K.size
-    w = assert_arrays([w], (K.size, K.size))
+    if not (issparse(w)):
+        w = assert_arrays([w], (K.size, K.size))
     if ix is None:
         ix = range(n_regions)
     if jx is None:
         jx = range(n_regions)
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_calc_coupling_diff(K.size, ix, jx, K="K")[0](K, w))
+        return np.array(symbol_kernel("symbol_calc_coupling_diff", K.size, ix, jx, K="K")(K, w))
     else:
         return eqtn_coupling_diff(K, w, ix, jx)
 
@@ -445,8 +455,8 @@ def calc_fx1_2d_taylor(x1, x_taylor, z=0, y1=0.0, Iext1=I_EXT1_DEF, slope=SLOPE_
     x1, x_taylor, z, y1, Iext1, slope, a, b, d, tau1 = \
         assert_arrays([x1, x_taylor, z, y1, Iext1, slope, a, b, d, tau1], shape)
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_calc_2d_taylor(x1.size, order=order, x1_neg=x1_neg, slope="slope", Iext1="Iext1",
-                                              shape=shape)[0](x1, x_taylor, z, y1, Iext1, slope, a, b, d, tau1))
+        return np.array(symbol_kernel("symbol_calc_2d_taylor", x1.size, order=order, x1_neg=x1_neg, slope="slope",
+                                      Iext1="Iext1", shape=shape)(x1, x_taylor, z, y1, Iext1, slope, a, b, d, tau1))
     else:
         if x1_neg is None:
             x1_neg = x1 < 0.0
@@ -468,7 +478,7 @@ def calc_fx1_2d_taylor(x1, x_taylor, z=0, y1=0.0, Iext1=I_EXT1_DEF, slope=SLOPE_
             for ix in range(x1.size):
                 fx1lin[ix] = series(fx1lin[ix], x=x, x0=x_taylor, n=order).removeO().simplify(). \
                     subs(x, x1.flatten()[ix])
-            fx1lin = reshape(fx1lin, shape).astype(x1.dtype)
+            fx1lin = np.reshape(fx1lin, shape).astype(x1.dtype)
         return fx1lin
 
 
@@ -481,11 +491,11 @@ def calc_fx1z(x1, x0, K, w, yc, Iext1, a=A_DEF, b=B_DEF, d=D_DEF, tau1=TAU1_DEF,
     w = assert_arrays([w], (x1.size, x1.size))
     if np.all(calc_mode == "symbol"):
         if model == "2d":
-            return np.array(symbol_eqtn_fx1z(x1.size, model, zmode, x1.shape)[0](x1, x0, K, w, yc, Iext1, a, b,
-                                                                                 d, tau1, tau0))
+            return np.array(symbol_kernel("symbol_eqtn_fx1z", x1.size, model, zmode, x1.shape)(x1, x0, K, w, yc, Iext1,
+                                                                                              a, b, d, tau1, tau0))
         else:
-            return np.array(symbol_eqtn_fx1z(x1.size, model, zmode, x1.shape)[0](x1, x0, K, w, yc, Iext1, a, b, d, tau1,
-                                                                                 tau0))
+            return np.array(symbol_kernel("symbol_eqtn_fx1z", x1.size, model, zmode, x1.shape)(x1, x0, K, w, yc, Iext1,
+                                                                                              a, b, d, tau1, tau0))
     else:
         # TODO: for the extreme z_pos = False case where we have terms like 0.1 * z ** 7
         if np.all(model == "2d"):
@@ -504,7 +514,7 @@ def calc_fx1z_diff(x1, K, w, a=A_DEF, b=B_DEF, d=D_DEF, tau1=TAU1_DEF, tau0=TAU0
     x1, K, a, b, d, tau1, tau0 = assert_arrays([x1, K, a, b, d, tau1, tau0])
     w = assert_arrays([w], (x1.size, x1.size))
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_eqtn_fx1z_diff(x1.size, model, zmode)[0](x1, K, w, a, b, d, tau1, tau0))
+        return np.array(symbol_kernel("symbol_eqtn_fx1z_diff", x1.size, model, zmode)(x1, K, w, a, b, d, tau1, tau0))
     else:
         # TODO: for the extreme z_pos = False case where we have terms like 0.1 * z ** 7
         ix = range(x1.size)
@@ -518,8 +528,9 @@ def calc_fx1z_2d_x1neg_zpos_jac(x1, z, x0, yc, Iext1, K, w, ix0, iE, a=A_DEF, b=
         x1, z, x0, yc, Iext1, K, a, b, d, tau1, tau0 = \
             assert_arrays([x1, z, x0, yc, Iext1, K, a, b, d, tau1, tau0])
         w = assert_arrays([w], (x1.size, x1.size))
-        return np.array(symbol_calc_fx1z_2d_x1neg_zpos_jac(x1.size, ix0, iE)[0](x1, z, x0, yc, Iext1, K, w, a, b, d,
-                                                                                tau1, tau0))
+        return np.array(symbol_kernel("symbol_calc_fx1z_2d_x1neg_zpos_jac", x1.size, ix0, iE)(x1, z, x0, yc, Iext1,
+                                                                                             K, w, a, b, d, tau1,
+                                                                                             tau0))
     else:
         if x1.shape != (1, x1.size):
             x1 = np.expand_dims(x1.flatten(), 1).T
@@ -553,7 +564,7 @@ def calc_fx1y1_6d_diff_x1(x1, yc, Iext1, a=A_DEF, b=B_DEF, d=D_DEF, tau1=TAU1_DE
     calc_mode = confirm_calc_mode(calc_mode)
     x1, yc, Iext1, a, b, d, tau1 = assert_arrays([x1, yc, Iext1, a, b, d, tau1], shape)
     if np.all(calc_mode == "symbol"):
-        return np.array(symbol_calc_fx1y1_6d_diff_x1(x1.size, shape)[0](x1, yc, Iext1, a, b, d, tau1))
+        return np.array(symbol_kernel("symbol_calc_fx1y1_6d_diff_x1", x1.size, shape)(x1, yc, Iext1, a, b, d, tau1))
     else:
         # Correspondance with EpileptorDP2D
         b = b - d
@@ -568,9 +579,9 @@ def calc_x0cr_r(yc, Iext1, a=A_DEF, b=B_DEF, d=D_DEF, zmode=np.array("lin"), x1_
         = assert_arrays([yc, Iext1, a, b, d, x1_rest, x1_cr, x0def, x0cr_def], shape)
     if np.all(calc_mode == "symbol"):
         if test:
-            x0cr, r = symbol_calc_x0cr_r(Iext1.size, zmode, Iext1.shape)[0]
+            x0cr, r = symbol_kernel("symbol_calc_x0cr_r", Iext1.size, zmode, Iext1.shape)
         else:
-            x0cr, r = symbol_eqtn_x0cr_r(Iext1.size, zmode, Iext1.shape)[0]
+            x0cr, r = symbol_kernel("symbol_eqtn_x0cr_r", Iext1.size, zmode, Iext1.shape)
         # Calculate x0cr from the lambda function
         x0cr = np.array(x0cr(yc, Iext1, a, b, d, x1_rest, x1_cr, x0def, x0cr_def))
         # r is already given as independent of yc and Iext1
@@ -624,8 +635,8 @@ def calc_x0cr_r(yc, Iext1, a=A_DEF, b=B_DEF, d=D_DEF, zmode=np.array("lin"), x1_
                 x0cr = np.tile(x0cr[0], shape)
                 r = np.tile(r[0], shape)
             else:
-                x0cr = reshape(x0cr, shape)
-                r = reshape(r, shape)
+                x0cr = np.reshape(x0cr, shape)
+                r = np.reshape(r, shape)
         else:
             x0cr, r = eqtn_x0cr_r(yc, Iext1, a, b, d, x1_rest, x1_cr, x0def, x0cr_def, zmode=zmode)
     return x0cr, r
@@ -638,11 +649,29 @@ def calc_fz_jac_square_taylor(zeq, yc, Iext1, K, w, a=A_DEF, b=B_DEF, d=D_DEF, t
         assert_arrays([zeq, yc, Iext1, K, a, b, d, tau1, tau0, x_taylor], (1, zeq.size))
     w = assert_arrays([w], (zeq.size, zeq.size))
     if np.all(calc_mode == "symbol"):
-        return symbol_calc_fz_jac_square_taylor(zeq.size)[0](zeq, yc, Iext1, K, w, a, b, d, tau1, tau0, x_taylor)
+        return symbol_kernel("symbol_calc_fz_jac_square_taylor", zeq.size)(zeq, yc, Iext1, K, w, a, b, d, tau1, tau0,
+                                                                         x_taylor)
     else:
         return eqtn_fz_square_taylor(zeq, yc, Iext1, K, w, tau1, tau0)
 
 
+def calc_fz_jac_square_taylor_batch(zeq, yc, Iext1, K, w, tau1=TAU1_DEF, tau0=TAU0_DEF):
+    # Numerical only computation of the Jacobians of a stack of (n_samples, n_regions) zeq configurations.
+    # Parameters are broadcasted to zeq's shape and w can be a single (n_regions, n_regions) connectivity,
+    # or a stack (n_samples, n_regions, n_regions) of them
+    zeq = np.array(zeq, dtype="float64")
+    if zeq.ndim == 1:
+        zeq = zeq[np.newaxis]
+    # Parameters keep their own precision, e.g., float32 K and w, as in calc_fz_jac_square_taylor()
+    yc, Iext1, K, tau1, tau0 = [np.array(param) * np.ones(zeq.shape, dtype=np.array(param).dtype)
+                                for param in [yc, Iext1, K, tau1, tau0]]
+    w = np.array(w)
+    if w.shape[-2:] != (zeq.shape[1], zeq.shape[1]) or w.ndim not in [2, 3]:
+        raise_value_error("Connectivity of shape " + str(w.shape) + " does not match zeq of shape " + str(zeq.shape)
+                          + "!")
+    return eqtn_fz_square_taylor_batch(zeq, yc, Iext1, K, w, tau1, tau0)
+
+
 def calc_fpop2(x2, y2=0.0, z=0.0, g=0.0, Iext2=I_EXT2_DEF, s=S_DEF, tau1=TAU1_DEF, tau2=1.0, x2_neg=None, shape=None,
                calc_mode="non_symbol"):
     return calc_fx2(x2, y2, z, g, Iext2, tau1, shape, calc_mode), \
@@ -695,6 +724,224 @@ def calc_dfun_array(x1, z, yc, Iext1, x0, K, w, model_vars=2,
     return f
 
 
+class PreparedModelParameters(object):
+    """
+    The parameters of the Epileptor equations of calc_dfun_array() and calc_jac(), validated and broadcast only once
+    to arrays of shape (n_regions, ), for repeated numerical evaluations of calc_dfun_prepared() and calc_jac_prepared()
+    at different states.
+    """
+
+    params_names = ["yc", "Iext1", "x0", "K", "slope", "a", "b", "d", "s", "Iext2", "gamma", "tau1", "tau0", "tau2"]
+
+    def __init__(self, n_regions, yc, Iext1, x0, K, w, model_vars=2, zmode="lin", pmode="const",
+                 slope=SLOPE_DEF, a=A_DEF, b=B_DEF, d=D_DEF, s=S_DEF, Iext2=I_EXT2_DEF, gamma=GAMMA_DEF,
+                 tau1=TAU1_DEF, tau0=TAU0_DEF, tau2=TAU2_DEF):
+        if model_vars not in [2, 6, 11]:
+            raise_value_error("model_vars = " + str(model_vars) + " is not one of 2, 6 or 11!")
+        self.zmode = str(np.array(zmode))
+        if self.zmode not in ["lin", "sig"]:
+            raise_value_error('zmode is neither "lin" nor "sig"')
+        self.pmode = str(np.array(pmode))
+        if self.pmode not in ["const", "g", "z", "z*g"]:
+            raise_value_error('pmode is neither "const", nor "g", "z" or "z*g"')
+        self.n_regions = n_regions
+        self.model_vars = model_vars
+        for p_name, param in zip(self.params_names, [yc, Iext1, x0, K, slope, a, b, d, s, Iext2, gamma,
+                                                     tau1, tau0, tau2]):
+            param = np.array(param, dtype="float64").flatten()
+            if param.size == 1:
+                param = param[0] * np.ones((n_regions,))
+            elif param.size != n_regions:
+                raise_value_error("Parameter " + p_name + " of size " + str(param.size) +
+                                  " is neither of size 1, nor of n_regions = " + str(n_regions) + "!")
+            setattr(self, p_name, param)
+        if issparse(w):
+            w = w.toarray()
+        self.w = np.array(w, dtype="float64")
+        if self.w.shape != (n_regions, n_regions):
+            raise_value_error("Connectivity of shape " + str(self.w.shape) + " is not of shape (n_regions, n_regions)"
+                              + " = " + str((n_regions, n_regions)) + "!")
+        self.w_sum = np.sum(self.w, axis=1)
+        self.tau = self.tau1 / self.tau0
+        self.diag_inds = np.arange(n_regions)
+
+
+def prepare_model_parameters(n_regions, yc, Iext1, x0, K, w, model_vars=2, zmode="lin", pmode="const",
+                             slope=SLOPE_DEF, a=A_DEF, b=B_DEF, d=D_DEF, s=S_DEF, Iext2=I_EXT2_DEF, gamma=GAMMA_DEF,
+                             tau1=TAU1_DEF, tau0=TAU0_DEF, tau2=TAU2_DEF):
+    return PreparedModelParameters(n_regions, yc, Iext1, x0, K, w, model_vars, zmode, pmode,
+                                   slope, a, b, d, s, Iext2, gamma, tau1, tau0, tau2)
+
+
+def _prepared_state(params, state):
+    # Unpack the state of shape (model_vars, n_regions) together with the parameters it replaces in the 11d model:
+    # x1, y1, z, x2, y2, g, x0, slope, Iext1, Iext2, K
+    if params.model_vars == 2:
+        x1, z = state
+        return x1, params.yc, z, None, None, None, params.x0, params.slope, params.Iext1, None, params.K
+    elif params.model_vars == 6:
+        x1, y1, z, x2, y2, g = state
+        return x1, y1, z, x2, y2, g, params.x0, params.slope, params.Iext1, params.Iext2, params.K
+    else:
+        return tuple(state)
+
+
+def _prepared_slope_Iext2_eq(params, z, g):
+    # slope and Iext2 following the z, g, z*g dynamics of EpileptorDPrealistic.fun_slope_Iext2(),
+    # as well as the derivatives of their common scaling variable xp with respect to z and g
+    if params.pmode == "g":
+        xp = 1.0 / (1.0 + np.exp(-10.0 * g))
+        xp1, xp2 = 0.0, 1.0
+        dxp_dz, dxp_dg = 0.0, 10.0 * xp * (1.0 - xp)
+    elif params.pmode == "z":
+        xp = 1.0 / (1.0 + np.exp(-10.0 * (z - 3.0)))
+        xp1, xp2 = 0.0, 1.0
+        dxp_dz, dxp_dg = 10.0 * xp * (1.0 - xp), 0.0
+    elif params.pmode == "z*g":
+        xp = z * g
+        xp1, xp2 = -0.7, 0.1
+        dxp_dz, dxp_dg = g, z
+    else:
+        return params.slope, params.Iext2, 0.0, 0.0, 0.0, 0.0
+    dslope_dxp = (1.0 - params.slope) / (xp1 - xp2)
+    dIext2_dxp = - params.Iext2 / (xp1 - xp2)
+    return params.slope + (xp - xp2) * dslope_dxp, params.Iext2 + (xp - xp2) * dIext2_dxp, \
+           dslope_dxp, dIext2_dxp, dxp_dz, dxp_dg
+
+
+def calc_dfun_prepared(params, state, out=None, x1_neg=None, z_pos=None, x2_neg=None):
+    """
+    Numerical calc_dfun_array() for already prepared parameters, without any validation of its inputs.
+    :param params: PreparedModelParameters
+    :param state: array of shape (model_vars, n_regions) of the state variables x1, z for 2 variables,
+                  x1, y1, z, x2, y2, g for 6, and additionally x0_var, slope_var, Iext1_var, Iext2_var, K_var for 11
+    :param out: optional array of shape (model_vars, n_regions) to write the result into
+    :return: the (model_vars, n_regions) array of the derivatives of the state variables
+    """
+    if out is None:
+        out = np.empty((params.model_vars, params.n_regions), dtype=state.dtype)
+    p = params
+    x1, y1, z, x2, y2, g, x0, slope, Iext1, Iext2, K = _prepared_state(params, state)
+    if x1_neg is None:
+        x1_neg = x1 < 0.0
+    if p.model_vars == 2:
+        # Correspondence with EpileptorDP2D
+        fx1_else = slope - p.d * x1 + 0.6 * (z - 4.0) ** 2
+        fx1_if = -p.a * x1 ** 2 + (p.b - p.d) * x1
+    else:
+        fx1_else = slope - x2 + 0.6 * (z - 4.0) ** 2
+        fx1_if = -p.a * x1 ** 2 + p.b * x1
+    out[0] = p.tau1 * (y1 - z + Iext1 + x1 * np.where(x1_neg, fx1_if, fx1_else))
+    iz = 1 if p.model_vars == 2 else 2
+    coupling = K * (np.dot(p.w, x1) - p.w_sum * x1)
+    if p.zmode == "lin":
+        if z_pos is None:
+            z_pos = z > 0.0
+        out[iz] = p.tau * (4.0 * (x1 - x0) - np.where(z_pos, z, z + 0.1 * z ** 7) - coupling)
+    else:
+        out[iz] = p.tau * (3.0 / (1.0 + np.exp(-10.0 * (x1 + 0.5))) - x0 - z - coupling)
+    if p.model_vars > 2:
+        if x2_neg is None:
+            x2_neg = x2 < -0.25
+        out[1] = p.tau1 * (p.yc - p.d * x1 ** 2 - y1)
+        out[3] = p.tau1 * (-y2 + x2 - x2 ** 3 + Iext2 + 2.0 * g - 0.3 * (z - 3.5))
+        out[4] = p.tau1 * (-y2 + np.where(x2_neg, 0.0, p.s * (x2 + 0.25))) / p.tau2
+        out[5] = p.tau1 * (-g + p.gamma * x1)
+    if p.model_vars == 11:
+        slope_eq, Iext2_eq = _prepared_slope_Iext2_eq(params, z, g)[:2]
+        out[6] = p.tau1 * (-x0 + p.x0)
+        out[7] = 10.0 * p.tau1 * (-slope + slope_eq)
+        out[8] = p.tau1 * (-Iext1 + p.Iext1) / p.tau0
+        out[9] = 5.0 * p.tau1 * (-Iext2 + Iext2_eq)
+        out[10] = p.tau1 * (-K + p.K) / p.tau0
+    return out
+
+
+def calc_jac_prepared(params, state, out=None, x1_neg=None, z_pos=None, x2_neg=None):
+    """
+    Numerical jacobian of calc_dfun_prepared(), for already prepared parameters, without any validation of its inputs.
+    :param params: PreparedModelParameters
+    :param state: array of shape (model_vars, n_regions) of the state variables, as for calc_dfun_prepared()
+    :param out: optional array of shape (model_vars * n_regions, model_vars * n_regions) to write the result into
+    :return: the jacobian, with the derivatives of each state variable of each region in the order of state.flatten()
+    """
+    n = params.n_regions
+    if out is None:
+        out = np.empty((params.model_vars * n, params.model_vars * n), dtype=state.dtype)
+    out[:] = 0.0
+    p = params
+    x1, y1, z, x2, y2, g, x0, slope, Iext1, Iext2, K = _prepared_state(params, state)
+    diag = p.diag_inds
+
+    def set_diag(ivar, jvar, values):
+        out[ivar * n + diag, jvar * n + diag] = values
+
+    if x1_neg is None:
+        x1_neg = x1 < 0.0
+    ix1, iy1, iz, ix2, iy2, ig, ix0, islope, iIext1, iIext2, iK = range(11)
+    if p.model_vars == 2:
+        iz = 1
+        # Correspondence with EpileptorDP2D
+        set_diag(ix1, ix1, p.tau1 * np.where(x1_neg, -3.0 * p.a * x1 ** 2 + 2.0 * (p.b - p.d) * x1,
+                                             slope - 2.0 * p.d * x1 + 0.6 * (z - 4.0) ** 2))
+    else:
+        set_diag(ix1, ix1, p.tau1 * np.where(x1_neg, -3.0 * p.a * x1 ** 2 + 2.0 * p.b * x1,
+                                             slope - x2 + 0.6 * (z - 4.0) ** 2))
+        set_diag(ix1, iy1, p.tau1)
+        set_diag(ix1, ix2, p.tau1 * np.where(x1_neg, 0.0, -x1))
+    set_diag(ix1, iz, p.tau1 * (-1.0 + np.where(x1_neg, 0.0, 1.2 * (z - 4.0) * x1)))
+    # fz, including the difference coupling: K_i * sum_j(wij * (x1_j - x1_i))
+    out[iz * n:(iz + 1) * n, :n] = - (p.tau * K)[:, np.newaxis] * p.w
+    if p.zmode == "lin":
+        if z_pos is None:
+            z_pos = z > 0.0
+        dfz_dx1 = 4.0
+        dfz_dx0 = -4.0
+        set_diag(iz, iz, - p.tau * (1.0 + np.where(z_pos, 0.0, 0.7 * z ** 6)))
+    else:
+        exp_x1 = np.exp(-10.0 * (x1 + 0.5))
+        dfz_dx1 = 30.0 * exp_x1 / (1.0 + exp_x1) ** 2
+        dfz_dx0 = -1.0
+        set_diag(iz, iz, - p.tau)
+    out[iz * n + diag, diag] += p.tau * (dfz_dx1 + K * p.w_sum)
+    if p.model_vars > 2:
+        if x2_neg is None:
+            x2_neg = x2 < -0.25
+        # fy1
+        set_diag(iy1, ix1, -2.0 * p.tau1 * p.d * x1)
+        set_diag(iy1, iy1, -p.tau1)
+        # fx2
+        set_diag(ix2, ix2, p.tau1 * (1.0 - 3.0 * x2 ** 2))
+        set_diag(ix2, iy2, -p.tau1)
+        set_diag(ix2, iz, -0.3 * p.tau1)
+        set_diag(ix2, ig, 2.0 * p.tau1)
+        # fy2
+        set_diag(iy2, ix2, np.where(x2_neg, 0.0, p.s) * p.tau1 / p.tau2)
+        set_diag(iy2, iy2, -p.tau1 / p.tau2)
+        # fg
+        set_diag(ig, ix1, p.tau1 * p.gamma)
+        set_diag(ig, ig, -p.tau1)
+    if p.model_vars == 11:
+        # Derivatives with respect to the parameters' variables...
+        set_diag(ix1, islope, p.tau1 * np.where(x1_neg, 0.0, x1))
+        set_diag(ix1, iIext1, p.tau1)
+        set_diag(iz, ix0, dfz_dx0 * p.tau)
+        set_diag(iz, iK, - p.tau * (np.dot(p.w, x1) - p.w_sum * x1))
+        set_diag(ix2, iIext2, p.tau1)
+        # ...and of the parameters' variables' equations
+        dslope_dxp, dIext2_dxp, dxp_dz, dxp_dg = _prepared_slope_Iext2_eq(params, z, g)[2:]
+        set_diag(ix0, ix0, -p.tau1)
+        set_diag(islope, islope, -10.0 * p.tau1)
+        set_diag(islope, iz, 10.0 * p.tau1 * dslope_dxp * dxp_dz)
+        set_diag(islope, ig, 10.0 * p.tau1 * dslope_dxp * dxp_dg)
+        set_diag(iIext1, iIext1, -p.tau1 / p.tau0)
+        set_diag(iIext2, iIext2, -5.0 * p.tau1)
+        set_diag(iIext2, iz, 5.0 * p.tau1 * dIext2_dxp * dxp_dz)
+        set_diag(iIext2, ig, 5.0 * p.tau1 * dIext2_dxp * dxp_dg)
+        set_diag(iK, iK, -p.tau1 / p.tau0)
+    return out
+
+
 def calc_x0_val_to_model_x0(x0_values, yc, Iext1, a=A_DEF, b=B_DEF, d=D_DEF, zmode=np.array("lin"), shape=None,
                             calc_mode="non_symbol"):
     hyp_x0, yc, Iext1, a, b, d = \
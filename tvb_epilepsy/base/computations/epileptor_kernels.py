@@ -0,0 +1,323 @@
+"""
+Fused, compiled (numba) kernels of the dfun of the EpileptorDP, EpileptorDPrealistic and EpileptorDP2D models.
+Each kernel computes all derivatives of a (nvar, n_regions, n_modes) state in a single pass,
+without any temporary arrays, writing into a preallocated output,
+which the models reuse across calls, as long as the caller doesn't hold on to the previous result.
+If numba is not installed, or the backend is set to "numpy", the models fall back to their NumPy dfun.
+"""
+
+import sys
+import time
+import weakref
+import numpy
+from tvb_epilepsy.base.constants.config import CalculusConfig
+from tvb_epilepsy.base.utils.log_error_utils import initialize_logger, raise_value_error
+
+logger = initialize_logger(__name__)
+
+try:
+    from numba import njit
+    NUMBA_IMPORT = True
+except ImportError:
+    NUMBA_IMPORT = False
+
+DFUN_BACKENDS = ["numba", "numpy"]
+
+ZMODES = {"lin": 0, "sig": 1}
+PMODES = {"const": 0, "g": 1, "z": 2, "z*g": 3}
+
+# The parameters of each model, as last prepared for the kernels:
+_prepared_parameters = weakref.WeakKeyDictionary()
+# The output buffer of the dfun of each model:
+_dfun_buffers = weakref.WeakKeyDictionary()
+
+
+if NUMBA_IMPORT:
+
+    @njit
+    def _p(param, i, j):
+        # Parameters are of shape (1 or n_regions, 1 or n_modes)
+        if param.shape[0] == 1:
+            i = 0
+        if param.shape[1] == 1:
+            j = 0
+        return param[i, j]
+
+    @njit
+    def _dfun_epileptor_dp(y, c, ydot, local_coupling, zmode, x0, Iext1, Iext2, slope, yc, a, b, d, s, gamma,
+                           Kvf, Kf, K, tau1, tau0, tau2):
+        for i in range(y.shape[1]):
+            for j in range(y.shape[2]):
+                x1 = y[0, i, j]
+                y1 = y[1, i, j]
+                z = y[2, i, j]
+                x2 = y[3, i, j]
+                y2 = y[4, i, j]
+                g = y[5, i, j]
+                c_pop1 = c[0, i, j]
+                c_pop2 = c[1, i, j]
+                t1 = _p(tau1, i, j)
+                # population 1
+                if x1 < 0.0:
+                    f1 = -_p(a, i, j) * x1 * x1 + _p(b, i, j) * x1
+                else:
+                    f1 = _p(slope, i, j) - x2 + 0.6 * (z - 4.0) * (z - 4.0)
+                ydot[0, i, j] = t1 * (y1 - z + _p(Iext1, i, j) + local_coupling * x1 + _p(Kvf, i, j) * c_pop1 +
+                                      f1 * x1)
+                ydot[1, i, j] = t1 * (_p(yc, i, j) - _p(d, i, j) * x1 * x1 - y1)
+                # energy
+                if zmode == 0:
+                    fz = 4.0 * (x1 - _p(x0, i, j))
+                    if z < 0.0:
+                        fz -= 0.1 * z ** 7
+                else:
+                    fz = 3.0 / (1.0 + numpy.exp(-10.0 * (x1 + 0.5))) - _p(x0, i, j)
+                ydot[2, i, j] = t1 * ((fz - z + _p(K, i, j) * c_pop1) / _p(tau0, i, j))
+                # population 2
+                ydot[3, i, j] = t1 * (-y2 + x2 - x2 ** 3 + _p(Iext2, i, j) + 2.0 * g - 0.3 * (z - 3.5) +
+                                      _p(Kf, i, j) * c_pop2)
+                if x2 < -0.25:
+                    f2 = 0.0
+                else:
+                    f2 = _p(s, i, j) * (x2 + 0.25)
+                ydot[4, i, j] = t1 * ((-y2 + f2) / _p(tau2, i, j))
+                # filter
+                ydot[5, i, j] = t1 * (-0.01 * (g - _p(gamma, i, j) * x1))
+        return ydot
+
+    @njit
+    def _dfun_epileptor_dp_realistic(y, c, ydot, local_coupling, zmode, pmode, x0, Iext1, Iext2, slope, yc, a, b, d,
+                                     s, gamma, Kvf, Kf, K, tau1, tau0, tau2):
+        for i in range(y.shape[1]):
+            for j in range(y.shape[2]):
+                x1 = y[0, i, j]
+                y1 = y[1, i, j]
+                z = y[2, i, j]
+                x2 = y[3, i, j]
+                y2 = y[4, i, j]
+                g = y[5, i, j]
+                c_pop1 = c[0, i, j]
+                c_pop2 = c[1, i, j]
+                t1 = _p(tau1, i, j)
+                t0 = _p(tau0, i, j)
+                # population 1
+                if x1 < 0.0:
+                    f1 = -_p(a, i, j) * x1 * x1 + _p(b, i, j) * x1
+                else:
+                    f1 = y[7, i, j] - x2 + 0.6 * (z - 4.0) * (z - 4.0)
+                ydot[0, i, j] = t1 * (y1 - z + _p(Iext1, i, j) + local_coupling * x1 + _p(Kvf, i, j) * c_pop1 +
+                                      f1 * x1)
+                ydot[1, i, j] = t1 * (_p(yc, i, j) - _p(d, i, j) * x1 * x1 - y1)
+                # energy
+                if zmode == 0:
+                    fz = 4.0 * (x1 - y[6, i, j])
+                    if z < 0.0:
+                        fz -= 0.1 * z ** 7
+                else:
+                    fz = 3.0 / (1.0 + numpy.exp(-10.0 * (x1 + 0.5))) - y[6, i, j]
+                ydot[2, i, j] = t1 * ((fz - z + y[10, i, j] * c_pop1) / t0)
+                # population 2
+                ydot[3, i, j] = t1 * (-y2 + x2 - x2 ** 3 + y[9, i, j] + 2.0 * g - 0.3 * (z - 3.5) +
+                                      _p(Kf, i, j) * c_pop2)
+                if x2 < -0.25:
+                    f2 = 0.0
+                else:
+                    f2 = _p(s, i, j) * (x2 + 0.25)
+                ydot[4, i, j] = t1 * ((-y2 + f2) / _p(tau2, i, j))
+                # filter
+                ydot[5, i, j] = t1 * (-0.01 * (g - _p(gamma, i, j) * x1))
+                # slope and Iext2 following the g, z, z*g dynamics (see EpileptorDPrealistic.fun_slope_Iext2)
+                slope_eq = _p(slope, i, j)
+                Iext2_eq = _p(Iext2, i, j)
+                if pmode > 0:
+                    if pmode == 1:
+                        xp = 1.0 / (1.0 + numpy.exp(-10.0 * g))
+                        xp1 = 0.0
+                        xp2 = 1.0
+                    elif pmode == 2:
+                        xp = 1.0 / (1.0 + numpy.exp(-10.0 * (z - 3.0)))
+                        xp1 = 0.0
+                        xp2 = 1.0
+                    else:
+                        xp = z * g
+                        xp1 = -0.7
+                        xp2 = 0.1
+                    slope_eq = slope_eq + (xp - xp2) * (1.0 - slope_eq) / (xp1 - xp2)
+                    Iext2_eq = Iext2_eq - (xp - xp2) * Iext2_eq / (xp1 - xp2)
+                ydot[6, i, j] = t1 * (-y[6, i, j] + _p(x0, i, j))
+                ydot[7, i, j] = 10.0 * t1 * (-y[7, i, j] + slope_eq)
+                ydot[8, i, j] = t1 * (-y[8, i, j] + _p(Iext1, i, j)) / t0
+                ydot[9, i, j] = 5.0 * t1 * (-y[9, i, j] + Iext2_eq)
+                ydot[10, i, j] = t1 * (-y[10, i, j] + _p(K, i, j)) / t0
+        return ydot
+
+    @njit
+    def _dfun_epileptor_dp2d(y, c, ydot, local_coupling, zmode, x0, Iext1, slope, yc, a, b, d, Kvf, K, tau1, tau0):
+        for i in range(y.shape[1]):
+            for j in range(y.shape[2]):
+                x1 = y[0, i, j]
+                z = y[1, i, j]
+                c_pop1 = c[0, i, j]
+                t1 = _p(tau1, i, j)
+                # population 1
+                if x1 < 0.0:
+                    f1 = _p(a, i, j) * x1 * x1 + (_p(d, i, j) - _p(b, i, j)) * x1
+                else:
+                    f1 = _p(d, i, j) * x1 - 0.6 * (z - 4.0) * (z - 4.0) - _p(slope, i, j)
+                ydot[0, i, j] = t1 * (_p(yc, i, j) - z + _p(Iext1, i, j) + local_coupling * x1 +
+                                      _p(Kvf, i, j) * c_pop1 - f1 * x1)
+                # energy
+                if zmode == 0:
+                    fz = 4.0 * (x1 - _p(x0, i, j))
+                    if z < 0.0:
+                        fz -= 0.1 * z ** 7
+                else:
+                    fz = 3.0 / (1.0 + numpy.exp(-10.0 * (x1 + 0.5))) - _p(x0, i, j)
+                ydot[1, i, j] = t1 * (fz - z + _p(K, i, j) * c_pop1) / _p(tau0, i, j)
+        return ydot
+
+
+def _kernel_parameter(param, shape):
+    # Reshape a model parameter to (1 or n_regions, 1 or n_modes), or return None if it doesn't fit to the state
+    param = numpy.array(param, dtype="float64", copy=False)
+    if param.ndim < 2:
+        param = param.reshape((param.size, 1))
+    if param.ndim != 2 or param.shape[0] not in (1, shape[0]) or param.shape[1] not in (1, shape[1]):
+        return None
+    return param
+
+
+def _kernel_parameters(model, params_names, shape):
+    params = [getattr(model, p_name) for p_name in params_names]
+    cached = _prepared_parameters.get(model, None)
+    if cached is not None and cached[0] == shape and all([p is c for p, c in zip(params, cached[1])]):
+        return cached[2]
+    kernel_params = []
+    cacheable = True
+    for param in params:
+        kernel_param = _kernel_parameter(param, shape)
+        if kernel_param is None:
+            return None
+        # Only views of the model's parameters follow any in place changes of them
+        cacheable = cacheable and numpy.may_share_memory(kernel_param, param)
+        kernel_params.append(kernel_param)
+    if cacheable:
+        _prepared_parameters[model] = (shape, params, kernel_params)
+    return kernel_params
+
+
+def _kernel_mode(mode, modes):
+    mode = numpy.array(mode)
+    if mode.size != 1:
+        return None
+    return modes.get(str(mode.flatten()[0]), None)
+
+
+def dfun_buffer(model, state_variables):
+    """
+    Returns the output buffer of the dfun of a model, for a state of the shape of state_variables.
+    The same buffer is returned across calls, unless the result of the previous call is still referenced,
+    e.g., by an integrator that combines the derivatives of several stages (Heun, Runge-Kutta),
+    in which case a new buffer is allocated and replaces it.
+    """
+    shape = numpy.shape(state_variables)
+    buffer = _dfun_buffers.get(model, None)
+    # The references to an unused buffer are the ones of _dfun_buffers, of buffer and of getrefcount's argument
+    if buffer is None or buffer.shape != shape or sys.getrefcount(buffer) > 3:
+        buffer = numpy.empty(shape)
+        _dfun_buffers[model] = buffer
+    return buffer
+
+
+def compiled_dfun(model, state_variables, coupling, local_coupling=0.0, backend=None, out=None):
+    """
+    Computes the dfun of an EpileptorDP, EpileptorDPrealistic or EpileptorDP2D model with its fused numba kernel.
+    :param backend: "numba" or "numpy" (default: CalculusConfig.DFUN_BACKEND)
+    :param out: optional float64 array of the shape of state_variables, to write the derivatives into
+    :return: the derivatives of the state variables, or None if the NumPy dfun of the model has to be used instead,
+             i.e., for the "numpy" backend, if numba is not available, or for inputs not supported by the kernels
+             (e.g., local coupling arrays or parameters that don't fit to the state's shape)
+    """
+    if backend is None:
+        backend = CalculusConfig.DFUN_BACKEND
+    if backend != "numba" or not NUMBA_IMPORT or numpy.ndim(local_coupling) > 0:
+        return None
+    model_name = model._ui_name
+    if model_name == "EpileptorDP2D":
+        params_names = ["x0", "Iext1", "slope", "yc", "a", "b", "d", "Kvf", "K", "tau1", "tau0"]
+    elif model_name in ["EpileptorDP", "EpileptorDPrealistic"]:
+        params_names = ["x0", "Iext1", "Iext2", "slope", "yc", "a", "b", "d", "s", "gamma", "Kvf", "Kf", "K",
+                        "tau1", "tau0", "tau2"]
+    else:
+        return None
+    zmode = _kernel_mode(model.zmode, ZMODES)
+    if zmode is None:
+        return None
+    state = numpy.array(state_variables, dtype="float64", copy=False)
+    coupling = numpy.array(coupling, dtype="float64", copy=False)
+    if state.ndim == 2:
+        state = state[:, :, numpy.newaxis]
+    if coupling.ndim == 2:
+        coupling = coupling[:, :, numpy.newaxis]
+    if state.ndim != 3 or state.shape[0] != model._nvar or coupling.shape != (len(model.cvar), ) + state.shape[1:]:
+        return None
+    params = _kernel_parameters(model, params_names, state.shape[1:])
+    if params is None:
+        return None
+    if out is None:
+        ydot = numpy.empty_like(state)
+    else:
+        if not isinstance(out, numpy.ndarray) or out.shape != numpy.shape(state_variables) or \
+                out.dtype != numpy.float64:
+            raise_value_error("Output of shape " + str(numpy.shape(out)) + " and dtype " +
+                              str(getattr(out, "dtype", None)) + " is not a float64 array of the state's shape " +
+                              str(numpy.shape(state_variables)) + "!", logger)
+        ydot = out
+        if ydot.ndim == 2:
+            ydot = ydot[:, :, numpy.newaxis]
+    if model_name == "EpileptorDP2D":
+        _dfun_epileptor_dp2d(state, coupling, ydot, float(local_coupling), zmode, *params)
+    elif model_name == "EpileptorDP":
+        _dfun_epileptor_dp(state, coupling, ydot, float(local_coupling), zmode, *params)
+    else:
+        pmode = _kernel_mode(model.pmode, PMODES)
+        if pmode is None:
+            return None
+        _dfun_epileptor_dp_realistic(state, coupling, ydot, float(local_coupling), zmode, pmode, *params)
+    if out is not None:
+        return out
+    return ydot.reshape(numpy.shape(state_variables))
+
+
+def benchmark_dfun(model, n_regions=76, n_modes=1, n_evaluations=1000, backends=DFUN_BACKENDS):
+    """
+    Micro-benchmark of the dfun of a model, for a random state of shape (nvar, n_regions, n_modes).
+    :return: dictionary of the mean execution time (secs) of one dfun evaluation per backend,
+             and the maximum absolute difference of each backend's result from the first one
+    """
+    random_state = numpy.random.RandomState(0)
+    state = numpy.empty((model._nvar, n_regions, n_modes))
+    for iv, sv in enumerate(model.state_variables):
+        lo, hi = model.state_variable_range[sv]
+        state[iv] = lo + (hi - lo) * random_state.rand(n_regions, n_modes)
+    coupling = random_state.randn(len(model.cvar), n_regions, n_modes)
+    results = {}
+    ydot_ref = None
+    backend_config = CalculusConfig.DFUN_BACKEND
+    try:
+        for backend in backends:
+            CalculusConfig.DFUN_BACKEND = backend
+            # Warm up, i.e., compile, before timing:
+            ydot = model.dfun(state, coupling)
+            if ydot_ref is None:
+                ydot_ref = ydot
+            start = time.time()
+            for _ in range(n_evaluations):
+                model.dfun(state, coupling)
+            results[backend] = {"time": (time.time() - start) / n_evaluations,
+                                "max_abs_diff": numpy.max(numpy.abs(ydot - ydot_ref))}
+            logger.info("\n" + model._ui_name + " dfun with the " + backend + " backend: " +
+                        str(results[backend]["time"]) + " secs per evaluation")
+    finally:
+        CalculusConfig.DFUN_BACKEND = backend_config
+    return results
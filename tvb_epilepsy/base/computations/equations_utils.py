@@ -1,4 +1,5 @@
 
+from scipy.sparse import issparse
 from tvb_epilepsy.base.constants.model_constants import *
 from tvb_epilepsy.base.utils.data_structures_utils import assert_arrays
 from tvb_epilepsy.base.utils.log_error_utils import raise_value_error
@@ -19,16 +20,46 @@ def else_ydot0_2d(x1, z, slope, d):
     return slope - d * x1 + 0.6 * np.power(z - 4.0, 2)
 
 
+def _is_symbolic(*arrays):
+    # Symbolic calculations (sympy) run through object dtype arrays
+    for array in arrays:
+        if getattr(array, "dtype", None) == "object":
+            return True
+    return False
+
+
+def _coupling_nonzero_weights(w, ix, jx):
+    # Row, column (relative to ix, jx) and value of the nonzero connections from (jx) to (ix),
+    # for dense or scipy.sparse w
+    if issparse(w):
+        w = w.tocsr()[ix][:, jx].tocoo()
+        return w.row, w.col, w.data
+    w = np.array(w)[np.ix_(ix, jx)]
+    rows, cols = np.nonzero(w)
+    return rows, cols, w[rows, cols]
+
+
 def eqtn_coupling(x1, K, w, ix, jx):
     # Only difference coupling for the moment.
     # TODO: Extend for different coupling forms
     shape = x1.shape
-    x1, K = assert_arrays([x1, K], (1, x1.size))
-    i_n = np.ones((len(ix), 1), dtype='float32')
-    j_n = np.ones((len(jx), 1), dtype='float32')
-    # Coupling                 from (jx)                to (ix)
-    coupling = np.multiply(K[:, ix],
-                           np.sum(np.multiply(w[ix][:, jx], np.dot(i_n, x1[:, jx]) - np.dot(j_n, x1[:, ix]).T), axis=1))
+    if _is_symbolic(x1, K, w):
+        x1, K = assert_arrays([x1, K], (1, x1.size))
+        i_n = np.ones((len(ix), 1), dtype='float32')
+        j_n = np.ones((len(jx), 1), dtype='float32')
+        # Coupling                 from (jx)                to (ix)
+        coupling = np.multiply(K[:, ix],
+                               np.sum(np.multiply(w[ix][:, jx], np.dot(i_n, x1[:, jx]) - np.dot(j_n, x1[:, ix]).T),
+                                      axis=1))
+        return np.reshape(coupling, shape)
+    x1 = np.reshape(x1, (x1.size,))
+    K = np.reshape(K, (K.size,))
+    ix = np.array(ix, dtype="i").flatten()
+    jx = np.array(jx, dtype="i").flatten()
+    # Only the nonzero connections contribute:
+    # coupling_i = K_i * sum_j(wij * (x1_j - x1_i)), from (jx) to (ix)
+    rows, cols, weights = _coupling_nonzero_weights(w, ix, jx)
+    coupling = K[ix] * np.bincount(rows, weights=weights * (x1[jx][cols] - x1[ix][rows]), minlength=ix.size)
     return np.reshape(coupling, shape)
 
 
@@ -36,18 +67,26 @@ def eqtn_coupling_diff(K, w, ix, jx):
     # Only difference coupling for the moment.
     # TODO: Extend for different coupling forms
     K = np.reshape(K, (K.size,))
-    if K.dtype == "object" or w.dtype == "object":
-        dtype = "object"
-    else:
-        dtype = K.dtype
-    dcoupl_dx1 = np.empty((len(ix), len(jx)), dtype=dtype)
-    for ii in ix:
-        for ij in jx:
-
-            if ii == ij:
-                dcoupl_dx1[ii, ij] = -np.multiply(K[ii], np.sum(w[ii, jx]))
-            else:
-                dcoupl_dx1[ii, ij] = np.multiply(K[ii], w[ii, ij])
+    if _is_symbolic(K, w):
+        dcoupl_dx1 = np.empty((len(ix), len(jx)), dtype="object")
+        for ii in ix:
+            for ij in jx:
+
+                if ii == ij:
+                    dcoupl_dx1[ii, ij] = -np.multiply(K[ii], np.sum(w[ii, jx]))
+                else:
+                    dcoupl_dx1[ii, ij] = np.multiply(K[ii], w[ii, ij])
+        return dcoupl_dx1
+    ix = np.array(ix, dtype="i").flatten()
+    jx = np.array(jx, dtype="i").flatten()
+    # Off diagonal elements: K_i * wij, only for the nonzero connections...
+    rows, cols, weights = _coupling_nonzero_weights(w, ix, jx)
+    dcoupl_dx1 = np.zeros((ix.size, jx.size), dtype=K.dtype)
+    dcoupl_dx1[rows, cols] = K[ix][rows] * weights
+    # ...and diagonal elements: -K_i * sum_j(wij)
+    diag_rows, diag_cols = np.nonzero(ix[:, np.newaxis] == jx[np.newaxis, :])
+    w_sum = np.bincount(rows, weights=weights, minlength=ix.size)
+    dcoupl_dx1[diag_rows, diag_cols] = -K[ix][diag_rows] * w_sum[diag_rows]
     return dcoupl_dx1
 
 
@@ -148,13 +187,21 @@ def eqtn_fx1z_diff(x1, K, w, ix, jx, a, b, d, tau1, tau0, zmode=np.array("lin"))
     else:
         raise_value_error('zmode is neither "lin" nor "sig"')
     dfx1_3_dx1 = 3 * np.multiply(np.power(x1[ix], 2.0), a[ix]) + 2 * np.multiply(x1[ix], d[ix] - b[ix])
-    fx1z_diff = np.empty_like(dcoupl_dx, dtype=dcoupl_dx.dtype)
-    for xi in ix:
-        for xj in jx:
-            if xj == xi:
-                fx1z_diff[xi, xj] = np.multiply(dfx1_3_dx1[xi] + dfx1_1_dx1[xi] - dcoupl_dx[xi, xj], tau[xi])
-            else:
-                fx1z_diff[xi, xj] = np.multiply(- dcoupl_dx[xi, xj], tau[xi])
+    if _is_symbolic(dcoupl_dx):
+        fx1z_diff = np.empty_like(dcoupl_dx, dtype=dcoupl_dx.dtype)
+        for xi in ix:
+            for xj in jx:
+                if xj == xi:
+                    fx1z_diff[xi, xj] = np.multiply(dfx1_3_dx1[xi] + dfx1_1_dx1[xi] - dcoupl_dx[xi, xj], tau[xi])
+                else:
+                    fx1z_diff[xi, xj] = np.multiply(- dcoupl_dx[xi, xj], tau[xi])
+        return fx1z_diff
+    ix = np.array(ix, dtype="i")
+    jx = np.array(jx, dtype="i")
+    fx1z_diff = - dcoupl_dx
+    diag_rows, diag_cols = np.nonzero(ix[:, np.newaxis] == jx[np.newaxis, :])
+    fx1z_diff[diag_rows, diag_cols] += dfx1_3_dx1[diag_rows] + dfx1_1_dx1[diag_rows]
+    fx1z_diff *= np.reshape(tau[ix], (ix.size, 1))
     return fx1z_diff
 
 
@@ -340,3 +387,20 @@ def eqtn_fz_square_taylor(zeq, yc, Iext1, K, w, tau1, tau0):
     except:
         pass
     return np.multiply(fz_jac, tau)
+
+
+def eqtn_fz_square_taylor_batch(zeq, yc, Iext1, K, w, tau1, tau0):
+    # Same as eqtn_fz_square_taylor() but for a stack of n_samples configurations at once:
+    # zeq, yc, Iext1, K, tau1, tau0 are of shape (n_samples, n_regions),
+    # w is either of shape (n_regions, n_regions), or (n_samples, n_regions, n_regions)
+    n_regions = zeq.shape[-1]
+    tau = np.divide(tau1, tau0)
+    # The z derivative of the function
+    # x1 = F(z) = -4/3 -1/2*sqrt(2(z-yc-Iext1)+64/27)
+    dfz = -np.divide(0.5, np.power(2.0 * (zeq - yc - Iext1) + 64.0 / 27.0, 0.5))
+    # Off diagonal elements: -K_i * wij_not_i * dfz_j_not_i
+    fz_jac = -np.multiply(np.multiply(K[:, :, np.newaxis], dfz[:, np.newaxis, :]), w)
+    # Diagonal elements: -1 + dfz_i * (4 + K_i * sum_j_not_i{wij})
+    diag_inds = np.arange(n_regions)
+    fz_jac[:, diag_inds, diag_inds] += -1.0 + np.multiply(dfz, 4.0 + np.multiply(K, np.sum(w, axis=-1)))
+    return np.multiply(fz_jac, tau[:, :, np.newaxis])
@@ -340,62 +340,49 @@ def eq_x1_hypo_x0_linTaylor(ix0, iE, x1EQ, zEQ, x0, K, w, yc, Iext1, a=A_DEF, b=
 
 
 def assert_equilibrium_point(epileptor_model, weights, equilibrium_point):
-    n_dim = equilibrium_point.shape[0]
+    n_dim, n_regions = equilibrium_point.shape[:2]
     if epileptor_model._ui_name == "EpileptorDP2D":
         # We use the opposite sign for K with respect to all epileptor models
         K = -epileptor_model.K
-        dfun2 = calc_dfun(equilibrium_point[0].flatten(), equilibrium_point[1].flatten(),
-                          epileptor_model.yc.flatten(), epileptor_model.Iext1.flatten(), epileptor_model.x0.flatten(),
-                          K.flatten(), weights, model_vars=n_dim, zmode=epileptor_model.zmode,
-                          slope=epileptor_model.slope.flatten(), a=epileptor_model.a.flatten(),
-                          b=epileptor_model.b.flatten(), d=epileptor_model.d.flatten(),
-                          tau1=epileptor_model.tau1, tau0=epileptor_model.tau0, output_mode="array")
+        params = prepare_model_parameters(n_regions, epileptor_model.yc, epileptor_model.Iext1, epileptor_model.x0,
+                                          K, weights, model_vars=n_dim, zmode=epileptor_model.zmode,
+                                          slope=epileptor_model.slope, a=epileptor_model.a, b=epileptor_model.b,
+                                          d=epileptor_model.d, tau1=epileptor_model.tau1, tau0=epileptor_model.tau0)
     elif epileptor_model._ui_name == "EpileptorDP":
         # We use the opposite sign for K with respect to all epileptor models
         K = -epileptor_model.K
         #dfun_max_cr[2] = 10 ** -3
-        dfun2 = calc_dfun(equilibrium_point[0].flatten(), equilibrium_point[2].flatten(),
-                          epileptor_model.yc.flatten(), epileptor_model.Iext1.flatten(), epileptor_model.x0.flatten(),
-                          K.flatten(), weights, model_vars=n_dim, zmode=epileptor_model.zmode,
-                          y1=equilibrium_point[1].flatten(), x2=equilibrium_point[3].flatten(),
-                          y2=equilibrium_point[4].flatten(), g=equilibrium_point[5].flatten(),
-                          slope=epileptor_model.slope.flatten(), a=epileptor_model.a.flatten(),
-                          b=epileptor_model.b.flatten(), d=epileptor_model.d.flatten(), s=epileptor_model.s.flatten(),
-                          Iext2=epileptor_model.Iext2.flatten(), gamma=epileptor_model.gamma.flatten(),
-                          tau1=epileptor_model.tau1, tau0=epileptor_model.tau0, tau2=epileptor_model.tau2,
-                          output_mode="array")
+        params = prepare_model_parameters(n_regions, epileptor_model.yc, epileptor_model.Iext1, epileptor_model.x0,
+                                          K, weights, model_vars=n_dim, zmode=epileptor_model.zmode,
+                                          slope=epileptor_model.slope, a=epileptor_model.a, b=epileptor_model.b,
+                                          d=epileptor_model.d, s=epileptor_model.s, Iext2=epileptor_model.Iext2,
+                                          gamma=epileptor_model.gamma, tau1=epileptor_model.tau1,
+                                          tau0=epileptor_model.tau0, tau2=epileptor_model.tau2)
     elif epileptor_model._ui_name == "EpileptorDPrealistic":
         # We use the opposite sign for K with respect to all epileptor models
         K = -epileptor_model.K
         #dfun_max_cr[2] = 10 ** -3
-        dfun2 = calc_dfun(equilibrium_point[0].flatten(), equilibrium_point[2].flatten(),
-                          epileptor_model.yc.flatten(), epileptor_model.Iext1.flatten(), epileptor_model.x0.flatten(),
-                          K.flatten(), weights, model_vars=n_dim,
-                          zmode=epileptor_model.zmode, pmode=epileptor_model.pmode,
-                          y1=equilibrium_point[1].flatten(), x2=equilibrium_point[3].flatten(),
-                          y2=equilibrium_point[4].flatten(), g=equilibrium_point[5].flatten(),
-                          x0_var=equilibrium_point[6].flatten(), slope_var=equilibrium_point[7].flatten(),
-                          Iext1_var=equilibrium_point[8].flatten(), Iext2_var=equilibrium_point[9].flatten(),
-                          K_var=equilibrium_point[10].flatten(),
-                          slope=epileptor_model.slope.flatten(), a=epileptor_model.a.flatten(),
-                          b=epileptor_model.b.flatten(), d=epileptor_model.d.flatten(), s=epileptor_model.s.flatten(),
-                          Iext2=epileptor_model.Iext2.flatten(), gamma=epileptor_model.gamma.flatten(),
-                          tau1=epileptor_model.tau1, tau0=epileptor_model.tau0, tau2=epileptor_model.tau2,
-                          output_mode="array")
+        params = prepare_model_parameters(n_regions, epileptor_model.yc, epileptor_model.Iext1, epileptor_model.x0,
+                                          K, weights, model_vars=n_dim, zmode=epileptor_model.zmode,
+                                          pmode=epileptor_model.pmode, slope=epileptor_model.slope,
+                                          a=epileptor_model.a, b=epileptor_model.b, d=epileptor_model.d,
+                                          s=epileptor_model.s, Iext2=epileptor_model.Iext2,
+                                          gamma=epileptor_model.gamma, tau1=epileptor_model.tau1,
+                                          tau0=epileptor_model.tau0, tau2=epileptor_model.tau2)
     else:
         # all 6D models (tvb, java)
         # dfun_max_cr[2] = 10 ** -3
         # We use the opposite sign for K with respect to all epileptor models
         K = -epileptor_model.Ks
-        dfun2 = calc_dfun(equilibrium_point[0].flatten(), equilibrium_point[2].flatten(),
-                          epileptor_model.c, epileptor_model.Iext, epileptor_model.x0,
-                          K, weights, model_vars=n_dim,
-                          y1=equilibrium_point[1].flatten(), x2=equilibrium_point[3].flatten(),
-                          y2=equilibrium_point[4].flatten(), g=equilibrium_point[5].flatten(),
-                          slope=epileptor_model.slope, a=epileptor_model.a, b=epileptor_model.b,
-                          d=epileptor_model.d, s=epileptor_model.aa, Iext2=epileptor_model.Iext2,
-                          tau1=epileptor_model.tt, tau0=1.0 / epileptor_model.r, tau2=epileptor_model.tau,
-                          output_mode="array")
+        params = prepare_model_parameters(n_regions, epileptor_model.c, epileptor_model.Iext, epileptor_model.x0,
+                                          K, weights, model_vars=n_dim, slope=epileptor_model.slope,
+                                          a=epileptor_model.a, b=epileptor_model.b, d=epileptor_model.d,
+                                          s=epileptor_model.aa, Iext2=epileptor_model.Iext2,
+                                          tau1=epileptor_model.tt, tau0=1.0 / epileptor_model.r,
+                                          tau2=epileptor_model.tau)
+    # As for calc_dfun(), the equilibria are expected at x1 < 0 and z > 0
+    dfun2 = calc_dfun_prepared(params, numpy.array(equilibrium_point, dtype="float64").reshape((n_dim, n_regions)),
+                               x1_neg=True, z_pos=True)
     if hasattr(epileptor_model, 'dfun'):
         # We use the opposite sign for K with respect to all epileptor models
         coupl = calc_coupling(equilibrium_point[0], -K, weights)
@@ -481,3 +468,140 @@ def calc_equilibrium_point(epileptor_model, model_configuration, weights):
         #TODO: Implement dfun for the Java simulator
         raise_not_implemented_error("The dfun for Java simulator is not implemented yet!")
     return equilibrium_point
+
+
+class EquilibriumSolver(object):
+    """
+    Solver of the x1 equilibria, to be reused across a sequence of nearby parameter sets (e.g., PSE samples).
+    It warm starts each solution from the previous one of the same problem structure,
+    caches the coupling structure of the connectivity w,
+    and, optionally, continues along the linear path from the previous to the current parameters,
+    in continuation_steps steps.
+    The number of function evaluations of each solve is appended to n_function_evaluations.
+    """
+
+    def __init__(self, warm_start=True, continuation_steps=1, tol=10 ** (-12)):
+        self.warm_start = warm_start
+        self.continuation_steps = int(max(1, continuation_steps))
+        self.tol = tol
+        self.n_function_evaluations = []
+        self._w = None
+        self._w_structure = {}
+        self._previous = {}
+
+    def reset(self):
+        self.n_function_evaluations = []
+        self._w = None
+        self._w_structure = {}
+        self._previous = {}
+
+    def _cache_coupling_structure(self, w):
+        if self._w is None or self._w.shape != w.shape or not (numpy.array_equal(self._w, w)):
+            self._w = numpy.array(w, dtype="float64")
+            # Sum of weights excluding the self-connections, which do not contribute to the difference coupling:
+            self._w_structure = {"w_sum": numpy.sum(self._w, axis=1) - numpy.diag(self._w),
+                                 "w_offdiag": self._w - numpy.diag(numpy.diag(self._w))}
+        return self._w_structure
+
+    def _solve(self, key, fun, jac, xinit, params_path):
+        # params_path: a function of t in (0, 1] returning the parameters' tuple of the problem,
+        # from the previous (t=0) to the current (t=1) ones
+        previous = self._previous.get(key, None)
+        if self.warm_start and previous is not None:
+            x = previous
+            steps = numpy.linspace(0.0, 1.0, self.continuation_steps + 1)[1:]
+        else:
+            x = xinit
+            steps = [1.0]
+        nfev = 0
+        for t in steps:
+            sol = root(fun, x, args=params_path(t), method='lm', jac=jac, tol=self.tol, callback=None, options=None)
+            nfev += sol.nfev
+            if not (sol.success):
+                self._previous.pop(key, None)
+                raise_value_error(sol.message)
+            if numpy.any([numpy.any(numpy.isnan(sol.x)), numpy.any(numpy.isinf(sol.x))]):
+                self._previous.pop(key, None)
+                raise_value_error("nan or inf values in solution x\n" + sol.message)
+            x = sol.x
+        self.n_function_evaluations.append(nfev)
+        self._previous[key] = x
+        return x
+
+    def _interpolate_params(self, key, params):
+        previous_params = self._previous.get(("params",) + key, None)
+        self._previous[("params",) + key] = params
+        if previous_params is None or self.continuation_steps == 1:
+            return lambda t: params
+        return lambda t: tuple([p0 + t * (p1 - p0) for p0, p1 in zip(previous_params, params)])
+
+    @staticmethod
+    def _hypo_x0_fun(x, ix0, iE, w_offdiag, w_sum, x1EQ_e, zEQ_e, x0_o, K, yc, Iext1, a, b, d):
+        # fz = 4 * (x1 - x0) - z - K * sum_j(wij * (x1j - x1i)), for tau1 = tau0 = 1.0, zmode = "lin" and z_pos=True,
+        # where z = yc + Iext1 - a * x1 ** 3 + (b - d) * x1 ** 2 for the x0 regions
+        x1 = numpy.empty(x.shape)
+        x1[iE] = x1EQ_e
+        x1[ix0] = x[ix0]
+        x0 = numpy.empty(x.shape)
+        x0[iE] = x[iE]
+        x0[ix0] = x0_o
+        z = numpy.empty(x.shape)
+        z[iE] = zEQ_e
+        z[ix0] = yc[ix0] + Iext1[ix0] - a[ix0] * x1[ix0] ** 3 + (b[ix0] - d[ix0]) * x1[ix0] ** 2
+        coupling = K * (numpy.dot(w_offdiag, x1) - w_sum * x1)
+        return 4.0 * (x1 - x0) - z - coupling
+
+    @staticmethod
+    def _hypo_x0_jac(x, ix0, iE, w_offdiag, w_sum, x1EQ_e, zEQ_e, x0_o, K, yc, Iext1, a, b, d):
+        x1 = numpy.empty(x.shape)
+        x1[iE] = x1EQ_e
+        x1[ix0] = x[ix0]
+        # Derivatives with respect to the x1 of the x0 regions...
+        jac = numpy.zeros((x.size, x.size))
+        jac[:, ix0] = - K[:, numpy.newaxis] * w_offdiag[:, ix0]
+        jac[ix0, ix0] += 4.0 + 3.0 * a[ix0] * x1[ix0] ** 2 - 2.0 * (b[ix0] - d[ix0]) * x1[ix0] + K[ix0] * w_sum[ix0]
+        # ...and with respect to the x0 of the epileptogenicity regions
+        jac[iE, iE] = -4.0
+        return jac
+
+    def eq_x1_hypo_x0_optimize(self, ix0, iE, x1EQ, zEQ, x0, K, w, yc, Iext1, a=A_DEF, b=B_DEF, d=D_DEF,
+                               slope=SLOPE_DEF):
+        # Same inputs and outputs as eq_x1_hypo_x0_optimize(), but warm started
+        n_regions = numpy.array(x1EQ).size
+        x1EQ, zEQ, yc, Iext1, K, a, b, d = \
+            [numpy.array(param, dtype="float64") * numpy.ones((n_regions,))
+             for param in [numpy.array(x1EQ).flatten(), numpy.array(zEQ).flatten(), yc, Iext1, K, a, b, d]]
+        ix0 = numpy.array(ix0, dtype="i").flatten()
+        iE = numpy.array(iE, dtype="i").flatten()
+        x0 = numpy.array(x0, dtype="float64").flatten()
+        w_structure = self._cache_coupling_structure(numpy.reshape(w, (n_regions, n_regions)))
+        key = ("hypo_x0", n_regions, tuple(ix0), tuple(iE))
+        xinit = numpy.zeros((n_regions,))
+        # Set initial conditions for the optimization algorithm, by ignoring coupling (=0), as in
+        # eq_x1_hypo_x0_optimize()
+        xinit[iE] = x1EQ[iE] - zEQ[iE] / 4.0
+        xinit[ix0] = x0 + zEQ[ix0] / 4.0
+        params_path = self._interpolate_params(key, (x1EQ[iE], zEQ[iE], x0, K, yc, Iext1, a, b, d))
+        x = self._solve(key, self._hypo_x0_fun, self._hypo_x0_jac, xinit,
+                        lambda t: (ix0, iE, w_structure["w_offdiag"], w_structure["w_sum"]) + params_path(t))
+        x1EQ[ix0] = x[ix0]
+        return x1EQ, x[iE]
+
+    def calc_eq_x1(self, yc, Iext1, x0, K, w, a=A_DEF, b=B_DEF, d=D_DEF, zmode=numpy.array("lin"), model="6d"):
+        # Same inputs and outputs as calc_eq_x1(), but warm started
+        x0, K, yc, Iext1, a, b, d = assert_arrays([x0, K, yc, Iext1, a, b, d])
+        n = x0.size
+        shape = x0.shape
+        x0, K, yc, Iext1, a, b, d = assert_arrays([x0, K, yc, Iext1, a, b, d], (n,))
+        w = assert_arrays([w], (n, n))
+        key = ("x1", n, str(zmode), model)
+        fx1z = lambda x1, x0, K, yc, Iext1, a, b, d: \
+            calc_fx1z(x1, x0, K, w, yc, Iext1, a=a, b=b, d=d, tau1=1.0, tau0=1.0, model=model, zmode=zmode,
+                      shape=(n,))
+        jac = lambda x1, x0, K, yc, Iext1, a, b, d: \
+            calc_fx1z_diff(x1, K, w, a, b, d, tau1=1.0, tau0=1.0, model=model, zmode=zmode)
+        params_path = self._interpolate_params(key, (x0, K, yc, Iext1, a, b, d))
+        x1eq = numpy.reshape(self._solve(key, fx1z, jac, -1.5 * numpy.ones((n,)), params_path), shape)
+        if numpy.any(x1eq > 0.0):
+            raise_value_error("At least one x1eq is > 0.0!")
+        return x1eq
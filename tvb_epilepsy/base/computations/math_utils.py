@@ -1,7 +1,6 @@
 # Some math tools
 
 import numpy as np
-from itertools import product
 from tvb_epilepsy.base.constants.config import CalculusConfig, FiguresConfig
 from tvb_epilepsy.base.utils.log_error_utils import initialize_logger
 
@@ -19,6 +18,17 @@ def weighted_vector_sum(weights, vectors, normalize=True):
     return np.array(vector_sum)
 
 
+def canonical_sign_vectors(vectors, rtol=10 ** -6):
+    # Flip the sign of each vector, i.e., column, of a (..., n, n_vectors) array,
+    # so that its component of the largest magnitude (the first one, within a relative tolerance) is positive.
+    # E.g., eigenvectors are defined only up to their sign, which differs across eigen solvers.
+    vectors = np.array(vectors)
+    abs_vectors = np.abs(vectors)
+    i_max = np.argmax(abs_vectors >= (1.0 - rtol) * np.max(abs_vectors, axis=-2, keepdims=True), axis=-2)
+    max_components = np.take_along_axis(vectors, i_max[..., np.newaxis, :], axis=-2)
+    return vectors * np.where(np.real(max_components) < 0, -1.0, 1.0)
+
+
 def normalize_weights(weights, percentile=CalculusConfig.WEIGHTS_NORM_PERCENT, remove_diagonal=True, ceil=1.0):
     # Create the normalized connectivity weights:
     if len(weights) > 0:
@@ -42,14 +52,24 @@ def compute_in_degree(weights):
     return np.expand_dims(np.sum(weights, axis=1), 1).T
 
 
-def compute_gain_matrix(locations1, locations2, normalize=95, ceil=1.0):
+def compute_gain_matrix(locations1, locations2, normalize=95, ceil=1.0, chunk_size=None):
+    # chunk_size: number of locations1 (rows) to be processed at once, for bounding the memory of the temporary
+    # arrays to chunk_size x locations2.shape[0] elements. All locations1 are processed together by default.
+    locations1 = np.array(locations1)
+    locations2 = np.array(locations2)
     n1 = locations1.shape[0]
     n2 = locations2.shape[0]
-    projection = np.zeros((n1, n2))
-    dist = np.zeros((n1, n2))
-    for i1, i2 in product(range(n1), range(n2)):
-        dist[i1, i2] = np.abs(np.sum((locations1[i1, :] - locations2[i2, :]) ** 2))
-        projection[i1, i2] = 1 / dist[i1, i2]
+    if chunk_size is None:
+        chunk_size = n1
+    chunk_size = int(max(1, chunk_size))
+    projection = np.empty((n1, n2))
+    for i_start in range(0, n1, chunk_size):
+        chunk = slice(i_start, min(i_start + chunk_size, n1))
+        # Accumulate the squared distances coordinate by coordinate, in the same order as a sum over the last axis:
+        dist = (locations1[chunk, 0][:, np.newaxis] - locations2[np.newaxis, :, 0]) ** 2
+        for i_coord in range(1, locations1.shape[1]):
+            dist += (locations1[chunk, i_coord][:, np.newaxis] - locations2[np.newaxis, :, i_coord]) ** 2
+        np.divide(1.0, np.abs(dist, out=dist), out=projection[chunk])
     if normalize:
         projection /= np.percentile(projection, normalize)
     if ceil:
@@ -73,6 +93,14 @@ def select_greater_values_array_inds(values, threshold=None, verbose=False):
         return get_greater_values_array_inds(values, elbow_point + 1)
 
 
+def curve_elbow_points(vals):
+    # Vectorized (non interactive) curve_elbow_point() for each row (last axis) of a stack of value arrays
+    vals = np.sort(np.array(vals), axis=-1)[..., ::-1]
+    cumsum_vals = np.cumsum(vals, axis=-1)
+    grad = np.gradient(np.gradient(np.gradient(cumsum_vals, axis=-1), axis=-1), axis=-1)
+    return np.argmax(grad, axis=-1)
+
+
 def curve_elbow_point(vals, interactive=CalculusConfig.INTERACTIVE_ELBOW_POINT):
     vals = np.array(vals).flatten()
     if np.any(vals[0:-1] - vals[1:] < 0):
@@ -1,10 +1,132 @@
 
+import os
+import sys
+import inspect
+import hashlib
+import pickle
 import numpy
 from numpy import array, empty_like, reshape
+import sympy
 from sympy import Symbol, solve, solveset, lambdify, series, Matrix  # diff, ArraySymbol
 from sympy.tensor.array import Array
+from sympy.utilities.iterables import flatten
+from sympy.utilities.lambdify import lambdastr, NUMPY_DEFAULT, NUMPY_TRANSLATIONS
+try:
+    from sympy.printing.lambdarepr import NumPyPrinter
+except ImportError:
+    from sympy.printing.pycode import NumPyPrinter
+from tvb_epilepsy.base.constants.config import CalculusConfig
+from tvb_epilepsy.base.computations import equations_utils
 from tvb_epilepsy.base.computations.equations_utils import *
 from tvb_epilepsy.base.utils.data_structures_utils import shape_to_size
+from tvb_epilepsy.base.utils.log_error_utils import initialize_logger
+
+logger = initialize_logger(__name__)
+
+# In memory cache of the lambdified kernels, keyed by symbol function and arguments
+SYMBOL_KERNELS = {}
+
+# Hash of the source code the kernels are built from, so that kernels cached on disk by older code are not reused
+SYMBOL_KERNELS_SOURCE_HASH = hashlib.md5(inspect.getsource(sys.modules[__name__]) +
+                                         inspect.getsource(equations_utils)).hexdigest()
+
+
+def _numpy_namespace():
+    # The namespace of lambdify(..., "numpy"): all of numpy, as well as the numpy functions under their sympy names
+    namespace = {}
+    exec("from numpy import *", namespace)
+    namespace.update(NUMPY_DEFAULT)
+    for sympy_name, numpy_name in NUMPY_TRANSLATIONS.items():
+        namespace[sympy_name] = namespace[numpy_name]
+    return namespace
+
+
+NUMPY_NAMESPACE = _numpy_namespace()
+
+
+def _eval_lambda_str(lambda_str):
+    namespace = dict(NUMPY_NAMESPACE)
+    namespace.update({"__flatten_args__": flatten, "range": range})
+    func = eval(lambda_str, namespace)
+
+    # As for sympy's lambdify with numpy, wrap all scalar input arguments in arrays
+    def symbol_lambda(*args):
+        return func(*[numpy.asarray(arg) if isinstance(arg, (int, long, float, complex)) else arg for arg in args])
+
+    symbol_lambda.lambda_str = lambda_str
+    return symbol_lambda
+
+
+def symbol_lambdify(args, expr):
+    # Equivalent to lambdify(args, expr, "numpy"),
+    # but keeping the source string of the lambda function, so that it can be cached on disk
+    return _eval_lambda_str(lambdastr(args, expr, printer=NumPyPrinter, dummify=False))
+
+
+def _symbol_kernel_key(symbol_function, args, kwargs):
+    def normalize(arg):
+        if isinstance(arg, numpy.ndarray):
+            return normalize(arg.tolist())
+        elif isinstance(arg, (list, tuple)):
+            return tuple([normalize(a) for a in arg])
+        else:
+            return arg
+    return repr((symbol_function.__name__, normalize(args), normalize(sorted(kwargs.items())), sympy.__version__,
+                 SYMBOL_KERNELS_SOURCE_HASH))
+
+
+def _symbol_kernel_to_lambda_strs(kernel):
+    if isinstance(kernel, (list, tuple)):
+        return type(kernel)([_symbol_kernel_to_lambda_strs(k) for k in kernel])
+    return kernel.lambda_str
+
+
+def _symbol_kernel_from_lambda_strs(lambda_strs):
+    if isinstance(lambda_strs, (list, tuple)):
+        return type(lambda_strs)([_symbol_kernel_from_lambda_strs(l) for l in lambda_strs])
+    return _eval_lambda_str(lambda_strs)
+
+
+def symbol_kernel(symbol_function, *args, **kwargs):
+    """
+    Returns the lambdified function(s) of symbol_function(*args, **kwargs)[0], built only once per key
+    (symbol_function, arguments) and cached in memory, as well as on disk
+    in CalculusConfig.SYMBOLIC_KERNELS_CACHE_FOLDER (if not None), for other processes to reuse.
+    Cached kernels are evaluated Python source, so the cache folder has to be a trusted, private one.
+    :param symbol_function: one of the symbol_* functions of this module, returning lambda(s) at position 0
+    :return: the same compiled function (or list/tuple of functions) for the same key
+    """
+    key = _symbol_kernel_key(symbol_function, args, kwargs)
+    kernel = SYMBOL_KERNELS.get(key, None)
+    if kernel is not None:
+        return kernel
+    folder = CalculusConfig.SYMBOLIC_KERNELS_CACHE_FOLDER
+    path = None
+    if folder is not None:
+        path = os.path.join(folder, symbol_function.__name__ + "_" + hashlib.md5(key).hexdigest() + ".pkl")
+        if os.path.isfile(path):
+            try:
+                with open(path, "rb") as f:
+                    stored_key, lambda_strs = pickle.load(f)
+                if stored_key == key:
+                    kernel = _symbol_kernel_from_lambda_strs(lambda_strs)
+            except Exception as e:
+                logger.warning("Failed to load cached symbolic kernel " + path + "!\n" + str(e))
+    if kernel is None:
+        kernel = symbol_function(*args, **kwargs)[0]
+        if path is not None:
+            try:
+                if not (os.path.isdir(folder)):
+                    os.makedirs(folder)
+                # Write to a temporary file first, so that concurrent processes never read a partial file
+                temp_path = path + ".%d.tmp" % os.getpid()
+                with open(temp_path, "wb") as f:
+                    pickle.dump((key, _symbol_kernel_to_lambda_strs(kernel)), f, pickle.HIGHEST_PROTOCOL)
+                os.rename(temp_path, path)
+            except Exception as e:
+                logger.warning("Failed to cache symbolic kernel to " + path + "!\n" + str(e))
+    SYMBOL_KERNELS[key] = kernel
+    return kernel
 
 
 def symbol_vars(n_regions, vars_str, dims=1, ind_str="_", shape=None, output_flag="numpy_array"):
@@ -69,7 +191,7 @@ def symbol_eqtn_coupling(n, ix=None, jx=None, K="K", shape=None):
     if jx is None:
         jx = range(n)
     coupling = Array(eqtn_coupling(x1, K, w, ix, jx))
-    return lambdify([x1, K, w], coupling, "numpy"), coupling, vars_dict
+    return symbol_lambdify([x1, K, w], coupling), coupling, vars_dict
 
 
 def symbol_eqtn_x0cr_r(n, zmode=numpy.array("lin"), shape=None):
@@ -78,8 +200,8 @@ def symbol_eqtn_x0cr_r(n, zmode=numpy.array("lin"), shape=None):
     x0cr, r = eqtn_x0cr_r(yc, Iext1, a, b, d, x1_rest, x1_cr, x0_rest, x0_cr, zmode=zmode)
     x0cr = Array(x0cr)
     r = Array(r)
-    x0cr_lambda = lambdify([yc, Iext1, a, b, d, x1_rest, x1_cr, x0_rest, x0_cr, ], x0cr, "numpy")
-    r_lambda = lambdify([yc, Iext1, a, b, d, x1_rest, x1_cr, x0_rest, x0_cr, ], r, "numpy")
+    x0cr_lambda = symbol_lambdify([yc, Iext1, a, b, d, x1_rest, x1_cr, x0_rest, x0_cr, ], x0cr)
+    r_lambda = symbol_lambdify([yc, Iext1, a, b, d, x1_rest, x1_cr, x0_rest, x0_cr, ], r)
     return (x0cr_lambda, r_lambda), (x0cr, r), vars_dict
 
 
@@ -88,7 +210,7 @@ def symbol_eqtn_x0(n, zmode=numpy.array("lin"), z_pos=True, K="K", shape=None):
     w, temp = symbol_vars(n, ["w"], dims=2)
     vars_dict.update(temp)
     x0 = Array(eqtn_x0(x1, z, zmode, z_pos, K, w))
-    x0_lambda = lambdify([x1, z, K, w], x0, "numpy"), x0, vars_dict
+    x0_lambda = symbol_lambdify([x1, z, K, w], x0), x0, vars_dict
     return x0_lambda, x0, vars_dict
 
 
@@ -97,18 +219,18 @@ def symbol_eqtn_fx1(n, model="2d", x1_neg=True, slope="slope", Iext1="Iext1", sh
                                                                         "tau1"], shape=shape)
     if model == "2d":
         fx1 = Array(eqtn_fx1(x1, z, y1, Iext1, slope, a, b, d, tau1, x1_neg, model, x2=None))
-        return lambdify([x1, z, y1, Iext1, slope, a, b, d, tau1], fx1, "numpy"), fx1, vars_dict
+        return symbol_lambdify([x1, z, y1, Iext1, slope, a, b, d, tau1], fx1), fx1, vars_dict
     else:
         x2, vx2 = symbol_vars(n, ["x2"], shape=shape)
         vars_dict.update(vx2)
         fx1 = Array(eqtn_fx1(x1, z, y1, Iext1, slope, a, b, d, tau1, x1_neg, model, x2=x2))
-        return lambdify([x1, z, y1, x2, Iext1, slope, a, b, d, tau1], fx1, "numpy"), fx1, vars_dict
+        return symbol_lambdify([x1, z, y1, x2, Iext1, slope, a, b, d, tau1], fx1), fx1, vars_dict
 
 
 def symbol_eqtn_fy1(n, shape=None):
     x1, y1, yc, d, tau1, vars_dict = symbol_vars(n, ["x1", "y1", "yc", "d", "tau1"], shape=shape)
     fy1 = Array(eqtn_fy1(x1, yc, y1, d, tau1))
-    return lambdify([x1, y1, yc, d, tau1], fy1, "numpy"), fy1, vars_dict
+    return symbol_lambdify([x1, y1, yc, d, tau1], fy1), fy1, vars_dict
 
 
 def symbol_eqtn_fz(n, zmode=numpy.array("lin"), z_pos=True, x0="x0", K="K", shape=None):
@@ -116,32 +238,32 @@ def symbol_eqtn_fz(n, zmode=numpy.array("lin"), z_pos=True, x0="x0", K="K", shap
     w, temp = symbol_vars(n, ["w"], dims=2)
     vars_dict.update(temp)
     fz = Array(eqtn_fz(x1, z, x0, tau1, tau0, zmode, z_pos, K=K, w=w))
-    fz_lambda = lambdify([x1, z, x0, K, w, tau1, tau0], fz, "numpy")
+    fz_lambda = symbol_lambdify([x1, z, x0, K, w, tau1, tau0], fz)
     return fz_lambda, fz, vars_dict
 
 
 def symbol_eqtn_fx2(n, Iext2="Iext2", shape=None):
     x2, y2, z, g, Iext2, tau1, vars_dict = symbol_vars(n, ["x2", "y2", "z", "g", Iext2, "tau1"], shape=shape)
     fx2 = Array(eqtn_fx2(x2, y2, z, g, Iext2, tau1))
-    return lambdify([x2, y2, z, g, Iext2, tau1], fx2, "numpy"), fx2, vars_dict
+    return symbol_lambdify([x2, y2, z, g, Iext2, tau1], fx2), fx2, vars_dict
 
 
 def symbol_eqtn_fy2(n, x2_neg=False, shape=None):
     x2, y2, s, tau1, tau2, vars_dict = symbol_vars(n, ["x2", "y2", "s", "tau1", "tau2"], shape=shape)
     fy2 = Array(eqtn_fy2(x2, y2, s, tau1, tau2, x2_neg))
-    return lambdify([x2, y2, s, tau1, tau2], fy2, "numpy"), fy2, vars_dict
+    return symbol_lambdify([x2, y2, s, tau1, tau2], fy2), fy2, vars_dict
 
 
 def symbol_eqtn_fg(n, shape=None):
     x1, g, gamma, tau1, vars_dict = symbol_vars(n, ["x1", "g", "gamma", "tau1"], shape=shape)
     fg = Array(eqtn_fg(x1, g, gamma, tau1))
-    return lambdify([x1, g, gamma, tau1], fg, "numpy"), fg, vars_dict
+    return symbol_lambdify([x1, g, gamma, tau1], fg), fg, vars_dict
 
 
 def symbol_eqtn_fx0(n, shape=None):
     x0_var, x0, tau1, vars_dict = symbol_vars(n, ["x0_var", "x0", "tau1"], shape=shape)
     fx0 = Array(eqtn_fx0(x0_var, x0, tau1))
-    return lambdify([x0_var, x0, tau1], fx0, "numpy"), fx0, vars_dict
+    return symbol_lambdify([x0_var, x0, tau1], fx0), fx0, vars_dict
 
 
 def symbol_eqtn_fslope(n, pmode=array("const"), shape=None):
@@ -151,20 +273,20 @@ def symbol_eqtn_fslope(n, pmode=array("const"), shape=None):
     fslope = Array(eqtn_fslope(slope_var, slope_eq, tau1))
     vars_dict["pmode"] = pmode
     if pmode == "z":
-        fslope_lambda = lambdify([slope_var, z, tau1], fslope, "numpy")
+        fslope_lambda = symbol_lambdify([slope_var, z, tau1], fslope)
     elif pmode == "g":
-        fslope_lambda = lambdify([slope_var, g, tau1], fslope, "numpy"),
+        fslope_lambda = symbol_lambdify([slope_var, g, tau1], fslope),
     elif pmode == "z*g":
-        fslope_lambda = lambdify([slope_var, z, g, tau1], fslope, "numpy")
+        fslope_lambda = symbol_lambdify([slope_var, z, g, tau1], fslope)
     else:
-        fslope_lambda = lambdify([slope_var, slope, tau1], fslope, "numpy")
+        fslope_lambda = symbol_lambdify([slope_var, slope, tau1], fslope)
     return fslope_lambda, fslope, vars_dict
 
 
 def symbol_eqtn_fIext1(n, shape=None):
     Iext1_var, Iext1, tau1, tau0, vars_dict = symbol_vars(n, ["Iext1_var", "Iext1", "tau1", "tau0"], shape=shape)
     fIext1 = Array(eqtn_fIext1(Iext1_var, Iext1, tau1, tau0))
-    return lambdify([Iext1_var, Iext1, tau1, tau0], fIext1, "numpy"), fIext1, vars_dict
+    return symbol_lambdify([Iext1_var, Iext1, tau1, tau0], fIext1), fIext1, vars_dict
 
 
 def symbol_eqtn_fIext2(n, pmode=array("const"), shape=None):
@@ -174,20 +296,20 @@ def symbol_eqtn_fIext2(n, pmode=array("const"), shape=None):
     fIext2 = Array(eqtn_fIext2(Iext2_var, Iext2_eq, tau1))
     vars_dict["pmode"] = pmode
     if pmode == "z":
-        fIext2_lambda = lambdify([Iext2_var, z, tau1], fIext2, "numpy")
+        fIext2_lambda = symbol_lambdify([Iext2_var, z, tau1], fIext2)
     elif pmode == "g":
-        fIext2_lambda = lambdify([Iext2_var, g, tau1], fIext2, "numpy")
+        fIext2_lambda = symbol_lambdify([Iext2_var, g, tau1], fIext2)
     elif pmode == "z*g":
-        fIext2_lambda = lambdify([Iext2_var, z, g, tau1], fIext2, "numpy")
+        fIext2_lambda = symbol_lambdify([Iext2_var, z, g, tau1], fIext2)
     else:
-        fIext2_lambda = lambdify([Iext2_var, Iext2, tau1], fIext2, "numpy")
+        fIext2_lambda = symbol_lambdify([Iext2_var, Iext2, tau1], fIext2)
     return fIext2_lambda, fIext2, vars_dict
 
 
 def symbol_eqtn_fK(n, shape=None):
     K_var, K, tau1, tau0, vars_dict = symbol_vars(n, ["K_var", "K", "tau1", "tau0"], shape=shape)
     fK = Array(eqtn_fK(K_var, K, tau1, tau0))
-    return lambdify([K_var, K, tau1, tau0], fK, "numpy"), fK, vars_dict
+    return symbol_lambdify([K_var, K, tau1, tau0], fK), fK, vars_dict
 
 
 def symbol_eqtn_fparam_vars(n, pmode=array("const"), shape=None):
@@ -278,7 +400,7 @@ def symbol_eqnt_dfun(n, model_vars, zmode=array("lin"), x1_neg=True, x2_neg=Fals
         # shape = f_sym.shape
         # if shape[0] > shape[1]:
         #     f_sym =
-        f_lambda = lambdify(symvars, f_sym, "numpy")
+        f_lambda = symbol_lambdify(symvars, f_sym)
     return f_lambda, f_sym, v
 
 
@@ -291,63 +413,63 @@ def symbol_calc_jac(n_regions, model_vars, zmode=array("lin"), x1_neg=True, x2_n
     if model_vars == 2:
         jac_sym = dfun_sym.jacobian((Matrix([v["x1"], v["z"]]).reshape(2 * n_regions, 1)))
         jac_lambda.append(
-            lambdify([v["x1"], v["z"], v["y1"], v["Iext1"], v["slope"], v["a"], v["b"], v["d"], v["tau1"]],
-                     jac_sym[ind(0), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["z"], v["x0"], v["K"], v["w"], v["tau1"], v["tau0"]],
-                                   jac_sym[ind(1), :], "numpy"))
+            symbol_lambdify([v["x1"], v["z"], v["y1"], v["Iext1"], v["slope"], v["a"], v["b"], v["d"], v["tau1"]],
+                            jac_sym[ind(0), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["z"], v["x0"], v["K"], v["w"], v["tau1"], v["tau0"]],
+                                          jac_sym[ind(1), :]))
     elif model_vars == 6:
         jac_sym = dfun_sym.jacobian(Matrix([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"]]).
                                     reshape(6 * n_regions, 1))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["Iext1"], v["slope"], v["a"], v["b"], v["tau1"]], jac_sym[ind(0), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["yc"], v["d"], v["tau1"]], jac_sym[ind(1), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0"], v["K"], v["w"], v["tau1"], v["tau0"]],
-                                   jac_sym[ind(2), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["Iext2"], v["tau1"]], jac_sym[ind(3), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["s"], v["tau1"], v["tau2"]], jac_sym[ind(4), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["gamma"], v["tau1"]], jac_sym[ind(5), :], "numpy"))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["Iext1"], v["slope"], v["a"], v["b"], v["tau1"]], jac_sym[ind(0), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["yc"], v["d"], v["tau1"]], jac_sym[ind(1), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0"], v["K"], v["w"], v["tau1"], v["tau0"]],
+                                          jac_sym[ind(2), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["Iext2"], v["tau1"]], jac_sym[ind(3), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["s"], v["tau1"], v["tau2"]], jac_sym[ind(4), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["gamma"], v["tau1"]], jac_sym[ind(5), :]))
     elif model_vars == 11:
         jac_sym = dfun_sym.jacobian(Matrix([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
                                             v["x0_var"], v["slope_var"], v["Iext1_var"], v["Iext2_var"], v["K_var"]])
                                     .reshape(11 * n_regions, 1))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["a"], v["b"], v["tau1"]], jac_sym[ind(0), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["yc"], v["d"], v["tau1"]], jac_sym[ind(1), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["w"], v["tau1"], v["tau0"]], jac_sym[ind(2), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["tau1"]], jac_sym[ind(3), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["s"], v["tau1"], v["tau2"]], jac_sym[ind(4), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["gamma"], v["tau1"]], jac_sym[ind(5), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["x0"], v["tau1"]], jac_sym[ind(6), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["slope"], v["tau1"]], jac_sym[ind(7), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["Iext1"], v["tau1"], v["tau0"]], jac_sym[ind(8), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["Iext2"], v["tau1"]], jac_sym[ind(9), :], "numpy"))
-        jac_lambda.append(lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
-                                    v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
-                                    v["K"], v["tau1"], v["tau0"]], jac_sym[ind(10), :], "numpy"))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["a"], v["b"], v["tau1"]], jac_sym[ind(0), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["yc"], v["d"], v["tau1"]], jac_sym[ind(1), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["w"], v["tau1"], v["tau0"]], jac_sym[ind(2), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["tau1"]], jac_sym[ind(3), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["s"], v["tau1"], v["tau2"]], jac_sym[ind(4), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["gamma"], v["tau1"]], jac_sym[ind(5), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["x0"], v["tau1"]], jac_sym[ind(6), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["slope"], v["tau1"]], jac_sym[ind(7), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["Iext1"], v["tau1"], v["tau0"]], jac_sym[ind(8), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["Iext2"], v["tau1"]], jac_sym[ind(9), :]))
+        jac_lambda.append(symbol_lambdify([v["x1"], v["y1"], v["z"], v["x2"], v["y2"], v["g"],
+                                           v["x0_var"], v["Iext1_var"], v["Iext2_var"], v["slope_var"], v["K_var"],
+                                           v["K"], v["tau1"], v["tau0"]], jac_sym[ind(10), :]))
     return jac_lambda, jac_sym, v
 
 
@@ -359,7 +481,7 @@ def symbol_calc_coupling_diff(n, ix=None, jx=None, K="K"):
     coupl, v = symbol_eqtn_coupling(n, ix, jx, K)[1:]
     x = Matrix(v["x1"][jx])
     dcoupl_dx = Array(Matrix(coupl).jacobian(x))
-    return lambdify([v["K"], v["w"]], dcoupl_dx, "numpy"), dcoupl_dx, v
+    return symbol_lambdify([v["K"], v["w"]], dcoupl_dx), dcoupl_dx, v
 
 
 def symbol_calc_2d_taylor(n, x_taylor="x1lin", order=2, x1_neg=True, slope="slope", Iext1="Iext1", shape=None):
@@ -375,8 +497,8 @@ def symbol_calc_2d_taylor(n, x_taylor="x1lin", order=2, x1_neg=True, slope="slop
             fx1ser = fx1ser.reshape(shape[0], shape[1])
         else:
             fx1ser = fx1ser.reshape(shape[0], )
-    return lambdify([v["x1"], x_taylor, v["z"], v["y1"], v[Iext1], v[slope], v["a"], v["b"], v["d"], v["tau1"]],
-                    fx1ser, "numpy"), fx1ser, v
+    return symbol_lambdify([v["x1"], x_taylor, v["z"], v["y1"], v[Iext1], v[slope], v["a"], v["b"], v["d"], v["tau1"]],
+                           fx1ser), fx1ser, v
 
 
 def symbol_calc_fx1z_2d_x1neg_zpos_jac(n, ix0, iE):
@@ -396,8 +518,8 @@ def symbol_calc_fx1z_2d_x1neg_zpos_jac(n, ix0, iE):
         fz[ix] = fz[ix].subs(v["z"][ix], fx1[ix])
         jac.append(Matrix([fz[ix]]).jacobian(x)[:])
     jac = Array(jac)
-    return lambdify([v["x1"], v["z"], v["x0"], v["y1"], v["Iext1"], v["K"], v["w"], v["a"], v["b"], v["d"], v["tau1"],
-                     v["tau0"]], jac, "numpy"), jac, v
+    return symbol_lambdify([v["x1"], v["z"], v["x0"], v["y1"], v["Iext1"], v["K"], v["w"], v["a"], v["b"], v["d"],
+                            v["tau1"], v["tau0"]], jac), jac, v
 
 
 def symbol_calc_fx1y1_6d_diff_x1(n, shape=None):
@@ -418,7 +540,7 @@ def symbol_calc_fx1y1_6d_diff_x1(n, shape=None):
             dfx1 = dfx1.reshape(shape[0], shape[1])
         else:
             dfx1 = dfx1.reshape(shape[0], )
-    return lambdify([v["x1"], v["yc"], v["Iext1"], v["a"], v["b"], v["d"], v["tau1"]], dfx1, "numpy"), dfx1, v
+    return symbol_lambdify([v["x1"], v["yc"], v["Iext1"], v["a"], v["b"], v["d"], v["tau1"]], dfx1), dfx1, v
 
 
 def symbol_calc_x0cr_r(n, zmode=array("lin"), shape=None):
@@ -464,10 +586,10 @@ def symbol_calc_x0cr_r(n, zmode=array("lin"), shape=None):
         else:
             x0cr = x0cr.reshape(shape[0], )
             r = r.reshape(shape[0], )
-    return (lambdify([v["y1"], v["Iext1"], v["a"], v["b"], v["d"], v["x1_rest"], v["x1_cr"], v["x0_rest"], v["x0_cr"]],
-                     x0cr, 'numpy'),
-            lambdify([v["y1"], v["Iext1"], v["a"], v["b"], v["d"], v["x1_rest"], v["x1_cr"], v["x0_rest"], v["x0_cr"]],
-                     r, 'numpy')), \
+    return (symbol_lambdify([v["y1"], v["Iext1"], v["a"], v["b"], v["d"], v["x1_rest"], v["x1_cr"], v["x0_rest"],
+                             v["x0_cr"]], x0cr),
+            symbol_lambdify([v["y1"], v["Iext1"], v["a"], v["b"], v["d"], v["x1_rest"], v["x1_cr"], v["x0_rest"],
+                             v["x0_cr"]], r)), \
            (x0cr, r), v
 
 
@@ -504,8 +626,8 @@ def symbol_eqtn_fx1z(n, model="6d", zmode=array("lin"), shape=None):  # x1_neg=T
             fx1z = fx1z.reshape(shape[0], shape[1])
         else:
             fx1z = fx1z.reshape(shape[0], )
-    fx1z_lambda = lambdify([v["x1"], v["x0"], v["K"], v["w"], v["y1"], v["Iext1"], v["a"], v["b"], v["d"], v["tau1"],
-                            v["tau0"]], fx1z, 'numpy')
+    fx1z_lambda = symbol_lambdify([v["x1"], v["x0"], v["K"], v["w"], v["y1"], v["Iext1"], v["a"], v["b"], v["d"],
+                                   v["tau1"], v["tau0"]], fx1z)
     return fx1z_lambda, fx1z, v
 
 
@@ -515,8 +637,8 @@ def symbol_eqtn_fx1z_diff(n, model, zmode=array("lin")):  # x1_neg=True, , z_pos
     fx1z, v = symbol_eqtn_fx1z(n, model, zmode)[1:]
     # fx1z = Array(Array(fx1z)[:])
     dfx1z_dx1 = Array(Matrix(fx1z).jacobian(Matrix([v["x1"]])))
-    dfx1z_dx1_lambda = lambdify([v["x1"], v["K"], v["w"], v["a"], v["b"], v["d"], v["tau1"], v["tau0"]],
-                                dfx1z_dx1, 'numpy')
+    dfx1z_dx1_lambda = symbol_lambdify([v["x1"], v["K"], v["w"], v["a"], v["b"], v["d"], v["tau1"], v["tau0"]],
+                                       dfx1z_dx1)
     return dfx1z_dx1_lambda, dfx1z_dx1, v
 
 
@@ -537,7 +659,7 @@ def symbol_eqtn_fx2y2(n, x2_neg=False, shape=None):
             fx2 = fx2.reshape(shape[0], shape[1])
         else:
             fx2 = fx2.reshape(shape[0], )
-    return lambdify([v["x2"], v["z"], v["g"], v["Iext2"], v["s"], v["tau1"]], fx2, 'numpy'), fx2, v
+    return symbol_lambdify([v["x2"], v["z"], v["g"], v["Iext2"], v["s"], v["tau1"]], fx2), fx2, v
 
 
 def symbol_calc_fz_jac_square_taylor(n):
@@ -560,6 +682,6 @@ def symbol_calc_fz_jac_square_taylor(n):
     #     for jv in range(n):
     #         fz_jac[iv, jv].simplify().collect(dfx1z[jv])
     fz_jac = Array(fz_jac)
-    fz_jac_lambda = lambdify([v["z"], v["y1"], v["Iext1"], v["K"], v["w"], v["a"], v["b"], v["d"], v["tau1"], v["tau0"],
-                              v["x_taylor"]], fz_jac, 'numpy')
+    fz_jac_lambda = symbol_lambdify([v["z"], v["y1"], v["Iext1"], v["K"], v["w"], v["a"], v["b"], v["d"], v["tau1"],
+                                     v["tau0"], v["x_taylor"]], fz_jac)
     return fz_jac_lambda, fz_jac, v
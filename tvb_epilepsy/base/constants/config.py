@@ -25,6 +25,10 @@ class GenericConfig(object):
 
 class InputConfig(object):
     _base_input = os.getcwd()
+    # Folder where preprocessed heads are cached in a memory-mappable layout, for processes to share,
+    # e.g., Config().out.FOLDER_TEMP. If None, heads are cached only in folders passed explicitly.
+    # Cached heads are unpickled, so that the folder has to be trusted
+    HEAD_CACHE_FOLDER = None
 
     @property
     def HEAD(self):
@@ -114,6 +118,12 @@ class FiguresConfig(object):
 
 class CalculusConfig(object):
     SYMBOLIC_CALCULATIONS_FLAG = False
+    # Folder where the lambdified functions of the symbolic calculations are cached for reuse across processes,
+    # e.g., Config().out.FOLDER_TEMP. If None, they are cached only in memory
+    SYMBOLIC_KERNELS_CACHE_FOLDER = None
+    # Options: "numba" for the fused compiled dfun kernels of the Epileptor models, if numba is installed,
+    # or "numpy" for their NumPy implementation
+    DFUN_BACKEND = "numba"
 
     # Normalization configuration
     WEIGHTS_NORM_PERCENT = 95
@@ -122,6 +132,12 @@ class CalculusConfig(object):
     # or "user_defined", in which case we expect a number equal to from 1 to hypothesis.n_regions
     EIGENVECTORS_NUMBER_SELECTION = "auto_eigenvals"
     WEIGHTED_EIGENVECTOR_SUM = True
+    # Options: "full" for the eigenvalue decomposition of the whole LSA Jacobian,
+    # or "leading" for computing only the eigen_vectors_number leading eigenvectors,
+    # with a symmetric or sparse (Krylov) eigen solver, when possible
+    LSA_EIGEN_SOLVER = "full"
+    # Jacobian density (ratio of non zero elements) below which a sparse eigen solver is used in "leading" mode
+    LSA_SPARSE_DENSITY = 0.1
     INTERACTIVE_ELBOW_POINT = False
 
     MIN_SINGLE_VALUE = np.finfo("single").min
@@ -130,6 +146,13 @@ class CalculusConfig(object):
     MIN_INT_VALUE = np.iinfo(np.int64).max
 
 
+class LoggingConfig(object):
+    # Level of all loggers, e.g., "DEBUG", "INFO", "WARNING"
+    LEVEL = "DEBUG"
+    # If True, log files are written by a background thread, so that logging calls do not wait for the disk
+    QUEUE_FILE_HANDLERS = True
+
+
 class SimulatorConfig(object):
     USE_TIME_DELAYS_FLAG = True
     MODE = GenericConfig.MODE_TVB
@@ -9,6 +9,7 @@ import tvb.datatypes.arrays as arrays
 from tvb.simulator.common import get_logger
 from tvb.simulator.models import Model
 from tvb_epilepsy.base.utils.log_error_utils import raise_value_error, raise_not_implemented_error
+from tvb_epilepsy.base.computations.epileptor_kernels import compiled_dfun, dfun_buffer
 
 
 LOG = get_logger(__name__)
@@ -300,6 +301,12 @@ class EpileptorDP(Model):
 
         """
 
+        # Fused compiled kernel, if available, otherwise the NumPy implementation below:
+        ydot = compiled_dfun(self, state_variables, coupling, local_coupling,
+                             out=dfun_buffer(self, state_variables))
+        if ydot is not None:
+            return ydot
+
         y = state_variables
         ydot = numpy.empty_like(state_variables)
 
@@ -691,6 +698,12 @@ class EpileptorDPrealistic(Model):
 
         """
 
+        # Fused compiled kernel, if available, otherwise the NumPy implementation below:
+        ydot = compiled_dfun(self, state_variables, coupling, local_coupling,
+                             out=dfun_buffer(self, state_variables))
+        if ydot is not None:
+            return ydot
+
         y = state_variables
         ydot = numpy.empty_like(state_variables)
 
@@ -988,6 +1001,12 @@ class EpileptorDP2D(Model):
 
         """
 
+        # Fused compiled kernel, if available, otherwise the NumPy implementation below:
+        ydot = compiled_dfun(self, state_variables, coupling, local_coupling,
+                             out=dfun_buffer(self, state_variables))
+        if ydot is not None:
+            return ydot
+
         y = state_variables
         ydot = numpy.empty_like(state_variables)
 
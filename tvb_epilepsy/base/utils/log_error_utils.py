@@ -2,45 +2,188 @@
 
 import os
 import sys
+import Queue
+import threading
 import logging
 from logging.handlers import TimedRotatingFileHandler
-from tvb_epilepsy.base.constants.config import OutputConfig
+from multiprocessing.util import Finalize
+from tvb_epilepsy.base.constants.config import OutputConfig, LoggingConfig
 
 
-def initialize_logger(name, target_folder=OutputConfig().FOLDER_LOGS):
+class DelayedHandler(logging.Handler):
     """
-    create logger for a given module
-    :param name: Logger Base Name
-    :param target_folder: Folder where log files will be written
+    Handler that creates the handlers it passes the records to, e.g., file handlers, only at its first record,
+    so that no folders or files are created before anything is logged.
     """
-    if not (os.path.isdir(target_folder)):
-        os.makedirs(target_folder)
 
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    def __init__(self, handlers_factory):
+        logging.Handler.__init__(self)
+        self.handlers_factory = handlers_factory
+        self._handlers = None
+
+    @property
+    def handlers(self):
+        if self._handlers is None:
+            self._handlers = self.handlers_factory()
+        return self._handlers
+
+    def _handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def emit(self, record):
+        self._handle(record)
 
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+    def close(self):
+        if self._handlers is not None:
+            for handler in self._handlers:
+                handler.close()
+        logging.Handler.close(self)
 
-    ch = logging.StreamHandler(sys.stdout)
-    ch.setFormatter(formatter)
-    ch.setLevel(logging.DEBUG)
+
+class QueueHandler(DelayedHandler):
+    """
+    Handler that passes the records to a queue, from which a background thread hands them over to other handlers,
+    e.g., to file handlers, so that logging calls do not wait for the disk.
+    Every process starts its own thread at its first record,
+    and hands over all records still in its queue at its exit, including the exit of multiprocessing workers,
+    which skips atexit and logging.shutdown.
+    """
+
+    def __init__(self, handlers_factory):
+        DelayedHandler.__init__(self, handlers_factory)
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def _start(self):
+        self._queue = Queue.Queue()
+        self._thread = threading.Thread(target=self._handle_queue, args=(self._queue,))
+        self._thread.daemon = True
+        self._thread.start()
+        self._pid = os.getpid()
+        # multiprocessing runs the finalizers of this process at its exit, e.g., when a worker of a pool exits
+        Finalize(None, self._stop, exitpriority=10)
+
+    def _handle_queue(self, queue):
+        while True:
+            record = queue.get()
+            if record is None:
+                break
+            self._handle(record)
+
+    def emit(self, record):
+        try:
+            if self._pid != os.getpid() or self._thread is None:
+                self._start()
+            # Merge message and arguments, and format any exception, now, since they may change later
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            self._queue.put_nowait(record)
+        except Exception:
+            self.handleError(record)
+
+    def _stop(self):
+        # Wait for the thread of this process to hand over all queued records
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self._stop()
+        DelayedHandler.close(self)
+
+
+# Loggers and handlers are created only once and shared by all calls of initialize_logger:
+_loggers = {}
+_stream_handler = []
+_file_handlers = {}
+
+
+def _get_level(level=None):
+    if level is None:
+        level = LoggingConfig.LEVEL
+    if isinstance(level, basestring):
+        level = getattr(logging, level.upper())
+    return level
+
+
+def _get_stream_handler(formatter):
+    if len(_stream_handler) == 0:
+        ch = logging.StreamHandler(sys.stdout)
+        ch.setFormatter(formatter)
+        ch.setLevel(logging.DEBUG)
+        _stream_handler.append(ch)
+    return _stream_handler[0]
+
+
+def _create_file_handlers(target_folder, formatter):
+    if target_folder is None:
+        target_folder = OutputConfig().FOLDER_LOGS
+    if not (os.path.isdir(target_folder)):
+        os.makedirs(target_folder)
 
     fh = TimedRotatingFileHandler(os.path.join(target_folder, 'logs.log'), when="d", interval=1, backupCount=2)
     fh.setFormatter(formatter)
     fh.setLevel(logging.DEBUG)
 
     # Log errors separately, to have them easy to inspect
-    fhe = TimedRotatingFileHandler(os.path.join(target_folder, 'log_errors.log'), when="d", interval=1, backupCount=2)
+    fhe = TimedRotatingFileHandler(os.path.join(target_folder, 'log_errors.log'), when="d", interval=1,
+                                   backupCount=2)
     fhe.setFormatter(formatter)
     fhe.setLevel(logging.ERROR)
 
-    logger.addHandler(ch)
-    logger.addHandler(fh)
-    logger.addHandler(fhe)
+    return [fh, fhe]
+
+
+def _get_file_handler(target_folder, formatter):
+    if target_folder not in _file_handlers:
+        # The log folder and files are created at the first record
+        handlers_factory = lambda: _create_file_handlers(target_folder, formatter)
+        if LoggingConfig.QUEUE_FILE_HANDLERS:
+            _file_handlers[target_folder] = QueueHandler(handlers_factory)
+        else:
+            _file_handlers[target_folder] = DelayedHandler(handlers_factory)
+    return _file_handlers[target_folder]
 
+
+def initialize_logger(name, target_folder=None, level=None):
+    """
+    create logger for a given module, or return the one already created
+    :param name: Logger Base Name
+    :param target_folder: Folder where log files will be written (default: OutputConfig().FOLDER_LOGS)
+    :param level: logging level (default: LoggingConfig.LEVEL)
+    """
+    logger = _loggers.get((name, target_folder), None)
+    if logger is None:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        logger = logging.getLogger(name)
+        # The same handlers are shared by all loggers, and added to each logger only once
+        for handler in [_get_stream_handler(formatter), _get_file_handler(target_folder, formatter)]:
+            if handler not in logger.handlers:
+                logger.addHandler(handler)
+        logger.setLevel(_get_level(level))
+        _loggers[(name, target_folder)] = logger
+    elif level is not None:
+        logger.setLevel(_get_level(level))
     return logger
 
 
+def set_loggers_level(level):
+    """
+    set the level of all loggers created by initialize_logger
+    :param level: logging level, e.g., logging.INFO or "INFO"
+    """
+    level = _get_level(level)
+    for logger in _loggers.values():
+        logger.setLevel(level)
+
+
 def raise_value_error(msg, logger=None):
     if logger is not None:
         logger.error("\n\nValueError: " + msg + "\n")
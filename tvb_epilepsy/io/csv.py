@@ -1,5 +1,7 @@
+import os
+import hashlib
 import numpy as np
-
+from tvb_epilepsy.base.utils.data_structures_utils import ensure_list
 from tvb_epilepsy.io.rdump import rdump
 
 
@@ -17,23 +19,112 @@ def merge_csv_data(*csvs):
     return data_
 
 
-def parse_csv(fname, merge=True):
+def _csv_cache_path(fname, parameters=None):
+    # Hidden sidecar file, so that it is not matched by the glob patterns of the csv files
+    folder, name = os.path.split(fname)
+    if parameters is not None:
+        name += "." + hashlib.md5(",".join(parameters)).hexdigest()[:8]
+    return os.path.join(folder, "." + name + ".npz")
+
+
+def _read_csv_cache(cache_path, fname):
+    if os.path.isfile(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(fname):
+        try:
+            with np.load(cache_path) as cache:
+                return dict(cache.items())
+        except Exception:
+            pass
+    return None
+
+
+def _write_csv_cache(cache_path, data):
+    # Write to a temporary file first, so that concurrent processes never read a partial file
+    temp_path = cache_path + ".%d.tmp.npz" % os.getpid()
+    try:
+        np.savez(temp_path, **data)
+        os.rename(temp_path, cache_path)
+    except Exception:
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+
+
+def _parse_csv_block(lines, n_cols, cols):
+    # Vectorized conversion of a block of lines to an array of the selected columns
+    block = np.fromstring(",".join(lines), sep=",")
+    if block.size != len(lines) * n_cols:
+        # Skip incomplete lines, e.g., of an interrupted run, one line at a time
+        block = [np.fromstring(line, sep=",") for line in lines]
+        block = np.array([line for line in block if line.size == n_cols]).reshape((-1, n_cols))
+    else:
+        block = block.reshape((len(lines), n_cols))
+    if cols is not None:
+        block = block[:, cols]
+    return block
+
+
+def parse_csv(fname, merge=True, parameters=None, cache=False, block_lines=100):
+    """
+    Parses Stan output csv files, skipping comment (e.g., adaptation) lines,
+    reading and converting blocks of lines at a time, so that the memory needed is bounded
+    by the size of the (selected) output and of a block.
+    :param fname: path or list of paths, or glob pattern (with "*") of the csv files
+    :param merge: if True, concatenate the samples of several files
+    :param parameters: list of parameter name prefixes to read (default: all parameters)
+    :param cache: if True, the output is also saved to (and then read from) an npz sidecar file per csv file
+    :param block_lines: number of lines converted at a time
+    :return: dictionary of arrays of samples, of shape (samples, parameter dimensions...)
+    """
     if '*' in fname:
         import glob
-        return parse_csv(glob.glob(fname), merge=merge)
+        return parse_csv(sorted(glob.glob(fname)), merge=merge, parameters=parameters, cache=cache,
+                         block_lines=block_lines)
     if isinstance(fname, (list, tuple)):
-        csv = [parse_csv(_) for _ in fname]
+        csv = [parse_csv(_, parameters=parameters, cache=cache, block_lines=block_lines) for _ in fname]
         if merge:
             csv = merge_csv_data(*csv)
         return csv
 
-    lines = []
+    if parameters is not None:
+        parameters = sorted(ensure_list(parameters))
+    if cache:
+        cache_path = _csv_cache_path(fname, parameters)
+        data_ = _read_csv_cache(cache_path, fname)
+        if data_ is not None:
+            return data_
+
+    blocks = []
     with open(fname, 'r') as fd:
-        for line in fd.readlines():
-            if not line.startswith('#'):
-                lines.append(line.strip().split(','))
-    names = [field.split('.') for field in lines[0]]
-    data = np.array([[float(f) for f in line] for line in lines[1:]])
+        header = None
+        for line in fd:
+            if not line.startswith('#') and len(line.strip()) > 0:
+                header = line.strip().split(',')
+                break
+        if header is None:
+            return {}
+        n_cols = len(header)
+        names = [field.split('.') for field in header]
+        cols = None
+        if parameters is not None:
+            cols = [i for i, name in enumerate(names)
+                    if np.any([name[0].startswith(parameter) for parameter in parameters])]
+            names = [names[i] for i in cols]
+        lines = []
+        for line in fd:
+            if line.startswith('#'):
+                continue
+            line = line.strip()
+            if len(line) > 0:
+                lines.append(line)
+            if len(lines) >= block_lines:
+                blocks.append(_parse_csv_block(lines, n_cols, cols))
+                lines = []
+        if len(lines) > 0:
+            blocks.append(_parse_csv_block(lines, n_cols, cols))
+    if len(blocks) > 0:
+        data = np.concatenate(blocks, axis=0)
+    else:
+        data = np.zeros((0, len(names)))
+    del blocks
 
     namemap = {}
     maxdims = {}
@@ -55,7 +146,14 @@ def parse_csv(fname, merge=True):
     data_ = {}
     for name, idx in namemap.items():
         new_shape = (-1,) + maxdims.get(name, ())
-        data_[name] = data[:, idx].reshape(new_shape)
+        if idx == range(idx[0], idx[-1] + 1):
+            # Contiguous columns are sliced without copying
+            data_[name] = data[:, idx[0]:idx[-1] + 1].reshape(new_shape)
+        else:
+            data_[name] = data[:, idx].reshape(new_shape)
+
+    if cache:
+        _write_csv_cache(cache_path, data_)
 
     return data_
 
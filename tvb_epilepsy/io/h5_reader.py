@@ -12,6 +12,8 @@ from tvb_epilepsy.base.simulation_settings import SimulationSettings
 from tvb_epilepsy.base.utils.log_error_utils import initialize_logger
 from tvb_epilepsy.base.utils.data_structures_utils import isequal_string
 from tvb_epilepsy.io.h5_model import read_h5_model
+from tvb_epilepsy.io.head_cache import read_cached_head
+from tvb_epilepsy.io.h5_serializer import read_from_h5, is_serialized_h5
 
 
 class H5Reader(object):
@@ -189,11 +191,16 @@ class H5Reader(object):
 
         return data
 
-    def read_head(self, path):
+    def read_head(self, path, use_cache=False, cache_folder=None):
         """
         :param path: Path towards a custom head folder
+        :param use_cache: if True, read the head via the memory-mapped cache of read_cached_head,
+                          e.g., for many processes to share the same head
+        :param cache_folder: trusted parent folder of the cached heads (default: InputConfig.HEAD_CACHE_FOLDER)
         :return: Head object
         """
+        if use_cache:
+            return read_cached_head(self, path, cache_folder)
         self.logger.info("Starting to read Head from: %s" % path)
         conn = self.read_connectivity(os.path.join(path, self.connectivity_filename))
         srf = self.read_surface(os.path.join(path, self.cortical_surface_filename))
@@ -225,26 +232,76 @@ class H5Reader(object):
 
         return values
 
-    def read_timeseries(self, path):
+    def read_timeseries(self, path, dataset="/data", channels=None, start_time=None, end_time=None, stride=1):
         """
+        Reads only the selected channels and time window of a time series, so that only the corresponding
+        hyperslab of the dataset is read from disk.
         :param path: Path towards a valid TimeSeries H5 file
+        :param dataset: name of the time series dataset, of shape (time, channels, ...)
+        :param channels: indices of the channels to read, in the order they should be returned (default: all)
+        :param start_time: start of the time window to read (default: the start of the time series)
+        :param end_time: end (exclusive) of the time window to read (default: the end of the time series)
+        :param stride: step of time samples to read, for decimation
         :return: Timeseries data and time in 2 numpy arrays
         """
         self.logger.info("Starting to read TimeSeries from: %s" % path)
-        h5_file = h5py.File(path, 'r', libver='latest')
+        dataset = self.open_timeseries(path, dataset)
+        try:
+            time_steps = self._time_window_steps(dataset, start_time, end_time, stride)
+            time = self._timeseries_time(dataset)[time_steps]
+            if channels is None:
+                data = dataset[time_steps]
+            else:
+                # h5py reads only increasing and unique channel indices
+                channels = numpy.array(channels, dtype="i").flatten()
+                read_channels, order = numpy.unique(channels, return_inverse=True)
+                data = dataset[time_steps, read_channels.tolist()][:, order]
+        finally:
+            dataset.file.close()
 
-        data = h5_file['/data'][()]
-        total_time = int(h5_file["/"].attrs["Simulated_period"][0])
-        nr_of_steps = int(h5_file["/data"].attrs["Number_of_steps"][0])
-        start_time = float(h5_file["/data"].attrs["Start_time"][0])
-        time = numpy.linspace(start_time, total_time, nr_of_steps)
-
-        self.logger.info("First Channel sv sum: " + str(numpy.sum(data[:, 0])))
-        self.logger.info("Successfully read Timeseries!") #: %s" % data)
-        h5_file.close()
+        self.logger.info("Successfully read Timeseries!")
 
         return time, data
 
+    def open_timeseries(self, path, dataset="/data"):
+        """
+        :param path: Path towards a valid TimeSeries H5 file
+        :param dataset: name of the time series dataset
+        :return: lazy h5py dataset, of which any slice can be read. Close its file via dataset.file.close()
+        """
+        h5_file = h5py.File(path, 'r', libver='latest')
+        return h5_file[dataset]
+
+    def _time_window_steps(self, dataset, start_time=None, end_time=None, stride=1):
+        start_step = 0
+        end_step = dataset.shape[0]
+        if start_time is not None or end_time is not None:
+            time = self._timeseries_time(dataset)
+            if start_time is not None:
+                start_step = numpy.searchsorted(time, start_time, side="left")
+            if end_time is not None:
+                end_step = numpy.searchsorted(time, end_time, side="left")
+        return slice(int(start_step), int(end_step), int(stride))
+
+    def _timeseries_time(self, dataset):
+        # Time vector of the dataset, from its start time and sampling period,
+        # or, for files without a sampling period, from the total simulated period of the file
+        n_steps = dataset.shape[0]
+        start_time = float(self._read_attribute(dataset.attrs, "Start_time", 0.0))
+        sampling_period = self._read_attribute(dataset.attrs, "Sampling_period")
+        if sampling_period is None:
+            total_time = int(self._read_attribute(dataset.file["/"].attrs, "Simulated_period"))
+            return numpy.linspace(start_time, total_time, n_steps)
+        return start_time + float(sampling_period) * numpy.arange(n_steps)
+
+    @staticmethod
+    def _read_attribute(attrs, key, default=None):
+        value = attrs.get(key, default)
+        # Some writers store scalar attributes as arrays of one element
+        if isinstance(value, numpy.ndarray) and value.size == 1:
+            value = value.flatten()[0]
+        return value
+
     def read_hypothesis(self, path):
         """
         :param path: Path towards a Hypothesis H5 file
@@ -340,9 +397,11 @@ class H5Reader(object):
             model_inversions_service.dict["signals_inds"] = model_inversions_service.dict["signals_inds"].tolist()
         return model_inversions_service
 
-    def read_dictionary(self, path, type="dict"):
+    def read_dictionary(self, path, type="dict", lazy=False):
         """
         :param path: Path towards a dictionary H5 file
+        :param lazy: if True, datasets are returned as lazy h5py datasets of the file kept open for reading,
+                     so that only the slices needed are read later. Close the file via dataset.file.close()
         :return: dict
         """
         self.logger.info("Starting to read a dictionary from: %s" % path)
@@ -350,12 +409,16 @@ class H5Reader(object):
 
         dictionary = dict()
         for dataset in h5_file.keys():
-            dictionary.update({dataset: h5_file["/" + dataset][()]})
+            if lazy:
+                dictionary.update({dataset: h5_file["/" + dataset]})
+            else:
+                dictionary.update({dataset: h5_file["/" + dataset][()]})
 
         for attr in h5_file.attrs.keys():
             dictionary.update({attr: h5_file.attrs[attr]})
 
-        h5_file.close()
+        if not lazy:
+            h5_file.close()
         if isequal_string(type, "DictDot"):
             return DictDot(dictionary)
         elif isequal_string(type, "OrderedDictDot"):
@@ -382,4 +445,12 @@ class H5Reader(object):
         return sim_settings
 
     def read_generic(self, path, obj=None, output_shape=None):
+        """
+        :param path: Path towards an H5 file written by H5Writer.write_generic
+        :param obj: for files of the older H5Model format only, an object to be updated by the file's contents
+        :param output_shape: for files of the older H5Model format only, the shape of an array to be read
+        :return: the object written
+        """
+        if is_serialized_h5(path):
+            return read_from_h5(path)
         return read_h5_model(path).convert_from_h5_model(obj, output_shape)
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+Flat serialization of objects to H5 files, with one group per (container) object,
+arrays written in bulk as datasets and scalars as attributes of the group of their container.
+Writing and reading are linear in the size of the object, and no code strings are executed.
+"""
+
+import logging
+from collections import OrderedDict
+from importlib import import_module
+import h5py
+import numpy
+from tvb_epilepsy.base.utils.log_error_utils import initialize_logger
+
+
+logger = initialize_logger(__name__)
+
+# Reserved attributes of every group
+TYPE_KEY = "__type__"
+NAMES_KEY = "__names__"
+NONE_KEY = "__none__"
+INT_KEYS_KEY = "__int_keys__"
+SHAPE_KEY = "__shape__"
+
+
+def _stochastic_parameter_instance(entries):
+    from tvb_epilepsy.service.stochastic_parameter_builder import stochastic_parameter_class
+    StochasticParameter = stochastic_parameter_class(entries["type"])
+    return StochasticParameter.__new__(StochasticParameter)
+
+
+# Schema of the types that are reconstructed when read:
+# either the module the class is defined in, or a function of the read attributes that returns an empty instance.
+# Objects of any other type are read as OrderedDictDot of their attributes.
+H5_SERIALIZABLE_TYPES = {
+    "DictDot": "tvb_epilepsy.base.types",
+    "OrderedDictDot": "tvb_epilepsy.base.types",
+    "DiseaseHypothesis": "tvb_epilepsy.base.model.disease_hypothesis",
+    "ModelConfiguration": "tvb_epilepsy.base.model.model_configuration",
+    "Parameter": "tvb_epilepsy.base.model.parameter",
+    "StochasticParameter": _stochastic_parameter_instance,
+    "StatisticalModel": "tvb_epilepsy.base.model.statistical_models.statistical_model",
+    "ODEStatisticalModel": "tvb_epilepsy.base.model.statistical_models.ode_statistical_model",
+    "SDEStatisticalModel": "tvb_epilepsy.base.model.statistical_models.sde_statistical_model",
+    "SimulationSettings": "tvb_epilepsy.base.simulation_settings",
+    "ModelConfigurationBuilder": "tvb_epilepsy.service.model_configuration_builder",
+    "LSAService": "tvb_epilepsy.service.lsa_service",
+    "LSAPSEService": "tvb_epilepsy.service.pse.lsa_pse_service",
+    "SimulationPSEService": "tvb_epilepsy.service.pse.simulation_pse_service",
+    "SensitivityAnalysisService": "tvb_epilepsy.service.sensitivity_analysis_service",
+}
+
+
+def _h5_name(key):
+    return str(key).replace("/", "%2F")
+
+
+def _skip(key, value):
+    # Loggers, functions, methods, classes and modules are not serialized
+    return (isinstance(key, basestring) and (key.find("logger") >= 0 or key.find("LOG") >= 0)) \
+           or isinstance(value, logging.Logger) or callable(value) or type(value).__name__ == "module"
+
+
+def _is_scalar(value):
+    return isinstance(value, (bool, int, long, float, complex, basestring, numpy.generic))
+
+
+def _write_array(group, name, value, type_str):
+    if value.dtype.kind == "U":
+        value = value.astype("S")
+    dataset = group.create_dataset(name, data=value)
+    dataset.attrs[TYPE_KEY] = type_str
+
+
+def _write_entries(group, entries, in_progress):
+    names = []
+    none_names = []
+    int_keys = []
+    for key, value in entries:
+        if _skip(key, value):
+            continue
+        name = _h5_name(key)
+        names.append(name)
+        if isinstance(key, (int, long)):
+            int_keys.append(name)
+        if value is None:
+            none_names.append(name)
+        elif _is_scalar(value):
+            group.attrs[name] = value
+        else:
+            write_object(group, name, value, in_progress)
+    group.attrs[NAMES_KEY] = numpy.array(names, dtype="S")
+    if len(none_names) > 0:
+        group.attrs[NONE_KEY] = numpy.array(none_names, dtype="S")
+    if len(int_keys) > 0:
+        group.attrs[INT_KEYS_KEY] = numpy.array(int_keys, dtype="S")
+
+
+def write_object(parent, name, obj, in_progress=None):
+    """
+    Writes a non scalar object as a dataset or group named name of the parent H5 group
+    :param parent: h5py group (or file)
+    :param name: name of the object in the parent group
+    :param obj: dictionary, list, tuple, numpy.ndarray or any object with a __dict__
+    :param in_progress: ids of the containers of obj, to skip circular references
+    """
+    if in_progress is None:
+        in_progress = set()
+    type_str = obj.__class__.__name__
+    if isinstance(obj, numpy.ndarray) and obj.dtype.kind != "O":
+        _write_array(parent, name, obj, "ndarray")
+        return
+    if isinstance(obj, (list, tuple)) and len(obj) > 0:
+        array = numpy.array(obj)
+        if array.dtype.kind in "biufcSU" and array.ndim > 0:
+            try:
+                _write_array(parent, name, array, type_str)
+                return
+            except Exception:
+                if name in parent:
+                    del parent[name]
+    if id(obj) in in_progress:
+        logger.warning("Skipping circular reference to object " + name + " of type " + type_str + "!")
+        return
+    in_progress.add(id(obj))
+    group = parent.create_group(name)
+    group.attrs[TYPE_KEY] = type_str
+    if isinstance(obj, numpy.ndarray):
+        group.attrs[SHAPE_KEY] = obj.shape
+        _write_entries(group, enumerate(obj.flatten().tolist()), in_progress)
+    elif isinstance(obj, (list, tuple)):
+        _write_entries(group, enumerate(obj), in_progress)
+    elif isinstance(obj, dict):
+        _write_entries(group, obj.iteritems(), in_progress)
+    elif hasattr(obj, "__dict__"):
+        _write_entries(group, vars(obj).iteritems(), in_progress)
+    else:
+        logger.warning("Object " + name + " of type " + type_str + " cannot be serialized!")
+    in_progress.remove(id(obj))
+
+
+def _read_value(value):
+    if isinstance(value, numpy.generic):
+        value = value.item()
+    # Read nan as the numpy.nan object, so that it compares equal to itself inside containers, as when written
+    if isinstance(value, float) and numpy.isnan(value):
+        return numpy.nan
+    return value
+
+
+def _read_entries(group):
+    none_names = set(group.attrs.get(NONE_KEY, []))
+    int_keys = set(group.attrs.get(INT_KEYS_KEY, []))
+    entries = []
+    for name in group.attrs.get(NAMES_KEY, []):
+        if name in none_names:
+            value = None
+        elif name in group:
+            value = read_object(group[name])
+        else:
+            value = _read_value(group.attrs[name])
+        key = name.replace("%2F", "/")
+        if name in int_keys:
+            key = int(key)
+        entries.append((key, value))
+    return entries
+
+
+def _create_instance(type_str, entries):
+    schema = H5_SERIALIZABLE_TYPES.get(type_str, None)
+    if schema is None:
+        return None
+    try:
+        if callable(schema):
+            return schema(dict(entries))
+        object_class = getattr(import_module(schema), type_str)
+        return object_class.__new__(object_class)
+    except Exception, e:
+        logger.warning("Failed to create an object of type " + type_str + ": " + str(e) +
+                       "\nReading it as a dictionary instead!")
+        return None
+
+
+def read_object(node):
+    """
+    :param node: h5py dataset or group written by write_object
+    :return: the object written
+    """
+    type_str = node.attrs.get(TYPE_KEY, "ndarray")
+    if isinstance(node, h5py.Dataset):
+        value = node[()]
+        if type_str == "list":
+            return value.tolist()
+        elif type_str == "tuple":
+            return tuple(value.tolist())
+        return value
+    entries = _read_entries(node)
+    if type_str in ["list", "tuple"]:
+        values = [value for key, value in entries]
+        return values if type_str == "list" else tuple(values)
+    elif type_str == "ndarray":
+        array = numpy.empty((len(entries),), dtype="O")
+        array[:] = [value for key, value in entries]
+        return array.reshape(tuple(node.attrs[SHAPE_KEY]))
+    elif type_str == "dict":
+        return dict(entries)
+    elif type_str == "OrderedDict":
+        return OrderedDict(entries)
+    obj = _create_instance(type_str, entries)
+    if obj is None:
+        from tvb_epilepsy.base.types import OrderedDictDot
+        return OrderedDictDot(OrderedDict(entries))
+    obj.__dict__.update(entries)
+    return obj
+
+
+def write_to_h5(obj, path, metadata={}):
+    """
+    :param obj: object to write at the root group of a new H5 file
+    :param path: H5 path to be written
+    :param metadata: dictionary of additional attributes of the root group
+    """
+    h5_file = h5py.File(path, 'w', libver='latest')
+    try:
+        in_progress = set([id(obj)])
+        h5_file.attrs[TYPE_KEY] = obj.__class__.__name__
+        if isinstance(obj, dict):
+            _write_entries(h5_file, obj.iteritems(), in_progress)
+        elif isinstance(obj, (list, tuple)):
+            _write_entries(h5_file, enumerate(obj), in_progress)
+        else:
+            _write_entries(h5_file, vars(obj).iteritems(), in_progress)
+        for key, value in metadata.iteritems():
+            h5_file.attrs[key] = value
+    finally:
+        h5_file.close()
+
+
+def read_from_h5(path):
+    """
+    :param path: H5 path written by write_to_h5
+    :return: the object written
+    """
+    h5_file = h5py.File(path, 'r', libver='latest')
+    try:
+        return read_object(h5_file)
+    finally:
+        h5_file.close()
+
+
+def is_serialized_h5(path):
+    h5_file = h5py.File(path, 'r', libver='latest')
+    try:
+        return TYPE_KEY in h5_file.attrs
+    finally:
+        h5_file.close()
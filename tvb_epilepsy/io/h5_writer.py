@@ -3,7 +3,7 @@ import h5py
 import numpy
 from tvb_epilepsy.base.utils.log_error_utils import raise_error, raise_value_error
 from tvb_epilepsy.base.utils.file_utils import change_filename_or_overwrite, write_metadata
-from tvb_epilepsy.io.h5_model import convert_to_h5_model
+from tvb_epilepsy.io.h5_serializer import write_to_h5
 from tvb_epilepsy.base.model.vep.connectivity import ConnectivityH5Field
 from tvb_epilepsy.base.model.vep.sensors import SensorsH5Field
 from tvb_epilepsy.base.model.vep.surface import SurfaceH5Field
@@ -22,6 +22,118 @@ KEY_STEPS = "Number_of_steps"
 KEY_SAMPLING = "Sampling_period"
 KEY_START = "Start_time"
 
+# Default size in bytes of the time-major chunks of the time series datasets
+TS_CHUNK_BYTES = 2 ** 20
+
+
+class H5TimeSeriesWriter(object):
+    """
+    Writes time series to an H5 file by appending blocks of time samples to resizable, chunked and compressed
+    datasets, so that the whole time series never needs to be in memory.
+    Max/min values and number of steps of every dataset are updated incrementally with every block.
+    Use it as a context manager, or close() it when done.
+    """
+    logger = initialize_logger(__name__)
+
+    def __init__(self, path, sampling_period, start_time=0.0, compression="gzip", compression_opts=None,
+                 chunk_length=None, chunk_bytes=TS_CHUNK_BYTES, overwrite=True):
+        """
+        :param path: H5 path to be written
+        :param sampling_period: sampling period of the time series
+        :param compression: h5py compression filter of the datasets (e.g., "gzip", "lzf"), or None
+        :param compression_opts: options of the compression filter, e.g., the gzip level
+        :param chunk_length: maximum number of time samples per chunk
+        :param chunk_bytes: approximate size in bytes of each chunk, which spans all channels of chunk_length samples
+        :param overwrite: if False, the datasets are added to an already existing file
+        """
+        if overwrite:
+            path = change_filename_or_overwrite(path)
+        self.path = path
+        self.sampling_period = sampling_period
+        self.start_time = start_time
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.chunk_length = chunk_length
+        self.chunk_bytes = chunk_bytes
+        self._datasets = []
+        self._max = {}
+        self._min = {}
+        self.h5_file = h5py.File(path, 'a', libver='latest')
+        write_metadata({KEY_TYPE: "TimeSeries"}, self.h5_file, KEY_DATE, KEY_VERSION)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def create_dataset(self, name, sample_shape, dtype="float64"):
+        """
+        :param name: name of the dataset
+        :param sample_shape: shape of every time sample, e.g., (channels,) or (regions, state variables)
+        :param dtype: data type of the dataset
+        :return: the empty, resizable along time, h5py dataset
+        """
+        if name in self.h5_file:
+            raise_value_error("Dataset " + name + " already exists in file " + self.path + "!", self.logger)
+        sample_shape = tuple(sample_shape)
+        sample_bytes = max(1, int(numpy.prod(sample_shape)) * numpy.dtype(dtype).itemsize)
+        chunk_length = max(1, self.chunk_bytes / sample_bytes)
+        if self.chunk_length is not None:
+            chunk_length = max(1, min(chunk_length, int(self.chunk_length)))
+        dataset = self.h5_file.create_dataset(name, shape=(0,) + sample_shape, maxshape=(None,) + sample_shape,
+                                              chunks=(chunk_length,) + sample_shape, dtype=dtype,
+                                              compression=self.compression, compression_opts=self.compression_opts)
+        self._datasets.append(dataset.name)
+        self._write_dataset_metadata(dataset)
+        return dataset
+
+    def append(self, name, data):
+        """
+        :param name: name of the dataset, which is created by the first block if it doesn't exist
+        :param data: block of time samples of shape (time,) + sample_shape
+        """
+        data = numpy.asarray(data)
+        if name not in self.h5_file:
+            self.create_dataset(name, data.shape[1:], data.dtype)
+        dataset = self.h5_file[name]
+        if dataset.name not in self._datasets:
+            # Continue appending to a dataset of an already existing file
+            self._datasets.append(dataset.name)
+            if KEY_MAX in dataset.attrs:
+                self._max[dataset.name] = dataset.attrs[KEY_MAX]
+                self._min[dataset.name] = dataset.attrs[KEY_MIN]
+        if data.shape[1:] != dataset.shape[1:]:
+            raise_value_error("Time samples of shape " + str(data.shape[1:]) + " cannot be appended to dataset "
+                              + name + " of samples of shape " + str(dataset.shape[1:]) + "!", self.logger)
+        if data.shape[0] == 0:
+            return
+        n_steps = dataset.shape[0]
+        dataset.resize(n_steps + data.shape[0], axis=0)
+        dataset[n_steps:] = data
+        if data.dtype.kind in "fiu":
+            self._max[dataset.name] = max(self._max.get(dataset.name, data.max()), data.max())
+            self._min[dataset.name] = min(self._min.get(dataset.name, data.min()), data.min())
+
+    def _write_dataset_metadata(self, dataset):
+        sample_shape = dataset.shape[1:]
+        metadata = {KEY_STEPS: dataset.shape[0], KEY_SAMPLING: self.sampling_period, KEY_START: self.start_time}
+        if len(sample_shape) > 0:
+            metadata.update({KEY_CHANNELS: sample_shape[0], KEY_SV: sample_shape[1] if len(sample_shape) == 2 else 1})
+        if dataset.name in self._max:
+            metadata.update({KEY_MAX: self._max[dataset.name], KEY_MIN: self._min[dataset.name]})
+        write_metadata(metadata, self.h5_file, KEY_DATE, KEY_VERSION, dataset.name)
+
+    def flush(self):
+        for name in self._datasets:
+            self._write_dataset_metadata(self.h5_file[name])
+        self.h5_file.flush()
+
+    def close(self):
+        if self.h5_file:
+            self.flush()
+            self.h5_file.close()
+
 
 class H5Writer(object):
     logger = initialize_logger(__name__)
@@ -302,7 +414,17 @@ class H5Writer(object):
 
         h5_file.close()
 
-    def write_ts_seeg_epi(self, seeg_data, sampling_period, path):
+    def open_ts(self, path, sampling_period, **kwargs):
+        """
+        :param path: H5 path to be written
+        :param sampling_period: sampling period of the time series
+        :param kwargs: compression, chunking etc options of H5TimeSeriesWriter
+        :return: H5TimeSeriesWriter to append blocks of time samples to
+        """
+        self.logger.info("Writing a TS at:\n" + path)
+        return H5TimeSeriesWriter(path, sampling_period, **kwargs)
+
+    def write_ts_seeg_epi(self, seeg_data, sampling_period, path, **kwargs):
         if not os.path.exists(path):
             raise_error("TS file %s does not exist. First define the raw data!" + path, self.logger)
             return
@@ -310,16 +432,12 @@ class H5Writer(object):
 
         self.logger.info("Writing a TS at:\n" + path + ", " + sensors_name)
         try:
-            h5_file = h5py.File(path, 'a', libver='latest')
-            h5_file.create_dataset("/" + sensors_name, data=seeg_data)
-            write_metadata({KEY_MAX: seeg_data.max(), KEY_MIN: seeg_data.min(), KEY_STEPS: seeg_data.shape[0],
-                            KEY_CHANNELS: seeg_data.shape[1], KEY_SV: 1, KEY_SAMPLING: sampling_period, KEY_START: 0.0},
-                           h5_file, KEY_DATE, KEY_VERSION, "/" + sensors_name)
-            h5_file.close()
+            with H5TimeSeriesWriter(path, sampling_period, overwrite=False, **kwargs) as ts_writer:
+                ts_writer.append("/" + sensors_name, seeg_data)
         except Exception, e:
-            raise_error(e + "\nSeeg dataset already written as " + sensors_name, self.logger)
+            raise_error(str(e) + "\nSeeg dataset already written as " + sensors_name, self.logger)
 
-    def write_ts_epi(self, raw_data, sampling_period, path, lfp_data=None):
+    def write_ts_epi(self, raw_data, sampling_period, path, lfp_data=None, **kwargs):
         path = change_filename_or_overwrite(os.path.join(path))
 
         if raw_data is None or len(raw_data.shape) != 3:
@@ -334,57 +452,37 @@ class H5Writer(object):
             lfp_data = lfp_data.reshape((lfp_data.shape[0], lfp_data.shape[1], 1))
         else:
             raise_value_error("Invalid lfp_data 3D (time, regions, sv) expected", self.logger)
-        h5_file = h5py.File(path, 'a', libver='latest')
-        h5_file.create_dataset("/data", data=raw_data)
-        h5_file.create_dataset("/lfpdata", data=lfp_data)
-        write_metadata({KEY_TYPE: "TimeSeries"}, h5_file, KEY_DATE, KEY_VERSION)
-        write_metadata({KEY_MAX: raw_data.max(), KEY_MIN: raw_data.min(), KEY_STEPS: raw_data.shape[0],
-                        KEY_CHANNELS: raw_data.shape[1], KEY_SV: raw_data.shape[2], KEY_SAMPLING: sampling_period,
-                        KEY_START: 0.0}, h5_file, KEY_DATE, KEY_VERSION, "/data")
-        write_metadata({KEY_MAX: lfp_data.max(), KEY_MIN: lfp_data.min(), KEY_STEPS: lfp_data.shape[0],
-                        KEY_CHANNELS: lfp_data.shape[1], KEY_SV: 1, KEY_SAMPLING: sampling_period, KEY_START: 0.0},
-                       h5_file, KEY_DATE, KEY_VERSION, "/lfpdata")
-        h5_file.close()
+        with H5TimeSeriesWriter(path, sampling_period, **kwargs) as ts_writer:
+            ts_writer.append("/data", raw_data)
+            ts_writer.append("/lfpdata", lfp_data)
 
-    def write_ts(self, raw_data, sampling_period, path):
-        path = change_filename_or_overwrite(path)
-
-        self.logger.info("Writing a TS at:\n" + path)
-        h5_file = h5py.File(path, 'a', libver='latest')
-        write_metadata({KEY_TYPE: "TimeSeries"}, h5_file, KEY_DATE, KEY_VERSION)
+    def write_ts(self, raw_data, sampling_period, path, **kwargs):
         if isinstance(raw_data, dict):
-            for data in raw_data:
-                if len(raw_data[data].shape) == 2 and str(raw_data[data].dtype)[0] == "f":
-                    h5_file.create_dataset("/" + data, data=raw_data[data])
-                    write_metadata({KEY_MAX: raw_data[data].max(), KEY_MIN: raw_data[data].min(),
-                                    KEY_STEPS: raw_data[data].shape[0], KEY_CHANNELS: raw_data[data].shape[1],
-                                    KEY_SV: 1, KEY_SAMPLING: sampling_period, KEY_START: 0.0}, h5_file, KEY_DATE,
-                                   KEY_VERSION, "/" + data)
-                else:
+            for data in raw_data.values():
+                if not (len(data.shape) == 2 and str(data.dtype)[0] == "f"):
                     raise_value_error("Invalid TS data. 2D (time, nodes) numpy.ndarray of floats expected")
         elif isinstance(raw_data, numpy.ndarray):
-            if len(raw_data.shape) != 2 and str(raw_data.dtype)[0] != "f":
-                h5_file.create_dataset("/data", data=raw_data)
-                write_metadata({KEY_MAX: raw_data.max(), KEY_MIN: raw_data.min(), KEY_STEPS: raw_data.shape[0],
-                                KEY_CHANNELS: raw_data.shape[1], KEY_SV: 1, KEY_SAMPLING: sampling_period,
-                                KEY_START: 0.0}, h5_file, KEY_DATE, KEY_VERSION, "/data")
-            else:
+            if len(raw_data.shape) != 2 or str(raw_data.dtype)[0] != "f":
                 raise_value_error("Invalid TS data. 2D (time, nodes) numpy.ndarray of floats expected")
+            raw_data = {"data": raw_data}
         else:
             raise_value_error("Invalid TS data. Dictionary or 2D (time, nodes) numpy.ndarray of floats expected")
-        h5_file.close()
+
+        self.logger.info("Writing a TS at:\n" + path)
+        with H5TimeSeriesWriter(path, sampling_period, **kwargs) as ts_writer:
+            for data in raw_data:
+                ts_writer.append("/" + data, raw_data[data])
 
     def write_generic(self, object, folder, path):
         """
-        :param object:
-        :param path:H5 path to be written
+        :param object: object to be written, with one H5 group per (container) object
+        :param folder: folder of the H5 file
+        :param path: H5 path to be written, relative to folder
         """
-        h5_model = convert_to_h5_model(object)
-
-        h5_model.add_or_update_metadata_attribute(self.H5_TYPE_ATTRIBUTE, "HypothesisModel")
-        h5_model.add_or_update_metadata_attribute(self.H5_SUBTYPE_ATTRIBUTE, object.__class__.__name__)
-
-        h5_model.write_to_h5(folder, path)
+        path = change_filename_or_overwrite(os.path.join(folder, path))
+        self.logger.info("Writing %s at: %s" % (object.__class__.__name__, path))
+        write_to_h5(object, path, {self.H5_TYPE_ATTRIBUTE: "HypothesisModel",
+                                   self.H5_SUBTYPE_ATTRIBUTE: object.__class__.__name__})
 
     def _determine_datasets_and_attributes(self, object):
         datasets_dict = {}
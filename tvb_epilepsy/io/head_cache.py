@@ -0,0 +1,144 @@
+"""
+Cache of preprocessed Head objects (i.e., with normalized connectivity weights and sensors' gain matrices),
+persisted once in a memory-mappable layout: one .npy file per large array, and a pickle of the rest of the head.
+Processes reading a cached head map its arrays from the same files, sharing the OS page cache,
+instead of re-reading the head files and recomputing its derived arrays into private memory.
+"""
+
+import os
+import shutil
+import hashlib
+import cPickle as pickle
+import numpy
+from tvb_epilepsy.base.constants.config import InputConfig
+from tvb_epilepsy.base.utils.log_error_utils import initialize_logger
+
+
+logger = initialize_logger(__name__)
+
+HEAD_PICKLE = "head.pkl"
+# Arrays smaller than this number of bytes are just pickled
+MIN_MMAP_BYTES = 4096
+
+
+def write_head_cache(head, folder):
+    """
+    :param head: Head object to cache
+    :param folder: folder to create, with the pickled head and its large arrays as .npy files
+    """
+    # Write to a temporary folder first, so that concurrent processes never read a partial cache
+    temp_folder = folder + ".%d.tmp" % os.getpid()
+    if os.path.isdir(temp_folder):
+        shutil.rmtree(temp_folder)
+    os.makedirs(temp_folder)
+    array_files = []
+
+    def persistent_id(obj):
+        if isinstance(obj, numpy.ndarray) and obj.dtype.kind != "O" and obj.nbytes >= MIN_MMAP_BYTES:
+            array_file = "array%d.npy" % len(array_files)
+            numpy.save(os.path.join(temp_folder, array_file), obj)
+            array_files.append(array_file)
+            return array_file
+        return None
+
+    with open(os.path.join(temp_folder, HEAD_PICKLE), "wb") as f:
+        pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = persistent_id
+        pickler.dump(head)
+    try:
+        os.rename(temp_folder, folder)
+    except OSError:
+        # Another process has already written the same cache
+        shutil.rmtree(temp_folder)
+
+
+def read_head_cache(folder, mmap_mode="c"):
+    """
+    :param folder: folder written by write_head_cache
+    :param mmap_mode: numpy.load memory map mode of the head's large arrays:
+                      "c" (default) for copy-on-write, i.e., only the pages modified by a process are copied,
+                      "r" for read-only arrays, or None to load them in memory
+    :return: Head object
+    """
+    def persistent_load(array_file):
+        return numpy.load(os.path.join(folder, array_file), mmap_mode=mmap_mode)
+
+    with open(os.path.join(folder, HEAD_PICKLE), "rb") as f:
+        unpickler = pickle.Unpickler(f)
+        unpickler.persistent_load = persistent_load
+        return unpickler.load()
+
+
+def _head_cache_key(reader, head_folder, kwargs):
+    # The cache is invalidated by any change of the head folder's files
+    head_folder = os.path.abspath(head_folder)
+    files = []
+    for head_file in sorted(os.listdir(head_folder)):
+        stat = os.stat(os.path.join(head_folder, head_file))
+        files.append((head_file, stat.st_size, stat.st_mtime))
+    return str((reader.__class__.__name__, head_folder, files, sorted(kwargs.items())))
+
+
+def read_cached_head(reader, head_folder, cache_folder=None, mmap_mode="c", **kwargs):
+    """
+    Reads a head via the cache, creating it with reader.read_head(head_folder, **kwargs) the first time.
+    :param reader: H5Reader or TVBReader
+    :param head_folder: head folder to read
+    :param cache_folder: trusted parent folder of the cached heads (default: InputConfig.HEAD_CACHE_FOLDER),
+                         if None, the head is read without caching it
+    :param mmap_mode: memory map mode of the head's arrays, see read_head_cache
+    :return: Head object
+    """
+    if cache_folder is None:
+        cache_folder = InputConfig.HEAD_CACHE_FOLDER
+    if cache_folder is None:
+        logger.warning("No head cache folder is set! Reading the head without caching it...")
+        return reader.read_head(head_folder, **kwargs)
+    folder = os.path.join(cache_folder, "head_" + hashlib.md5(_head_cache_key(reader, head_folder, kwargs)).hexdigest())
+    if os.path.isdir(folder):
+        try:
+            return read_head_cache(folder, mmap_mode)
+        except Exception as e:
+            logger.warning("Failed to read cached head " + folder + "!\n" + str(e))
+            shutil.rmtree(folder, ignore_errors=True)
+    head = reader.read_head(head_folder, **kwargs)
+    try:
+        if not (os.path.isdir(cache_folder)):
+            os.makedirs(cache_folder)
+        write_head_cache(head, folder)
+        return read_head_cache(folder, mmap_mode)
+    except Exception as e:
+        logger.warning("Failed to cache head to " + folder + "!\n" + str(e))
+        return head
+
+
+class MemmapReference(object):
+    """
+    Picklable reference to an array of a cached head, for other processes (e.g., the workers of a PSE pool)
+    to memory map the same .npy file, instead of receiving a pickled copy of the array.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def load(self, mmap_mode="c"):
+        return numpy.load(self.filename, mmap_mode=mmap_mode)
+
+
+def memmap_reference(array):
+    """
+    :param array: any object, e.g., the connectivity weights of a head read by read_cached_head
+    :return: MemmapReference if array is the unmodified memory map of a whole .npy file, otherwise None
+    """
+    filename = getattr(array, "filename", None)
+    if not (isinstance(array, numpy.memmap)) or filename is None or not (filename.endswith(".npy")):
+        return None
+    try:
+        mapped = numpy.load(filename, mmap_mode="r")
+    except Exception:
+        return None
+    # Exclude views of part of the file, and copy-on-write arrays modified by this process
+    if mapped.shape != array.shape or mapped.dtype != array.dtype or mapped.strides != array.strides or \
+            not (numpy.array_equal(mapped, array)):
+        return None
+    return MemmapReference(filename)
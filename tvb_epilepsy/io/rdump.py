@@ -1,56 +1,219 @@
+"""
+Model data files in R dump and JSON format, as read by CmdStan.
+Arrays are formatted and parsed in bulk by numpy, instead of one Python call per element,
+and files can be cached by a hash of their data content, so that unchanged data is not rewritten.
+"""
+
+import os
+import re
+import json
+import hashlib
 import numpy as np
 
+# Representation of non finite values
+R_NON_FINITE = {"nan": "NaN", "inf": "Inf", "-inf": "-Inf"}
+JSON_NON_FINITE = {"nan": "NaN", "inf": "Infinity", "-inf": "-Infinity"}
+
+R_STRUCTURE = re.compile(r"structure\(\s*c\((.*)\)\s*,\s*\.Dim\s*=\s*c\((.*)\)\s*\)$")
+
+
+def _value_format(val):
+    if val.dtype.kind in "biu":
+        return "%d"
+    elif val.dtype == np.float32:
+        return "%.9g"
+    return "%.17g"
+
+
+def _write_values(fd, val, non_finite):
+    # Writes all values of val, comma separated, in C order
+    fmt = _value_format(val)
+    if val.dtype.kind in "fc" and not np.all(np.isfinite(val)):
+        values = [fmt % v for v in val.flatten().tolist()]
+        fd.write(", ".join([non_finite.get(v, v) for v in values]))
+    else:
+        val.tofile(fd, sep=", ", format=fmt)
+
+
+def _scalar(val):
+    try:
+        val = val.flat[0]
+    except:
+        pass
+    return val
+
+
+def _format_scalar(val, non_finite):
+    if isinstance(val, (bool, np.bool_)):
+        return str(int(val))
+    elif isinstance(val, (float, np.floating)):
+        val = repr(val)
+        return non_finite.get(val, val)
+    return str(val)
+
 
-def _rdump_array(key, val):
-    c = 'c(' + ', '.join(map(str, val.T.flat)) + ')'
-    if (val.size,) == val.shape:
-        return '{key} <- {c}'.format(key=key, c=c)
+def _rdump_array(fd, key, val):
+    if val.size == 0:
+        fd.write('{key} <- {empty}(0)'.format(key=key, empty="integer" if val.dtype.kind in "biu" else "double"))
+        return
+    structure = (val.size,) != val.shape
+    if structure:
+        fd.write('{key} <- structure(c('.format(key=key))
     else:
-        dim = '.Dim = c{0}'.format(val.shape)
-        struct = '{key} <- structure({c}, {dim})'.format(
-            key=key, c=c, dim=dim)
-        return struct
+        fd.write('{key} <- c('.format(key=key))
+    # R arrays are in column major order
+    _write_values(fd, val.T, R_NON_FINITE)
+    if structure:
+        fd.write('), .Dim = c({dim}))'.format(dim=", ".join([str(d) for d in val.shape])))
+    else:
+        fd.write(')')
+
+
+def _json_array(fd, val):
+    # JSON arrays are nested in row major order
+    fd.write('[')
+    if val.ndim <= 1:
+        _write_values(fd, val, JSON_NON_FINITE)
+    else:
+        for i_row, row in enumerate(val):
+            if i_row > 0:
+                fd.write(', ')
+            _json_array(fd, row)
+    fd.write(']')
+
+
+def data_hash(data):
+    """
+    :param data: dict of model data
+    :return: md5 hex digest of the keys, types, shapes and values of data
+    """
+    md5 = hashlib.md5()
+    # The order of the keys does not matter to CmdStan
+    for key in sorted(data.keys()):
+        val = np.asarray(data[key])
+        md5.update(str(key) + str(val.dtype) + str(val.shape))
+        if val.dtype.kind == "O":
+            md5.update(repr(val.tolist()))
+        else:
+            md5.update(np.ascontiguousarray(val).tobytes())
+    return md5.hexdigest()
+
+
+def _hash_path(filepath):
+    return os.path.join(os.path.dirname(filepath), "." + os.path.basename(filepath) + ".md5")
+
 
+def _cached_write(write, filepath, data, cache):
+    # Returns False if filepath already holds data, True if it is (re)written
+    hash_path = _hash_path(filepath)
+    if cache:
+        md5 = data_hash(data)
+        if os.path.isfile(filepath) and os.path.isfile(hash_path):
+            with open(hash_path, 'r') as fd:
+                if fd.read().strip() == md5:
+                    return False
+    elif os.path.isfile(hash_path):
+        # The file is going to hold other data than the hashed one
+        os.remove(hash_path)
+    # Write to a temporary file first, so that a running fit never reads a partial file
+    temp_path = filepath + ".%d.tmp" % os.getpid()
+    with open(temp_path, 'w') as fd:
+        write(fd, data)
+    os.rename(temp_path, filepath)
+    if cache:
+        with open(hash_path, 'w') as fd:
+            fd.write(md5)
+    return True
 
-def rdump(filepath, data):
+
+def _rdump(fd, data):
+    for key, val in data.items():
+        if isinstance(val, np.ndarray) and val.size != 1:
+            _rdump_array(fd, key, val)
+        else:
+            fd.write('%s <- %s' % (key, _format_scalar(_scalar(val), R_NON_FINITE)))
+        fd.write('\n')
+
+
+def rdump(filepath, data, cache=False):
     """Dump a dict of data to a R dump format file.
+    :param cache: if True, the file is not rewritten when it already holds the same data
+    :return: True if the file was written
     """
-    with open(filepath, 'w') as fd:
-        for key, val in data.items():
-            if isinstance(val, np.ndarray) and val.size > 1:
-                line = _rdump_array(key, val)
-            else:
-                try:
-                    val = val.flat[0]
-                except:
-                    pass
-                line = '%s <- %s' % (key, val)
-            fd.write(line)
-            fd.write('\n')
+    return _cached_write(_rdump, filepath, data, cache)
+
+
+def _json_dump(fd, data):
+    fd.write('{\n')
+    for i_key, (key, val) in enumerate(data.items()):
+        if i_key > 0:
+            fd.write(',\n')
+        fd.write('%s: ' % json.dumps(str(key)))
+        # Unlike the R dump, JSON keeps the dimensions of single element arrays, e.g., of a vector of size 1
+        if isinstance(val, np.ndarray) and val.ndim > 0:
+            _json_array(fd, val)
+        else:
+            fd.write(_format_scalar(_scalar(val), JSON_NON_FINITE))
+    fd.write('\n}\n')
+
+
+def json_dump(filepath, data, cache=False):
+    """Dump a dict of data to a JSON format file.
+    :param cache: if True, the file is not rewritten when it already holds the same data
+    :return: True if the file was written
+    """
+    return _cached_write(_json_dump, filepath, data, cache)
+
+
+def _parse_values(vals):
+    vals = vals.strip()
+    if len(vals) == 0:
+        return np.array([])
+    # numpy parses NaN, Inf and -Inf as well
+    return np.fromstring(vals, sep=',')
+
+
+def _parse_scalar(rhs):
+    try:
+        return int(rhs)
+    except:
+        try:
+            return float(rhs)
+        except:
+            raise ValueError(rhs)
 
 
 def rload(fname):
     """Load a dict of data from an R dump format file.
     """
+    data = {}
     with open(fname, 'r') as fd:
-        lines = fd.readlines()
+        for line in fd:
+            if line.find('<-') < 0:
+                continue
+            lhs, rhs = [_.strip() for _ in line.split('<-', 1)]
+            if rhs.startswith('structure'):
+                vals, dim = R_STRUCTURE.match(rhs).groups()
+                dim = [int(v) for v in dim.split(',')]
+                val = _parse_values(vals).reshape(dim[::-1]).T
+            elif rhs.startswith('c('):
+                val = _parse_values(rhs[2:-1])
+            elif rhs in ['integer(0)', 'double(0)']:
+                val = np.array([])
+            else:
+                val = _parse_scalar(rhs)
+            data[lhs] = val
+    return data
+
+
+def json_load(fname):
+    """Load a dict of data from a JSON format file.
+    """
+    with open(fname, 'r') as fd:
+        json_data = json.load(fd)
     data = {}
-    for line in lines:
-        lhs, rhs = [_.strip() for _ in line.split('<-')]
-        if rhs.startswith('structure'):
-            vals, dim = rhs.replace('(', ' ').replace(')', ' ').split('c')[1:]  # [1:] instead of *_,
-            vals = [float(v) for v in vals.split(',')[:-1]]
-            dim = [int(v) for v in dim.split(',')]
-            val = np.array(vals).reshape(dim[::-1]).T
-        elif rhs.startswith('c'):
-            val = np.array([float(_) for _ in rhs[2:-1].split(',')])
-        else:
-            try:
-                val = int(rhs)
-            except:
-                try:
-                    val = float(rhs)
-                except:
-                    raise ValueError(rhs)
-        data[lhs] = val
+    for key, val in json_data.items():
+        if isinstance(val, list):
+            val = np.array(val, dtype="f8")
+        data[str(key)] = val
     return data
@@ -14,7 +14,6 @@ from tvb_epilepsy.plot.base_plotter import BasePlotter
 from tvb_epilepsy.base.model.vep.sensors import Sensors
 from tvb_epilepsy.base.computations.math_utils import compute_in_degree
 from tvb_epilepsy.base.computations.analyzers_utils import time_spectral_analysis
-from tvb_epilepsy.base.epileptor_models import EpileptorDP2D, EpileptorDPrealistic
 from tvb_epilepsy.base.utils.data_structures_utils import ensure_list, isequal_string, sort_dict, linspace_broadcast, \
                                                           generate_region_labels
 from tvb_epilepsy.base.utils.data_structures_utils import list_of_dicts_to_dicts_of_ndarrays, extract_dict_stringkeys
@@ -390,7 +389,8 @@ class Plotter(BasePlotter):
                                                       detrend=kwargs.get("detrend", 'constant'),
                                                       noverlap=kwargs.get("noverlap"),
                                                       f_low=kwargs.get("f_low", 10.0),
-                                                      log_scale=kwargs.get("log_scale", False))
+                                                      log_scale=kwargs.get("log_scale", False),
+                                                      chunk_len=kwargs.get("chunk_len"))
         min_val = numpy.min(stf.flatten())
         max_val = numpy.max(stf.flatten())
         if nS > 2:
@@ -438,7 +438,7 @@ class Plotter(BasePlotter):
 
     def plot_sim_results(self, model, seizure_indices, res, sensorsSEEG=None, hpf_flag=False, trajectories_plot=False,
                          spectral_raster_plot=False, region_labels=None, **kwargs):
-        if isinstance(model, EpileptorDP2D):
+        if isequal_string(model._ui_name, "EpileptorDP2D"):
             # We assume that at least x1 and z are available in res
             self.plot_timeseries({'x1(t)': res['x1'], 'z(t)': res['z']}, res['time'],
                                  time_units=res.get('time_units', "ms"),
@@ -470,7 +470,7 @@ class Plotter(BasePlotter):
                              time_units=res.get('time_units', "ms"), special_idx=seizure_indices,
                              title=model._ui_name + ": Simulated LFP rasterplot", offset=0.1, labels=region_labels,
                              figsize=FiguresConfig.VERY_LARGE_SIZE)
-        if isinstance(model, EpileptorDPrealistic):
+        if isequal_string(model._ui_name, "EpileptorDPrealistic"):
             if isinstance(res.get("slope_t"), numpy.ndarray) and isinstance(res.get("Iext2"), numpy.ndarray):
                 self.plot_timeseries({'1/(1+exp(-10(z-3.03))': 1 / (1 + numpy.exp(-10 * (res['z'] - 3.03))),
                                       'slope': res['slope_t'], 'Iext2': res['Iext2_t']}, res['time'],
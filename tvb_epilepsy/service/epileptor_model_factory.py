@@ -77,6 +77,14 @@ model_build_dict = {
     "EpileptorDP2D": build_EpileptorDP2D
 }
 
+# Model parameters set by the model creator functions above, from the model configuration
+model_configuration_params_dict = {
+    "Epileptor": ["x0", "Iext", "Iext2", "Ks", "c", "a", "b", "d", "aa"],
+    "EpileptorDP": ["x0", "Iext1", "Iext2", "K", "yc", "a", "b", "d", "s", "gamma"],
+    "EpileptorDPrealistic": ["x0", "Iext1", "Iext2", "K", "yc", "a", "b", "d", "s", "gamma"],
+    "EpileptorDP2D": ["x0", "Iext1", "K", "yc", "a", "b", "d"]
+}
+
 
 EPILEPTOR_MODEL_NVARS = {
          "EpileptorModel": EpileptorModel._nvar,
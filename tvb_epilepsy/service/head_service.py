@@ -1,5 +1,4 @@
 import numpy as np
-from sklearn.cluster import AgglomerativeClustering
 from tvb_epilepsy.base.model.vep.sensors import Sensors
 from tvb_epilepsy.base.utils.data_structures_utils import ensure_list
 from tvb_epilepsy.base.utils.log_error_utils import raise_value_error, initialize_logger
@@ -74,6 +73,7 @@ class HeadService(object):
                         noconnectivity[np.meshgrid(ch, ch)] = 0.0
                     distance = distance * noconnectivity
             n_electrodes = np.minimum(np.maximum(n_electrodes, 3), n_sensors // sensors_per_electrode)
+            from sklearn.cluster import AgglomerativeClustering
             clustering = AgglomerativeClustering(n_electrodes, affinity="precomputed", linkage="average")
             clusters_labels = clustering.fit_predict(distance)
             selection = []
@@ -4,7 +4,6 @@ import numpy
 from tvb_epilepsy.base.constants.config import Config
 from tvb_epilepsy.base.model.disease_hypothesis import DiseaseHypothesis
 from tvb_epilepsy.base.utils.log_error_utils import initialize_logger, raise_value_error
-from tvb_epilepsy.io.h5_reader import H5Reader
 
 # TODO: In the future we should allow for various not 0 healthy values.
 # In this case x0 could take any value, and only knowing e_indices would make some difference
@@ -67,8 +66,9 @@ class HypothesisBuilder(object):
         n_inds = len(indices)
         n_vals = len(values)
         if n_inds != n_vals:
-            if n_vals != 1:
-                values *= n_inds
+            if n_vals == 1:
+                # A single value is broadcast to all indices
+                values = list(values) * n_inds
             else:
                 raise_value_error("Sizes of " + type + "_indices (" + str(n_inds) + ") " +
                                   "and " + type + "_values (" + str(n_vals) + ") do not match!")
@@ -114,7 +114,11 @@ class HypothesisBuilder(object):
 
     def set_lsa_propagation(self, lsa_propagation_indices, lsa_propagation_strengths):
         self.lsa_propagation_indices = numpy.array(self._check_regions_inds_range(lsa_propagation_indices, "lsa_propagation"))
-        self.lsa_propagation_strengths = numpy.array(
+        if len(lsa_propagation_strengths) == self.number_of_regions:
+            # Propagation strengths of all regions, as computed by LSAService
+            self.lsa_propagation_strengths = numpy.array(lsa_propagation_strengths)
+        else:
+            self.lsa_propagation_strengths = numpy.array(
                                                 self._check_indices_vals_sizes(self.lsa_propagation_indices,
                                                                                lsa_propagation_strengths,
                                                                                "lsa_propagation"))
@@ -157,6 +161,7 @@ class HypothesisBuilder(object):
                                  lsa_propagation_strenghts=self.lsa_propagation_strengths, name=self.name)
 
     def build_hypothesis_from_file(self, hyp_file, e_indices=None):
+        from tvb_epilepsy.io.h5_reader import H5Reader
         self.set_diseased_regions_values(H5Reader().read_epileptogenicity(self.config.input.HEAD, name=hyp_file))
         if e_indices:
             self.set_e_indices(e_indices)
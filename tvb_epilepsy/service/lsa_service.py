@@ -6,13 +6,19 @@ TODO: it might be useful to store eigenvalues and eigenvectors, as well as the p
 such as eigen_vectors_number and LSAService in a h5 file
 """
 import numpy
+from scipy.linalg import eigh
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import eigs, ArpackError
 from tvb_epilepsy.base.constants.config import CalculusConfig
-from tvb_epilepsy.base.constants.model_constants import X1_EQ_CR_DEF
+from tvb_epilepsy.base.constants.model_constants import X1_EQ_CR_DEF, YC_DEF, I_EXT1_DEF, A_DEF, B_DEF, D_DEF, \
+    SLOPE_DEF, TAU1_DEF, TAU0_DEF
 from tvb_epilepsy.base.utils.log_error_utils import initialize_logger, raise_value_error
 from tvb_epilepsy.base.utils.data_structures_utils import formal_repr
-from tvb_epilepsy.base.computations.calculations_utils import calc_fz_jac_square_taylor
+from tvb_epilepsy.base.computations.calculations_utils import calc_fz_jac_square_taylor, \
+    calc_fz_jac_square_taylor_batch
 from tvb_epilepsy.base.computations.equilibrium_computation import calc_eq_z
-from tvb_epilepsy.base.computations.math_utils import weighted_vector_sum, curve_elbow_point
+from tvb_epilepsy.base.computations.math_utils import weighted_vector_sum, curve_elbow_point, curve_elbow_points, \
+    canonical_sign_vectors
 from tvb_epilepsy.service.hypothesis_builder import HypothesisBuilder
 
 
@@ -21,8 +27,9 @@ class LSAService(object):
 
     def __init__(self, eigen_vectors_number_selection=CalculusConfig.EIGENVECTORS_NUMBER_SELECTION,
                  eigen_vectors_number=None, weighted_eigenvector_sum=CalculusConfig.WEIGHTED_EIGENVECTOR_SUM,
-                 normalize_propagation_strength=False):
+                 normalize_propagation_strength=False, eigen_solver=CalculusConfig.LSA_EIGEN_SOLVER):
         self.eigen_vectors_number_selection = eigen_vectors_number_selection
+        self.eigen_solver = eigen_solver
         self.eigen_values = []
         self.eigen_vectors = []
         self.eigen_vectors_number = eigen_vectors_number
@@ -35,7 +42,8 @@ class LSAService(object):
              "03. Eigen values": self.eigen_values,
              "04. Eigenvectors": self.eigen_vectors,
              "05. Eigenvectors' number": self.eigen_vectors_number,
-             "06. Weighted eigenvector's sum flag": str(self.weighted_eigenvector_sum)
+             "06. Weighted eigenvector's sum flag": str(self.weighted_eigenvector_sum),
+             "07. Eigen solver": self.eigen_solver
              }
         return formal_repr(self, d)
 
@@ -97,19 +105,65 @@ class LSAService(object):
 
         return fz_jacobian
 
-    def run_lsa(self, disease_hypothesis, model_configuration):
-
-        jacobian = self._compute_jacobian(model_configuration)
-
+    def _compute_eigen_values_vectors(self, jacobian):
         # Perform eigenvalue decomposition
         eigen_values, eigen_vectors = numpy.linalg.eig(jacobian)
 
         sorted_indices = numpy.argsort(eigen_values, kind='mergesort')
         self.eigen_values = eigen_values[sorted_indices]
-        self.eigen_vectors = eigen_vectors[:, sorted_indices]
+        # Fix the arbitrary sign of the eigenvectors, so that their sums don't depend on the eigen solver
+        self.eigen_vectors = canonical_sign_vectors(eigen_vectors[:, sorted_indices])
 
-        self._ensure_eigen_vectors_number(self.eigen_values, model_configuration.e_values,
-                                          model_configuration.x0_values, disease_hypothesis.get_all_disease_indices())
+    def _compute_leading_eigen_vectors(self, jacobian, n_eigen_vectors):
+        # Compute only the n_eigen_vectors leading eigenvectors (i.e., those of the smallest real part eigenvalues),
+        # which are the first ones in the sorted output of _compute_eigen_values_vectors().
+        # Return None if it is not possible
+        n_regions = jacobian.shape[0]
+        if numpy.allclose(jacobian, jacobian.T):
+            try:
+                eigen_values, eigen_vectors = eigh(jacobian, subset_by_index=[0, n_eigen_vectors - 1])
+            except TypeError:
+                # for older scipy versions:
+                eigen_values, eigen_vectors = eigh(jacobian, eigvals=(0, n_eigen_vectors - 1))
+        elif n_eigen_vectors < n_regions - 1 and \
+                numpy.count_nonzero(jacobian) < CalculusConfig.LSA_SPARSE_DENSITY * jacobian.size:
+            try:
+                eigen_values, eigen_vectors = eigs(csr_matrix(jacobian), k=n_eigen_vectors, which="SR")
+            except ArpackError:
+                self.logger.warning("Sparse eigen solver failed! Computing the full eigenvalue decomposition...")
+                return None
+            eigen_values, eigen_vectors = numpy.real_if_close(eigen_values), numpy.real_if_close(eigen_vectors)
+        else:
+            return None
+        sorted_indices = numpy.argsort(eigen_values, kind='mergesort')
+        return eigen_values[sorted_indices], canonical_sign_vectors(eigen_vectors[:, sorted_indices])
+
+    def run_lsa(self, disease_hypothesis, model_configuration):
+
+        jacobian = self._compute_jacobian(model_configuration)
+
+        if self.eigen_solver == "leading":
+            eigen_values = []
+            if self.eigen_vectors_number is None and self.eigen_vectors_number_selection == "auto_eigenvals":
+                # All eigenvalues, but not all eigenvectors, are needed for the automatic eigen_vectors_number
+                eigen_values = numpy.sort(numpy.linalg.eigvals(jacobian), kind='mergesort')
+            self._ensure_eigen_vectors_number(eigen_values, model_configuration.e_values,
+                                              model_configuration.x0_values,
+                                              disease_hypothesis.get_all_disease_indices())
+            leading_eigen = None
+            if self.eigen_vectors_number < disease_hypothesis.number_of_regions:
+                leading_eigen = self._compute_leading_eigen_vectors(jacobian, max(self.eigen_vectors_number, 1))
+            if leading_eigen is None:
+                self._compute_eigen_values_vectors(jacobian)
+            else:
+                # Keep all eigenvalues, if they have been computed
+                self.eigen_values = eigen_values if len(eigen_values) > 0 else leading_eigen[0]
+                self.eigen_vectors = leading_eigen[1]
+        else:
+            self._compute_eigen_values_vectors(jacobian)
+            self._ensure_eigen_vectors_number(self.eigen_values, model_configuration.e_values,
+                                              model_configuration.x0_values,
+                                              disease_hypothesis.get_all_disease_indices())
 
         if self.eigen_vectors_number == disease_hypothesis.number_of_regions:
             # Calculate the propagation strength index by summing all eigenvectors
@@ -143,6 +197,88 @@ class LSAService(object):
 
         return hypothesis_builder.build_lsa_hypothesis()
 
+    def _ensure_eigen_vectors_numbers_batch(self, eigen_values, e_values=None, x0_values=None, n_disease=None):
+        n_samples, n_regions = eigen_values.shape
+        if self.eigen_vectors_number is not None:
+            return self.eigen_vectors_number * numpy.ones((n_samples,), dtype="i")
+        if self.eigen_vectors_number_selection == "auto_eigenvals":
+            return curve_elbow_points(numpy.abs(eigen_values)) + 1
+        elif self.eigen_vectors_number_selection == "auto_disease" and n_disease is not None:
+            return n_disease * numpy.ones((n_samples,), dtype="i")
+        elif self.eigen_vectors_number_selection == "auto_epileptogenicity" and e_values is not None:
+            return curve_elbow_points(e_values * numpy.ones((n_samples, n_regions))) + 1
+        elif self.eigen_vectors_number_selection == "auto_excitability" and x0_values is not None:
+            return curve_elbow_points(x0_values * numpy.ones((n_samples, n_regions))) + 1
+        else:
+            raise_value_error("\n" + self.eigen_vectors_number_selection + " is not a valid option, " +
+                              "or its input is missing, for the automatic computation of the eigen_vectors_number "
+                              "of a batch of LSA runs")
+
+    def run_lsa_batch(self, zEQ, K, x1EQ, model_connectivity, yc=YC_DEF, Iext1=I_EXT1_DEF, a=A_DEF, b=B_DEF,
+                      d=D_DEF, slope=SLOPE_DEF, tau1=TAU1_DEF, tau0=TAU0_DEF, e_values=None, x0_values=None,
+                      n_disease=None):
+        """
+        Vectorized LSA of a stack of n_samples model configurations at once.
+        It follows run_lsa() step by step, but without building any hypothesis:
+        :param zEQ, K, x1EQ: arrays of shape (n_samples, n_regions)
+        :param model_connectivity: array of shape (n_regions, n_regions) or (n_samples, n_regions, n_regions)
+        :param e_values, x0_values, n_disease: needed only for the respective eigen_vectors_number_selection modes
+        :return: eigen_values (n_samples, n_regions) and eigen_vectors (n_samples, n_regions, n_regions), sorted,
+                 eigen_vectors_number (n_samples, ),
+                 lsa_propagation_strengths (n_samples, n_regions) and their elbow points (n_samples, )
+        """
+        zEQ = numpy.array(zEQ, dtype="float64")
+        x1EQ = numpy.array(x1EQ, dtype="float64")
+        if zEQ.ndim == 1:
+            zEQ = zEQ[numpy.newaxis]
+            x1EQ = x1EQ[numpy.newaxis]
+        n_samples, n_regions = zEQ.shape
+
+        # Set any supercritical equilibria right before the bifurcation, as in _compute_jacobian()
+        temp = x1EQ > X1_EQ_CR_DEF - 10 ** (-3)
+        if temp.any():
+            self.logger.warning(str(numpy.sum(temp)) + " equilibria x1EQ were corrected for LSA to value: " +
+                                "X1_EQ_CR_DEF - 10 ** (-3) = " + str(X1_EQ_CR_DEF - 10 ** (-3)) +
+                                " to be sub-critical!")
+            x1EQ[temp] = X1_EQ_CR_DEF - 10 ** (-3)
+            i_temp = numpy.ones(temp.shape)
+            zEQ[temp] = calc_eq_z(x1EQ[temp], (yc * i_temp)[temp], (Iext1 * i_temp)[temp], "2d", 0.0,
+                                  (slope * i_temp)[temp], (a * i_temp)[temp], (b * i_temp)[temp], (d * i_temp)[temp])
+
+        jacobians = calc_fz_jac_square_taylor_batch(zEQ, yc, Iext1, K, model_connectivity, tau1, tau0)
+        if numpy.any(~numpy.isfinite(jacobians)):
+            raise_value_error("nan or inf values in dfz")
+
+        # Perform all eigenvalue decompositions at once
+        eigen_values, eigen_vectors = numpy.linalg.eig(jacobians)
+        sorted_indices = numpy.argsort(eigen_values, axis=1, kind='mergesort')
+        samples_indices = numpy.arange(n_samples)[:, numpy.newaxis]
+        eigen_values = eigen_values[samples_indices, sorted_indices]
+        eigen_vectors = canonical_sign_vectors(eigen_vectors[samples_indices, :, sorted_indices].transpose(0, 2, 1))
+
+        eigen_vectors_number = self._ensure_eigen_vectors_numbers_batch(eigen_values, e_values, x0_values, n_disease)
+
+        # Mask of the first max(eigen_vectors_number, 1) eigenvectors of each sample, or of all of them,
+        # for the samples where eigen_vectors_number equals the number of regions
+        eigen_vectors_mask = numpy.arange(n_regions)[numpy.newaxis] < \
+                             numpy.maximum(eigen_vectors_number, 1)[:, numpy.newaxis]
+        if self.weighted_eigenvector_sum:
+            weights = numpy.where(eigen_vectors_mask, eigen_values, 0.0)
+            weights /= numpy.sum(weights, axis=1, keepdims=True)
+            weights[eigen_vectors_number == n_regions] = 1.0
+        else:
+            weights = eigen_vectors_mask.astype(eigen_values.dtype)
+        lsa_propagation_strengths = numpy.abs(numpy.einsum("sij,sj->si", eigen_vectors, weights))
+
+        if self.normalize_propagation_strength:
+            # Normalize by the maximum
+            lsa_propagation_strengths /= numpy.max(lsa_propagation_strengths, axis=1, keepdims=True)
+
+        propagation_strengths_elbows = curve_elbow_points(lsa_propagation_strengths)
+
+        return eigen_values, eigen_vectors, eigen_vectors_number, lsa_propagation_strengths, \
+               propagation_strengths_elbows
+
     def update_for_pse(self, values, paths, indices):
         for i, val in enumerate(paths):
             vals = val.split(".")
@@ -26,7 +26,7 @@ class ModelConfigurationBuilder(object):
 
     def __init__(self, number_of_regions=1, x0_values=X0_DEF, e_values=E_DEF, yc=YC_DEF, Iext1=I_EXT1_DEF,
                  Iext2=I_EXT2_DEF, K=K_DEF, a=A_DEF, b=B_DEF, d=D_DEF, slope=SLOPE_DEF, s=S_DEF, gamma=GAMMA_DEF,
-                 zmode=np.array("lin"), x1eq_mode="optimize"):
+                 zmode=np.array("lin"), x1eq_mode="optimize", equilibrium_solver=None):
         self.number_of_regions = number_of_regions
         self.x0_values = x0_values * np.ones((self.number_of_regions,), dtype=np.float32)
         self.yc = yc
@@ -40,6 +40,8 @@ class ModelConfigurationBuilder(object):
         self.gamma = gamma
         self.zmode = zmode
         self.x1eq_mode = x1eq_mode
+        # An optional EquilibriumSolver instance, to warm start the "optimize" x1eq_mode across successive builds
+        self.equilibrium_solver = equilibrium_solver
         if len(ensure_list(K)) == 1:
             self.K_unscaled = np.array(K) * np.ones((self.number_of_regions,), dtype=np.float32)
         elif len(ensure_list(K)) == self.number_of_regions:
@@ -137,6 +139,11 @@ class ModelConfigurationBuilder(object):
             x1EQ = \
                 eq_x1_hypo_x0_linTaylor(x0_indices, e_indices, x1EQ, zEQ, x0, self.K,
                                         model_connectivity, self.yc, self.Iext1, self.a, self.b, self.d)[0]
+        elif self.equilibrium_solver is not None:
+            x1EQ = \
+                self.equilibrium_solver.eq_x1_hypo_x0_optimize(x0_indices, e_indices, x1EQ, zEQ, x0, self.K,
+                                                               model_connectivity, self.yc, self.Iext1, self.a,
+                                                               self.b, self.d)[0]
         else:
             x1EQ = \
                 eq_x1_hypo_x0_optimize(x0_indices, e_indices, x1EQ, zEQ, x0, self.K,
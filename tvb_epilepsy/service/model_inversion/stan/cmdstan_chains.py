@@ -0,0 +1,222 @@
+"""
+Parallel execution of CmdStan chains, one process per chain, throttled to the available cores,
+with progress monitoring by tailing the chains' output csv files, and time out or cancelling of chains.
+"""
+
+import os
+import time
+import subprocess
+from multiprocessing import cpu_count
+from tvb_epilepsy.base.utils.log_error_utils import initialize_logger, raise_value_error
+
+
+class CmdStanChain(object):
+    """
+    A CmdStan process of a chain, writing its console output to a log file next to its output csv file.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    TIMED_OUT = "timed out"
+    CANCELLED = "cancelled"
+
+    def __init__(self, chain_id, command, output_filepath, diagnostic_filepath="", n_draws=None):
+        """
+        :param chain_id: id of the chain
+        :param command: shell command of the chain, as generated by generate_cmdstan_chain_commands
+        :param output_filepath: output csv file of the chain
+        :param diagnostic_filepath: diagnostic csv file of the chain
+        :param n_draws: expected number of draws written to the output csv file, if known, to report progress
+        """
+        self.chain_id = chain_id
+        self.command = command
+        self.output_filepath = output_filepath
+        self.diagnostic_filepath = diagnostic_filepath
+        self.log_filepath = output_filepath[:-4] + ".log"
+        self.n_draws = n_draws
+        self.draws = 0
+        self.status = self.PENDING
+        self.exit_code = None
+        self.process = None
+        self.start_time = None
+        self.end_time = None
+        self.last_activity = None
+        self._log_file = None
+        self._csv_offset = 0
+        self._csv_header = False
+        self._csv_partial_line = ""
+        self._log_size = 0
+
+    @property
+    def run_time(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    def start(self, cwd=None):
+        # Remove the output of any previous run, so that it is not mistaken for progress
+        if os.path.isfile(self.output_filepath):
+            os.remove(self.output_filepath)
+        self._log_file = open(self.log_filepath, "w")
+        # exec replaces the shell with CmdStan, so that the process can be killed directly
+        self.process = subprocess.Popen("exec " + self.command.replace("\t", ""), shell=True, cwd=cwd,
+                                        stdout=self._log_file, stderr=subprocess.STDOUT)
+        self.start_time = time.time()
+        self.last_activity = self.start_time
+        self.status = self.RUNNING
+
+    def _close(self, status):
+        self.status = status
+        self.end_time = time.time()
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+    def poll(self):
+        """
+        Checks whether the process has exited and updates the progress of the chain
+        :return: True if the chain is still running
+        """
+        if self.status != self.RUNNING:
+            return False
+        self.update_progress()
+        self.exit_code = self.process.poll()
+        if self.exit_code is None:
+            return True
+        self.update_progress()
+        self._close(self.DONE if self.exit_code == 0 else self.FAILED)
+        return False
+
+    def update_progress(self):
+        # Count the draws appended to the output csv file since the last update
+        if os.path.isfile(self.output_filepath):
+            with open(self.output_filepath, "r") as csv_file:
+                csv_file.seek(self._csv_offset)
+                new_text = csv_file.read()
+            if len(new_text) > 0:
+                self._csv_offset += len(new_text)
+                self.last_activity = time.time()
+                lines = (self._csv_partial_line + new_text).split("\n")
+                # The last line is incomplete, if not empty
+                self._csv_partial_line = lines.pop()
+                for line in lines:
+                    if len(line.strip()) == 0 or line.startswith("#"):
+                        continue
+                    if self._csv_header:
+                        self.draws += 1
+                    else:
+                        self._csv_header = True
+        # Console output (e.g., warmup iterations, which are not saved by default) is activity as well
+        if os.path.isfile(self.log_filepath):
+            log_size = os.path.getsize(self.log_filepath)
+            if log_size != self._log_size:
+                self._log_size = log_size
+                self.last_activity = time.time()
+
+    def kill(self, status):
+        if self.status == self.RUNNING:
+            self.process.kill()
+            self.process.wait()
+            self.exit_code = self.process.returncode
+        if self.status in [self.PENDING, self.RUNNING]:
+            self._close(status)
+
+    def progress_str(self):
+        progress = "chain " + str(self.chain_id) + ": " + self.status + ", " + str(self.draws)
+        if self.n_draws:
+            progress += "/" + str(self.n_draws)
+        return progress + " draws, " + "%.1f" % self.run_time + " sec"
+
+
+class CmdStanChainScheduler(object):
+    """
+    Runs CmdStan chains concurrently, at most n_parallel at a time.
+    """
+
+    logger = initialize_logger(__name__)
+
+    def __init__(self, chains, n_parallel=None, timeout=None, stall_timeout=None, poll_period=1.0,
+                 report_period=60.0, cwd=None):
+        """
+        :param chains: list of CmdStanChain
+        :param n_parallel: maximum number of chains running at the same time (default: number of cores)
+        :param timeout: time (sec) after which all chains still running are killed
+        :param stall_timeout: time (sec) after which a chain without any new output is killed
+        :param poll_period: time (sec) between checks of the chains' processes
+        :param report_period: time (sec) between progress logs
+        :param cwd: working directory of the chains' processes
+        """
+        self.chains = chains
+        if n_parallel is None:
+            n_parallel = cpu_count()
+        self.n_parallel = max(min(int(n_parallel), len(chains)), 1)
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.poll_period = poll_period
+        self.report_period = report_period
+        self.cwd = cwd
+        self._cancelled = False
+
+    def cancel(self):
+        """
+        Kills all running chains, and cancels all pending ones
+        """
+        self._cancelled = True
+        for chain in self.chains:
+            chain.kill(CmdStanChain.CANCELLED)
+
+    def report(self):
+        self.logger.info("CmdStan chains' progress:\n" + "\n".join([chain.progress_str() for chain in self.chains]))
+
+    def run(self):
+        """
+        Runs all chains and waits for them to finish, fail, time out or be cancelled
+        :return: list of the chains that finished successfully
+        """
+        self._cancelled = False
+        pending = list(self.chains)
+        running = []
+        tic = time.time()
+        last_report = tic
+        self.logger.info("Running " + str(len(self.chains)) + " CmdStan chains, " + str(self.n_parallel) +
+                         " at a time...")
+        try:
+            while (len(pending) > 0 or len(running) > 0) and not self._cancelled:
+                while len(pending) > 0 and len(running) < self.n_parallel:
+                    chain = pending.pop(0)
+                    self.logger.info("Starting chain " + str(chain.chain_id) + ":\n" + chain.command)
+                    chain.start(self.cwd)
+                    running.append(chain)
+                time.sleep(self.poll_period)
+                now = time.time()
+                for chain in list(running):
+                    if not chain.poll():
+                        running.remove(chain)
+                        self.logger.info(chain.progress_str())
+                    elif self.timeout is not None and now - tic > self.timeout:
+                        chain.kill(CmdStanChain.TIMED_OUT)
+                        running.remove(chain)
+                        self.logger.warning("Timed out " + chain.progress_str())
+                    elif self.stall_timeout is not None and now - chain.last_activity > self.stall_timeout:
+                        chain.kill(CmdStanChain.TIMED_OUT)
+                        running.remove(chain)
+                        self.logger.warning("Stalled " + chain.progress_str())
+                if self.timeout is not None and now - tic > self.timeout:
+                    for chain in pending:
+                        chain.kill(CmdStanChain.CANCELLED)
+                    pending = []
+                if now - last_report > self.report_period:
+                    self.report()
+                    last_report = now
+        except BaseException:
+            # E.g., KeyboardInterrupt: do not leave CmdStan processes behind
+            self.cancel()
+            raise
+        self.report()
+        finished = [chain for chain in self.chains if chain.status == CmdStanChain.DONE]
+        if len(finished) == 0:
+            raise_value_error("None of the " + str(len(self.chains)) + " CmdStan chains finished successfully!\n"
+                              "See the chains' log files, e.g.:\n" + self.chains[0].log_filepath, self.logger)
+        return finished
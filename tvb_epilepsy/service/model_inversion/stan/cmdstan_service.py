@@ -1,3 +1,5 @@
+import time
+import stat
 from shutil import copyfile
 from tvb_epilepsy.base.utils.log_error_utils import raise_value_error
 from tvb_epilepsy.base.utils.data_structures_utils import construct_import_path
@@ -6,6 +8,7 @@ from tvb_epilepsy.io.csv import parse_csv_in_cols
 from tvb_epilepsy.plot.plotter import Plotter
 from tvb_epilepsy.service.model_inversion.stan.stan_service import StanService
 from tvb_epilepsy.service.model_inversion.stan.stan_factory import *
+from tvb_epilepsy.service.model_inversion.stan.cmdstan_chains import CmdStanChain, CmdStanChainScheduler
 
 
 class CmdStanService(StanService):
@@ -39,8 +42,10 @@ class CmdStanService(StanService):
 
     def set_model_data(self, debug=0, simulate=0, **kwargs):
         model_data = super(CmdStanService, self).set_model_data(debug, simulate, **kwargs)
-        model_data_path = self.model_data_path.split(".", -1)[0] + ".R"
-        self.write_model_data_to_file(model_data, model_data_path=model_data_path)
+        # CmdStan reads model data in R dump (default) or JSON (CmdStan >= 2.22) format
+        model_data_path = self.model_data_path.split(".", -1)[0] + "." + kwargs.get("model_data_format", "R")
+        self.write_model_data_to_file(model_data, model_data_path=model_data_path,
+                                      cache_model_data=kwargs.get("cache_model_data", True))
         return model_data_path
 
     def set_options(self, **options):
@@ -80,15 +85,49 @@ class CmdStanService(StanService):
         return est, samples, summary
 
     def stan_summary(self, output_filepath=None, summary_filepath=None):
+        """
+        :param output_filepath: output csv file path, whose chains' files are globbed, or list of the chains' files
+        """
         if output_filepath is None:
             output_filepath = os.path.join(self.config.input.FOLDER_RES, STAN_OUTPUT_OPTIONS["file"])
         if summary_filepath is None:
             summary_filepath = os.path.join(self.config.input.FOLDER_RES, "stan_summary.csv")
-
-        command = "bin/stansummary " + output_filepath[:-4] + "*.csv" + " --csv_file=" + summary_filepath
+        if isinstance(output_filepath, (list, tuple)):
+            output_files = " ".join(output_filepath)
+        else:
+            output_files = output_filepath[:-4] + "*.csv"
+        command = "bin/stansummary " + output_files + " --csv_file=" + summary_filepath
         execute_command(command, cwd=self.path, shell=True)
         return summary_filepath
 
+    def _expected_draws(self):
+        if self.fitmethod != "sample":
+            return None
+        n_draws = self.options["num_samples"]
+        if self.options["save_warmup"]:
+            n_draws += self.options["num_warmup"]
+        return int(np.ceil(n_draws / float(self.options["thin"])))
+
+    def run_chains(self, model_data_path, output_filepath, diagnostic_filepath="", **kwargs):
+        """
+        Runs the chains of the fit in parallel
+        :param kwargs: n_parallel, timeout, stall_timeout, poll_period, report_period of CmdStanChainScheduler
+        :return: fitting time, list of output csv files of the chains that finished successfully
+        """
+        os.chmod(self.model_path, os.stat(self.model_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        chains = [CmdStanChain(chain_id, command, chain_output_filepath, chain_diagnostic_filepath,
+                               self._expected_draws())
+                  for chain_id, (command, chain_output_filepath, chain_diagnostic_filepath) in
+                  enumerate(generate_cmdstan_chain_commands(self.fitmethod, self.options, self.model_path,
+                                                            model_data_path, output_filepath,
+                                                            diagnostic_filepath), 1)]
+        scheduler = CmdStanChainScheduler(chains, **dict([(key, kwargs[key]) for key in
+                                                          ["n_parallel", "timeout", "stall_timeout", "poll_period",
+                                                           "report_period"] if key in kwargs]))
+        tic = time.time()
+        finished = scheduler.run()
+        return time.time() - tic, [chain.output_filepath for chain in finished]
+
     def fit(self, output_filepath=None, diagnostic_filepath="", summary_filepath=None, debug=0, simulate=0,
             return_output=True, plot_HMC=True, **kwargs):
         if output_filepath is None:
@@ -100,18 +139,19 @@ class CmdStanService(StanService):
         self.fitmethod = kwargs.pop("fitmethod", self.fitmethod)
         self.fitmethod = kwargs.pop("method", self.fitmethod)
         self.set_options(**kwargs)
-        self.command, output_filepath, diagnostic_filepath = \
-            generate_cmdstan_fit_command(self.fitmethod, self.options, self.model_path,
-                                         self.set_model_data(debug, simulate, **kwargs),
-                                         output_filepath, diagnostic_filepath)
+        model_data_path = self.set_model_data(debug, simulate, **kwargs)
+        self.command = generate_cmdstan_fit_command(self.fitmethod, self.options, self.model_path, model_data_path,
+                                                    output_filepath, diagnostic_filepath)[0]
         self.logger.info("Model fitting with " + self.fitmethod +
                          " method of model: " + self.model_path + "...")
-        self.fitting_time = execute_command(self.command.replace("\t", ""), shell=True)[1]
+        # The chains run concurrently, and their outputs are summarized and read together, once all are finished
+        self.fitting_time, output_filepaths = self.run_chains(model_data_path, output_filepath, diagnostic_filepath,
+                                                              **kwargs)
         self.logger.info(str(self.fitting_time) + ' sec required to ' + self.fitmethod + "!")
         self.logger.info("Computing stan summary...")
-        summary_filepath = self.stan_summary(output_filepath, summary_filepath)
+        summary_filepath = self.stan_summary(output_filepaths, summary_filepath)
         if return_output:
-            est, samples, summary = self.read_output(output_filepath, summary_filepath=summary_filepath, **kwargs)
+            est, samples, summary = self.read_output(output_filepaths, summary_filepath=summary_filepath, **kwargs)
             if plot_HMC and self.fitmethod.find("sampl") >= 0 and \
                 isequal_string(self.options.get("algorithm", "None"), "HMC"):
                 Plotter(self.config).plot_HMC(samples, kwargs.pop("skip_samples", 0))
@@ -96,8 +96,8 @@ def generate_cmdstan_options(method, **kwargs):
     return options
 
 
-def generate_cmdstan_fit_command(fitmethod, options, model_path, model_data_path, output_filepath, diagnostic_filepath,
-                                 command_path=None):
+def _cmdstan_method_command(fitmethod, options, model_path, model_data_path):
+    # The part of the command that is common to all chains
     command = model_path
     if isequal_string(fitmethod, "sample"):
         command += " method=sample"' \\' + "\n"
@@ -126,7 +126,7 @@ def generate_cmdstan_fit_command(fitmethod, options, model_path, model_data_path
     elif isequal_string(fitmethod, "diagnose"):
         command += " method=diagnose"' \\' + "\n" + "\t\ttest=gradient "
         for option in STAN_DIAGNOSE_TEST_GRADIENT_OPTIONS.keys():
-            command += "\t\t\t\t" + + option + "=" + str(options[option]) + ' \\' + "\n"
+            command += "\t\t\t\t" + option + "=" + str(options[option]) + ' \\' + "\n"
     if isequal_string(fitmethod, "sample") or isequal_string(fitmethod, "variational"):
         command += "\t\tadapt"' \\' + "\n"
         if isequal_string(fitmethod, "sample"):
@@ -137,9 +137,20 @@ def generate_cmdstan_fit_command(fitmethod, options, model_path, model_data_path
             command += "\t\t\t\t" + option + "=" + str(options[option]) + ' \\' + "\n"
     command += "\t\tdata file=" + model_data_path + ' \\' + "\n"
     command += "\t\tinit=" + str(options["init"]) + ' \\' + "\n"
-    command += "\t\trandom seed=" + str(options["random_seed"]) + ' \\' + "\n"
+    return command
+
+
+def _default_diagnostic_filepath(output_filepath, diagnostic_filepath):
     if diagnostic_filepath == "":
         diagnostic_filepath = os.path.join(os.path.dirname(output_filepath), STAN_OUTPUT_OPTIONS["diagnostic_file"])
+    return diagnostic_filepath
+
+
+def generate_cmdstan_fit_command(fitmethod, options, model_path, model_data_path, output_filepath, diagnostic_filepath,
+                                 command_path=None):
+    command = _cmdstan_method_command(fitmethod, options, model_path, model_data_path)
+    command += "\t\trandom seed=" + str(options["random_seed"]) + ' \\' + "\n"
+    diagnostic_filepath = _default_diagnostic_filepath(output_filepath, diagnostic_filepath)
     if options["chains"] > 1:
         command = ("for i in {1.." + str(options["chains"]) + "}\ndo\n" +
                    "\t" + command +
@@ -147,7 +158,7 @@ def generate_cmdstan_fit_command(fitmethod, options, model_path, model_data_path
                    "\t\toutput file=" + output_filepath[:-4] + "$i.csv"' \\' + "\n" +
                    "\t\tdiagnostic_file=" + diagnostic_filepath[:-4] + "$i.csv"' \\' + "\n" +
                    "\t\trefresh=" + str(options["refresh"]) + " &" + "\n" +
-                   "done")
+                   "done\nwait")
     else:
         command += "\t\toutput file=" + output_filepath + ' \\' + "\n"
         command += "\t\tdiagnostic_file=" + diagnostic_filepath + ' \\' + "\n"
@@ -160,3 +171,31 @@ def generate_cmdstan_fit_command(fitmethod, options, model_path, model_data_path
         command_file.write("#!/bin/bash\n" + command.replace("\t", ""))
         command_file.close()
     return command, output_filepath, diagnostic_filepath
+
+
+def generate_cmdstan_chain_commands(fitmethod, options, model_path, model_data_path, output_filepath,
+                                    diagnostic_filepath):
+    """
+    Generates one command per chain, to be run in parallel, e.g., by a CmdStanChainScheduler.
+    Chain i (1, 2, ...) gets id=i, random seed=random_seed+i-1, and output/diagnostic files with suffix i,
+    unless there is only one chain.
+    :return: list of (command, output filepath, diagnostic filepath) tuples
+    """
+    command = _cmdstan_method_command(fitmethod, options, model_path, model_data_path)
+    diagnostic_filepath = _default_diagnostic_filepath(output_filepath, diagnostic_filepath)
+    chains = []
+    for chain_id in range(1, options["chains"] + 1):
+        if options["chains"] > 1:
+            chain_output_filepath = output_filepath[:-4] + str(chain_id) + ".csv"
+            chain_diagnostic_filepath = diagnostic_filepath[:-4] + str(chain_id) + ".csv"
+        else:
+            chain_output_filepath = output_filepath
+            chain_diagnostic_filepath = diagnostic_filepath
+        chain_command = command + \
+                        "\t\trandom seed=" + str(options["random_seed"] + chain_id - 1) + ' \\' + "\n" + \
+                        "\t\tid=" + str(chain_id) + ' \\' + "\n" + \
+                        "\t\toutput file=" + chain_output_filepath + ' \\' + "\n" + \
+                        "\t\tdiagnostic_file=" + chain_diagnostic_filepath + ' \\' + "\n" + \
+                        "\t\trefresh=" + str(options["refresh"])
+        chains.append((chain_command, chain_output_filepath, chain_diagnostic_filepath))
+    return chains
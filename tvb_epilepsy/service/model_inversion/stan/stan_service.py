@@ -7,7 +7,7 @@ import numpy as np
 from tvb_epilepsy.base.constants.config import Config
 from tvb_epilepsy.base.utils.log_error_utils import initialize_logger, raise_not_implemented_error
 from tvb_epilepsy.base.utils.data_structures_utils import isequal_string, ensure_list, sort_dict
-from tvb_epilepsy.io.rdump import rdump, rload
+from tvb_epilepsy.io.rdump import rdump, rload, json_dump, json_load
 from tvb_epilepsy.io.csv import parse_csv
 from tvb_epilepsy.io.h5_reader import H5Reader
 from tvb_epilepsy.io.h5_writer import H5Writer
@@ -62,7 +62,9 @@ class StanService(object):
             with open(model_data_path, 'wb') as f:
                 pickle.dump(model_data, f)
         elif isequal_string(extension, "R"):
-            rdump(model_data_path, model_data)
+            rdump(model_data_path, model_data, cache=kwargs.get("cache_model_data", True))
+        elif isequal_string(extension, "json"):
+            json_dump(model_data_path, model_data, cache=kwargs.get("cache_model_data", True))
         else:
             H5Writer().write_dictionary(model_data, os.path.join(os.path.dirname(model_data_path),
                                                                  os.path.basename(model_data_path)))
@@ -74,6 +76,8 @@ class StanService(object):
         extension = model_data_path.split(".", -1)[-1]
         if isequal_string(extension, "R"):
             model_data = rload(model_data_path)
+        elif isequal_string(extension, "json"):
+            model_data = json_load(model_data_path)
         elif isequal_string(extension, "npy"):
             model_data = np.load(model_data_path).item()
         elif isequal_string(extension, "mat"):
@@ -85,7 +89,7 @@ class StanService(object):
             model_data = H5Reader().read_dictionary(model_data_path)
         else:
             raise_not_implemented_error("model_data file (" + model_data_path +
-                                        ") that are not one of (.R, .npy, .mat, .pkl) cannot be read!")
+                                        ") that are not one of (.R, .json, .npy, .mat, .pkl, .h5) cannot be read!")
         for key in model_data.keys():
             if key[:3] == "EPI":
                 del model_data[key]
@@ -114,7 +118,13 @@ class StanService(object):
             self.compile_stan_model(save_model=kwargs.get("save_model", True), **kwargs)
 
     def read_output_samples(self, output_filepath, **kwargs):
-        samples = ensure_list(parse_csv(output_filepath.replace(".csv", "*"), merge=kwargs.pop("merge_outputs", False)))
+        # output_filepath is either a path, whose chains' csv files are globbed, or a list of the chains' files.
+        # Only csv files are globbed, i.e., not the chains' log files next to them
+        if not isinstance(output_filepath, (list, tuple)):
+            output_filepath = output_filepath[:-4] + "*.csv"
+        samples = ensure_list(parse_csv(output_filepath, merge=kwargs.pop("merge_outputs", False),
+                                        parameters=kwargs.pop("output_parameters", None),
+                                        cache=kwargs.pop("cache_outputs", False)))
         if len(samples) == 1:
             return samples[0]
         return samples
@@ -2,7 +2,6 @@ import numpy
 from copy import deepcopy
 from tvb_epilepsy.base.constants.config import CalculusConfig
 from tvb_epilepsy.base.constants.model_constants import K_DEF, YC_DEF, I_EXT1_DEF, A_DEF, B_DEF
-from tvb_epilepsy.base.utils.log_error_utils import raise_not_implemented_error
 from tvb_epilepsy.base.utils.data_structures_utils import formal_repr
 from tvb_epilepsy.service.pse.pse_service import ABCPSEService
 from tvb_epilepsy.service.lsa_service import LSAService
@@ -12,8 +11,9 @@ class LSAPSEService(ABCPSEService):
     task = "LSA"
     hypothesis = None
 
-    def __init__(self, hypothesis=None, params_pse=None):
+    def __init__(self, hypothesis=None, params_pse=None, copy_free=False):
         super(LSAPSEService, self).__init__()
+        self.copy_free = copy_free
         self.hypothesis = hypothesis
         self.params_pse = params_pse
         self.prepare_params(params_pse)
@@ -28,9 +28,6 @@ class LSAPSEService(ABCPSEService):
     def __str__(self):
         return self.__repr__()
 
-    def run_pse_parallel(self):
-        raise_not_implemented_error("PSE parallel not implemented!", self.logger)
-
     def run(self, params, conn_matrix, model_config_service_input=None, lsa_service_input=None,
             yc=YC_DEF, Iext1=I_EXT1_DEF, K=K_DEF, a=A_DEF, b=B_DEF, x1eq_mode="optimize",
             n_eigenvectors=CalculusConfig.EIGENVECTORS_NUMBER_SELECTION, weighted_eigenvector_sum=True):
@@ -41,18 +38,78 @@ class LSAPSEService(ABCPSEService):
                                                                            b, x1eq_mode)
             # Copy a LSAService and update it
             # ...create/update lsa service:
-            if isinstance(lsa_service_input, LSAService):
-                lsa_service = deepcopy(lsa_service_input)
+            if isinstance(lsa_service_input, LSAService) and self.copy_free:
+                # The LSAService is restored by rollback_params() at the end of the loop
+                lsa_service = self.apply_params(lsa_service_input, params, "lsa_service")
             else:
-                lsa_service = LSAService(eigen_vectors_number=n_eigenvectors,
-                                         weighted_eigenvector_sum=weighted_eigenvector_sum)
-            lsa_service.update_for_pse(params, self.params_paths, self.params_indices)
+                if isinstance(lsa_service_input, LSAService):
+                    lsa_service = deepcopy(lsa_service_input)
+                else:
+                    lsa_service = LSAService(eigen_vectors_number=n_eigenvectors,
+                                             weighted_eigenvector_sum=weighted_eigenvector_sum)
+                lsa_service.update_for_pse(params, self.params_paths, self.params_indices)
             lsa_hypothesis = lsa_service.run_lsa(hypo_copy, model_configuration)
             output = self.prepare_run_results(lsa_hypothesis, model_configuration)
             return True, output
         except:
             return False, None
 
+    def run_pse_batch(self, conn_matrix, grid_mode=False, model_config_service_input=None, lsa_service_input=None,
+                      yc=YC_DEF, Iext1=I_EXT1_DEF, K=K_DEF, a=A_DEF, b=B_DEF, x1eq_mode="optimize",
+                      n_eigenvectors=CalculusConfig.EIGENVECTORS_NUMBER_SELECTION, weighted_eigenvector_sum=True):
+        # Only the model configurations are computed sample by sample.
+        # The LSA of all of them is then performed at once by LSAService.run_lsa_batch()
+        if numpy.any([path.split(".")[0] == "lsa_service" for path in self.params_paths]):
+            self.logger.warning("\nLSAService parameters cannot be explored in batch mode! Running loop by loop...")
+            return self.run_pse(conn_matrix, grid_mode, model_config_service_input, lsa_service_input,
+                                yc, Iext1, K, a, b, x1eq_mode, n_eigenvectors, weighted_eigenvector_sum)
+        if isinstance(lsa_service_input, LSAService):
+            lsa_service = deepcopy(lsa_service_input)
+        elif isinstance(n_eigenvectors, basestring):
+            lsa_service = LSAService(eigen_vectors_number_selection=n_eigenvectors,
+                                     weighted_eigenvector_sum=weighted_eigenvector_sum)
+        else:
+            lsa_service = LSAService(eigen_vectors_number=n_eigenvectors,
+                                     weighted_eigenvector_sum=weighted_eigenvector_sum)
+        execution_status = []
+        model_configurations = []
+        for iloop in range(self.n_loops):
+            try:
+                model_configurations.append(
+                    self.update_hypo_model_config(self.hypothesis, self.params_vals[iloop], conn_matrix,
+                                                  model_config_service_input, yc, Iext1, K, a, b, x1eq_mode)[1])
+                execution_status.append(True)
+            except:
+                self.logger.warning("\nExecution of loop " + str(iloop) + " failed!")
+                execution_status.append(False)
+            self.rollback_params()
+        results = [None] * self.n_loops
+        if len(model_configurations) > 0:
+            model_connectivity = model_configurations[0].model_connectivity
+            if not numpy.all([numpy.array_equal(model_configuration.model_connectivity, model_connectivity)
+                              for model_configuration in model_configurations[1:]]):
+                model_connectivity = numpy.array([model_configuration.model_connectivity
+                                                  for model_configuration in model_configurations])
+            # broadcast_to keeps the precision of each parameter, so that the batch LSA computes as run_lsa() does
+            stacked = dict([(attr, numpy.array([numpy.broadcast_to(getattr(model_configuration, attr),
+                                                                   (conn_matrix.shape[0],))
+                                                for model_configuration in model_configurations]))
+                            for attr in ["zEQ", "K", "x1EQ", "e_values", "x0_values",
+                                         "yc", "Iext1", "a", "b", "d", "slope"]])
+            lsa_propagation_strengths = \
+                lsa_service.run_lsa_batch(stacked["zEQ"], stacked["K"], stacked["x1EQ"], model_connectivity,
+                                          stacked["yc"], stacked["Iext1"], stacked["a"], stacked["b"],
+                                          stacked["d"], stacked["slope"], e_values=stacked["e_values"],
+                                          x0_values=stacked["x0_values"],
+                                          n_disease=len(self.hypothesis.get_all_disease_indices()))[3]
+            for iloop, model_configuration, propagation_strengths in \
+                    zip(numpy.where(execution_status)[0], model_configurations, lsa_propagation_strengths):
+                results[iloop] = {"lsa_propagation_strengths": propagation_strengths,
+                                  "x0_values": model_configuration.x0_values,
+                                  "e_values": model_configuration.e_values, "x1EQ": model_configuration.x1EQ,
+                                  "zEQ": model_configuration.zEQ, "Ceq": model_configuration.Ceq}
+        return self._prepare_pse_output(results, execution_status, grid_mode)
+
     def prepare_run_results(self, lsa_hypothesis, model_configuration=None):
         if model_configuration is None:
             return {"lsa_propagation_strengths": lsa_hypothesis.propagation_strenghts}
@@ -1,11 +1,51 @@
+import time
 from copy import deepcopy
+from multiprocessing import Pool, cpu_count
 import numpy as np
 from abc import abstractmethod, ABCMeta
 from tvb_epilepsy.base.constants.model_constants import K_DEF, YC_DEF, I_EXT1_DEF, A_DEF, B_DEF
 from tvb_epilepsy.base.utils.log_error_utils import initialize_logger, raise_value_error
+from tvb_epilepsy.io.head_cache import MemmapReference, memmap_reference
 from tvb_epilepsy.service.model_configuration_builder import ModelConfigurationBuilder
 
 
+class PSEParamsSetter(object):
+    """
+    In place setter of the values of all PSE parameters that concern the same attribute of an object.
+    It is compiled once from the parameters' paths and indices,
+    and then sets each sample's values with a single indexed assignment, keeping the previous values for a rollback.
+    """
+
+    def __init__(self, attribute_path, params_columns, indices=None):
+        # attribute_path: names of the attributes leading from the object to the parameter
+        # params_columns: positions of the values in a sample, one per index
+        # indices: the indices of the (array) attribute to be set, or None to set the whole attribute
+        self.attribute_path = tuple(attribute_path)
+        self.params_columns = np.array(params_columns, dtype="i")
+        self.indices = indices
+        self._previous = []
+
+    def apply(self, object, params):
+        for attr in self.attribute_path[:-1]:
+            object = getattr(object, attr)
+        attr = self.attribute_path[-1]
+        if self.indices is None:
+            self._previous.append((object, getattr(object, attr)))
+            setattr(object, attr, params[self.params_columns[0]])
+        else:
+            values = getattr(object, attr)
+            self._previous.append((values, values[self.indices].copy()))
+            values[self.indices] = params[self.params_columns]
+
+    def rollback(self):
+        while len(self._previous) > 0:
+            target, previous = self._previous.pop()
+            if self.indices is None:
+                setattr(target, self.attribute_path[-1], previous)
+            else:
+                target[self.indices] = previous
+
+
 class ABCPSEService(object):
     __metaclass__ = ABCMeta
 
@@ -17,38 +57,98 @@ class ABCPSEService(object):
     params_names = []
     n_params_vals = []
     n_params = 0
+    current_loop = None
+    # Minimum time in seconds between two progress reports of the PSE loops
+    progress_report_interval = 10.0
+    # If True, apply the parameters' values of every loop in place, and roll them back afterwards,
+    # instead of copying the objects they concern:
+    copy_free = False
+    params_setters = None
+    _applied_params = []
 
     def run_pse(self, conn_matrix, grid_mode=False, *kwargs):
+        results, execution_status = self._run_loops(range(self.n_loops), conn_matrix, *kwargs)
+        return self._prepare_pse_output(results, execution_status, grid_mode)
+
+    def run_pse_parallel(self, conn_matrix, grid_mode=False, n_processes=None, *kwargs):
+        """
+        Run the PSE loops on a pool of worker processes.
+        Each worker receives its own copy of this service (and of the hypothesis it holds), of conn_matrix and of any
+        additional arguments of run(), only once, at its initialization.
+        If conn_matrix is memory-mapped from a cached head (see H5Reader.read_head(path, use_cache=True)),
+        the workers map the same file, instead of receiving a copy of it.
+        The loops are then split into contiguous chunks and the results are gathered back in the original loop order.
+        :param conn_matrix: model connectivity matrix
+        :param grid_mode: if True, reshape results and execution status to the parameters' grid
+        :param n_processes: number of worker processes (default: the number of CPUs)
+        :param kwargs: the rest of the positional arguments of run()
+        :return: results, execution_status, as for run_pse()
+        """
+        if n_processes is None:
+            n_processes = cpu_count()
+        n_processes = int(max(1, min(n_processes, self.n_loops)))
+        if n_processes == 1:
+            return self.run_pse(conn_matrix, grid_mode, *kwargs)
+        # Use a few chunks per process, so that faster workers can take over the remaining loops
+        chunks = [chunk.tolist()
+                  for chunk in np.array_split(np.arange(self.n_loops), min(self.n_loops, 4 * n_processes))]
+        self.logger.info("\nExecuting " + str(self.n_loops) + " loops in " + str(len(chunks)) + " chunks, on " +
+                         str(n_processes) + " processes...")
         results = []
         execution_status = []
-        loop_tenth = 1
-        for iloop in range(self.n_loops):
+        conn_matrix_reference = memmap_reference(conn_matrix)
+        if conn_matrix_reference is not None:
+            conn_matrix = conn_matrix_reference
+        pool = Pool(n_processes, _initialize_pse_worker, (self, conn_matrix, kwargs))
+        try:
+            for ichunk, (chunk_results, chunk_status) in enumerate(pool.imap(_run_pse_worker_chunk, chunks)):
+                results += chunk_results
+                execution_status += chunk_status
+                self.logger.info("\nExecuted chunk " + str(ichunk + 1) + " of " + str(len(chunks)) +
+                                 " (" + str(len(results)) + " of " + str(self.n_loops) + " loops)")
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        return self._prepare_pse_output(results, execution_status, grid_mode)
+
+    def _run_loops(self, loops_indices, conn_matrix, *kwargs):
+        results = []
+        execution_status = []
+        n_loops = len(loops_indices)
+        last_report = None
+        for counter, iloop in enumerate(loops_indices):
             params = self.params_vals[iloop]
-            if iloop == 0 or iloop + 1 >= loop_tenth * self.n_loops / 10.0:
-                print "\nExecuting loop " + str(iloop + 1) + " of " + str(self.n_loops)
-                if iloop > 0:
-                    loop_tenth += 1
+            # Report progress at the first and last loop, and at most once every progress_report_interval seconds
+            if last_report is None or counter + 1 == n_loops or \
+                    time.time() - last_report >= self.progress_report_interval:
+                self.logger.info("\nExecuting loop " + str(iloop + 1) + " of " + str(self.n_loops) +
+                                 " (" + str(counter + 1) + " of " + str(n_loops) + " loops of this run)")
+                last_report = time.time()
 
             status = False
             output = None
+            # Let run() know which loop it executes, e.g., for naming its output files
+            self.current_loop = iloop
             try:
                 status, output = self.run(params, conn_matrix, *kwargs)
             except:
                 pass
+            self.rollback_params()
             if not status:
                 self.logger.warning("\nExecution of loop " + str(iloop) + " failed!")
             results.append(output)
             execution_status.append(status)
+        return results, execution_status
+
+    def _prepare_pse_output(self, results, execution_status, grid_mode=False):
         if grid_mode:
             results = np.reshape(np.array(results, dtype="O"), tuple(self.n_params_vals))
             execution_status = np.reshape(np.array(execution_status), tuple(self.n_params_vals))
         return results, execution_status
 
-    @abstractmethod
-    def run_pse_parallel(self):
-        # TODO: start each loop on a separate process, gather results and return them
-        pass
-
     @abstractmethod
     def run(self, *kwargs):
         pass
@@ -59,6 +159,12 @@ class ABCPSEService(object):
 
     def prepare_params(self, params_pse):
         if isinstance(params_pse, list):
+            self.params_setters = None
+            # Do not append to the lists of the class attributes, shared by all instances:
+            self.params_paths = []
+            self.params_indices = []
+            self.params_names = []
+            self.n_params_vals = []
             temp = []
             for param in params_pse:
                 self.params_paths.append(param["path"])
@@ -85,19 +191,76 @@ class ABCPSEService(object):
         else:
             self.logger.warning("\nparams_pse is not a list of tuples!")
 
+    def compile_params_setters(self):
+        # Group the parameters by object and attribute, once for all loops
+        setters = {}
+        for icol, (path, indices) in enumerate(zip(self.params_paths, self.params_indices)):
+            path = path.split(".")
+            key = (path[0], tuple(path[1:]))
+            indices = np.array(indices).flatten().tolist()
+            columns, all_indices = setters.get(key, ([], []))
+            if len(indices) > 0:
+                setters[key] = (columns + [icol] * len(indices), all_indices + indices)
+            else:
+                setters[key] = (columns + [icol], None)
+        self.params_setters = {}
+        for (object_name, attribute_path), (columns, indices) in setters.iteritems():
+            self.params_setters.setdefault(object_name, []).append(PSEParamsSetter(attribute_path, columns, indices))
+        return self.params_setters
+
+    def apply_params(self, object, params, object_name=None, restore_attributes=True):
+        # Set in place the values of the parameters concerning this object, until rollback_params() is called.
+        # If restore_attributes is True, any other attribute of the object reassigned meanwhile is restored as well.
+        if self.params_setters is None:
+            self.compile_params_setters()
+        if not (isinstance(object_name, basestring)):
+            object_name = object.__class__.__name__
+        setters = self.params_setters.get(object_name, [])
+        # A shallow copy of the object's attributes is enough to restore any of them that gets reassigned:
+        if restore_attributes:
+            attributes = dict(object.__dict__)
+        else:
+            attributes = None
+        self._applied_params = self._applied_params + [(object, attributes, setters)]
+        for setter in setters:
+            setter.apply(object, params)
+        return object
+
+    def rollback_params(self):
+        while len(self._applied_params) > 0:
+            object, attributes, setters = self._applied_params.pop()
+            for setter in reversed(setters):
+                setter.rollback()
+            if attributes is not None:
+                object.__dict__.clear()
+                object.__dict__.update(attributes)
+
     def update_hypo_model_config(self, hypothesis, params, conn_matrix, model_config_service_input=None,
                            yc=YC_DEF, Iext1=I_EXT1_DEF, K=K_DEF, a=A_DEF, b=B_DEF, x1eq_mode="optimize",):
-        # Copy and update hypothesis
-        hypo_copy = deepcopy(hypothesis)
-        hypo_copy.update_for_pse(params, self.params_paths, self.params_indices)
+        if self.copy_free:
+            # Update hypothesis in place
+            hypo_copy = self.apply_params(hypothesis, params, "hypothesis")
+        else:
+            # Copy and update hypothesis
+            hypo_copy = deepcopy(hypothesis)
+            hypo_copy.update_for_pse(params, self.params_paths, self.params_indices)
         # Create a ModelConfigService and update it
         if isinstance(model_config_service_input, ModelConfigurationBuilder):
-            model_configuration_builder = deepcopy(model_config_service_input)
+            if self.copy_free:
+                model_configuration_builder = self.apply_params(model_config_service_input, params,
+                                                                "model_configuration_builder")
+            else:
+                model_configuration_builder = deepcopy(model_config_service_input)
+                # Share any equilibrium solver across loops, so that it can warm start from the previous solution
+                model_configuration_builder.equilibrium_solver = \
+                    getattr(model_config_service_input, "equilibrium_solver", None)
+                model_configuration_builder.set_attributes_from_pse(params, self.params_paths,
+                                                                    self.params_indices)
         else:
             model_configuration_builder = ModelConfigurationBuilder(hypo_copy.number_of_regions,
                                                                     yc=yc, Iext1=Iext1, K=K, a=a, b=b,
                                                                     x1eq_mode=x1eq_mode)
-        model_configuration_builder.set_attributes_from_pse(params, self.params_paths, self.params_indices)
+            model_configuration_builder.set_attributes_from_pse(params, self.params_paths, self.params_indices)
         # Obtain Modelconfiguration
         if hypo_copy.type == "Epileptogenicity":
             model_configuration = model_configuration_builder.build_model_from_E_hypothesis(hypo_copy,
@@ -127,4 +290,21 @@ class ABCPSEService(object):
         for i, path in enumerate(self.params_paths):
             path = path.split(".")
             if path[0] == object_type:
-                self.set_object_attribute_recursively(object, params[i], path[1:], self.params_indices[i])
\ No newline at end of file
+                self.set_object_attribute_recursively(object, params[i], path[1:], self.params_indices[i])
+
+
+# Every worker process of ABCPSEService.run_pse_parallel keeps its own copy of the service and of the run() arguments:
+_pse_worker_state = {}
+
+
+def _initialize_pse_worker(pse_service, conn_matrix, run_args):
+    if isinstance(conn_matrix, MemmapReference):
+        conn_matrix = conn_matrix.load()
+    _pse_worker_state["pse_service"] = pse_service
+    _pse_worker_state["conn_matrix"] = conn_matrix
+    _pse_worker_state["run_args"] = run_args
+
+
+def _run_pse_worker_chunk(loops_indices):
+    return _pse_worker_state["pse_service"]._run_loops(loops_indices, _pse_worker_state["conn_matrix"],
+                                                       *_pse_worker_state["run_args"])
@@ -1,74 +1,133 @@
+import os
+import time
 import numpy
 from copy import deepcopy
 from tvb_epilepsy.base.constants.model_constants import K_DEF, YC_DEF, I_EXT1_DEF, A_DEF, B_DEF
-from tvb_epilepsy.base.utils.log_error_utils import raise_not_implemented_error
-from tvb_epilepsy.base.utils.data_structures_utils import formal_repr
-from tvb_epilepsy.service.epileptor_model_factory import model_build_dict
+from tvb_epilepsy.base.utils.log_error_utils import raise_value_error
+from tvb_epilepsy.base.utils.data_structures_utils import formal_repr, isequal_string
 from tvb_epilepsy.service.pse.pse_service import ABCPSEService
 from tvb_epilepsy.base.model.disease_hypothesis import DiseaseHypothesis
 from tvb_epilepsy.service.simulator.simulator_tvb import SimulatorTVB
 from tvb_epilepsy.service.simulator.simulator_java import java_model_builder
 
 
+def compute_simulation_summary_features(time, data):
+    # Summary features of each variable of interest and region, computed along time
+    data = numpy.array(data)
+    return {"mean": numpy.mean(data, axis=0), "std": numpy.std(data, axis=0),
+            "min": numpy.min(data, axis=0), "max": numpy.max(data, axis=0),
+            "argmax_time": numpy.array(time)[numpy.argmax(data, axis=0)]}
+
+
 class SimulationPSEService(ABCPSEService):
     task = "SIMULATION"
     simulator = None
+    output_modes = ["data", "features", "h5"]
 
-    def __init__(self, simulator, params_pse=None):
+    def __init__(self, simulator, params_pse=None, output_mode="data", output_folder=None, summary_features=None,
+                 copy_free=False):
+        """
+        :param output_mode: "data" to return the time series of every loop,
+                            "features" to return only their summary features,
+                            or "h5" to stream them to a file per loop in output_folder and return its path
+        :param summary_features: function of (time, data) returning the features of a simulation
+                                 (default: compute_simulation_summary_features)
+        """
         super(SimulationPSEService, self).__init__()
+        self.copy_free = copy_free
         self.simulator = simulator
         self.params_pse = params_pse
         self.prepare_params(params_pse)
+        if output_mode not in self.output_modes:
+            raise_value_error("Output mode " + str(output_mode) + " is not one of " + str(self.output_modes) + "!")
+        if isequal_string(output_mode, "h5") and not (isinstance(output_folder, basestring)):
+            raise_value_error("An output folder is needed to stream the simulations to files!")
+        self.output_mode = output_mode
+        self.output_folder = output_folder
+        if summary_features is None:
+            summary_features = compute_simulation_summary_features
+        self.summary_features = summary_features
+        # The simulator that is configured once and then updated and relaunched by every loop of each process:
+        self._pse_simulator = None
+        self._pse_simulator_pid = None
+        self._pse_noise_random_state = None
 
     def __repr__(self):
         d = {"01. Task": self.task,
              "02. Main PSE object": self.simulator,
              "03. Number of computation loops": self.n_loops,
              "04. Parameters": numpy.array(["%s" % l for l in self.params_names]),
+             "05. Output mode": self.output_mode
              }
         return formal_repr(self, d)
 
     def __str__(self):
         return self.__repr__()
 
-    def run_pse_parallel(self):
-        raise_not_implemented_error("PSE parallel not implemented!", self.logger)
+    def _get_pse_simulator(self):
+        # Only TVB simulators can be updated in place. Any other simulator is copied for every loop.
+        if not (isinstance(self.simulator, SimulatorTVB)):
+            return deepcopy(self.simulator)
+        # Every (worker) process copies and keeps its own simulator, only once
+        if self._pse_simulator is None or self._pse_simulator_pid != os.getpid():
+            self._pse_simulator = deepcopy(self.simulator)
+            self._pse_simulator_pid = os.getpid()
+            self._pse_noise_random_state = self._pse_simulator.get_noise_random_state()
+        return self._pse_simulator
 
     def run(self, params, conn_matrix, hypothesis_input=None, model_config_service_input=None,
             yc=YC_DEF, Iext1=I_EXT1_DEF, K=K_DEF, a=A_DEF, b=B_DEF, x1eq_mode="optimize",
             update_initial_conditions=True):
-        # Create new objects from the input simulator
-        simulator_copy = deepcopy(self.simulator)
-        model_copy = deepcopy(simulator_copy.model)
+        start = time.time()
         try:
+            simulator = self._get_pse_simulator()
             if isinstance(hypothesis_input, DiseaseHypothesis):
                 # Copy and update hypothesis
                 model_configuration = \
                     self.update_hypo_model_config(hypothesis_input, params, conn_matrix,
                                                   model_config_service_input, yc, Iext1, K, a, b, x1eq_mode)[1]
-                # Update simulator with new ModelConfiguration
-                simulator_copy.model_configuration = model_configuration
-                # Generate Model with new ModelConfiguration
-                if isinstance(simulator_copy, SimulatorTVB):
-                    model = model_build_dict[model_copy._ui_name](model_configuration, zmode=model_copy.zmode)
+                if isinstance(simulator, SimulatorTVB):
+                    # Update only the x0, K, etc parameters of the already configured model
+                    simulator.update_model_configuration(model_configuration)
                 else:
-                    model = java_model_builder(model_configuration)
-                simulator_copy.model = model
-            # Update model if needed
-            # TODO: check if the name "model" is correct!
-            self.update_object(simulator_copy.model, params, object_type="model")
-            # Update other possible remaining parameters, i.e., concerning the integrator, noise etc
-            # TODO: check if the name "SimulatorTVB" is correct!
-            self.update_object(simulator_copy, params, object_type="SimulatorTVB")
+                    # Update simulator with new ModelConfiguration and a new model
+                    simulator.model_configuration = model_configuration
+                    simulator.model = java_model_builder(model_configuration)
+            if self.copy_free:
+                # Update in place the model and any other parameters, until the rollback at the end of the loop
+                self.apply_params(simulator.model, params, "model", restore_attributes=False)
+                self.apply_params(simulator, params, "SimulatorTVB")
+            else:
+                # Update model if needed
+                self.update_object(simulator.model, params, object_type="model")
+                # Update other possible remaining parameters, i.e., concerning the integrator, noise etc
+                self.update_object(simulator, params, object_type="SimulatorTVB")
+            if isinstance(simulator, SimulatorTVB):
+                simulator.set_noise_intensity(simulator.simulation_settings.noise_intensity)
+                # Every loop starts from time 0 and with the same noise, independently of the process running it
+                simulator.reset_simulation(self._pse_noise_random_state)
             # Now, recalculate the default initial conditions...
             # If initial conditions were parameters, then, this flag can be set to False
             if update_initial_conditions:
-                simulator_copy.configure_initial_conditions()
-            time, data, status = simulator_copy.launch()
-            output = self.prepare_run_results(data, time)
-            return True, output
+                simulator.configure_initial_conditions()
+            if isequal_string(self.output_mode, "h5"):
+                output_path = os.path.join(self.output_folder, "SimulationPSE_loop" + str(self.current_loop) + ".h5")
+                time_series, data, status = simulator.launch_simulation(output_path=output_path)
+                if status:
+                    data.file.close()
+                output = {"output_path": output_path}
+            else:
+                time_series, data, status = simulator.launch_simulation()
+                output = self.prepare_run_results(data, time_series)
+            output["execution_time"] = time.time() - start
+            self.logger.info("\nLoop " + str(self.current_loop) + " executed in " + str(output["execution_time"]) +
+                             " secs")
+            return status, output
         except:
             return False, None
 
     def prepare_run_results(self, data, time):
-        return {"time": time, "data": data}
+        if isequal_string(self.output_mode, "features"):
+            return {"features": self.summary_features(time, data)}
+        else:
+            return {"time": time, "data": data}
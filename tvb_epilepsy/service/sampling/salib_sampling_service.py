@@ -1,6 +1,5 @@
 import importlib
 import numpy as np
-from SALib.sample import saltelli, fast_sampler, morris, ff
 from tvb_epilepsy.base.constants.config import CalculusConfig
 from tvb_epilepsy.base.utils.log_error_utils import raise_not_implemented_error
 from tvb_epilepsy.base.model.parameter import Parameter
@@ -32,18 +31,20 @@ class SalibSamplingService(StochasticSamplingService):
         low, high, n_outputs, parameter_shape = self.check_size(low, high, parameter_shape)
         bounds = [list(b) for b in zip(low.tolist(), high.tolist())]
         self.adjust_shape(parameter_shape)
-        self.sampler = importlib.import_module("SALib.sample." + self.sampler).sample
+        # SALib is imported only when sampling
+        sampler_name = self.sampler
+        self.sampler = importlib.import_module("SALib.sample." + sampler_name).sample
         size = self.n_samples
         problem = {'num_vars': n_outputs, 'bounds': bounds}
-        if self.sampler is ff.sample:
+        if sampler_name == "ff":
             samples = (self.sampler(problem)).T
         else:
             other_params = {}
-            if self.sampler is saltelli.sample:
+            if sampler_name == "saltelli":
                 size = int(np.round(1.0 * size / (2 * n_outputs + 2)))
-            elif self.sampler is fast_sampler.sample:
+            elif sampler_name == "fast_sampler":
                 other_params = {"M": kwargs.get("M", 4)}
-            elif self.sampler is morris.sample:
+            elif sampler_name == "morris":
                 # I don't understand this method and its inputs. I don't think we will ever use it.
                 raise_not_implemented_error()
             samples = self.sampler(problem, size, **other_params)
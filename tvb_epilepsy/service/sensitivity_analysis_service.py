@@ -1,5 +1,4 @@
 import numpy as np
-from SALib.analyze import sobol, delta, fast, morris, dgsm, ff
 from tvb_epilepsy.base.utils.log_error_utils import raise_value_error, initialize_logger
 from tvb_epilepsy.base.utils.data_structures_utils import dict_str, formal_repr, list_of_dicts_to_dicts_of_ndarrays
 
@@ -129,6 +128,9 @@ class SensitivityAnalysisService(object):
 
     def run(self, input_ids=None, output_ids=None, method=None, calc_second_order=None, conf_level=None, **kwargs):
 
+        # SALib is imported only when an analysis is run
+        from SALib.analyze import sobol, delta, fast, morris, dgsm, ff
+
         self._update_parameters(method, calc_second_order, conf_level)
 
         self.other_parameters = kwargs
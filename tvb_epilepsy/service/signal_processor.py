@@ -1,6 +1,7 @@
 
 import numpy as np
 from scipy.signal import decimate
+from tvb_epilepsy.base.computations.analyzers_utils import filtfilt_data
 
 def decimate_signals(signals, time, decim_ratio):
     signals = decimate(signals, decim_ratio, axis=0, zero_phase=True)
@@ -17,6 +18,37 @@ def cut_signals_tails(signals, time, cut_tails):
     return signals, time, n_times
 
 
+def project_signals(signals, gain_matrix, fs=None, lowcut=None, highcut=None, mode="bandpass", order=3,
+                    block_length=None, pad_length=None):
+    """
+    Projects signals (time x sources) to sensors via a gain matrix (sensors x sources) and,
+    if fs is given, zero phase filters all sensors' signals at once, in consecutive blocks of time.
+    Every block is filtered together with pad_length points of its neighbours on either side,
+    which are long enough for the filter's response to decay, and are then discarded.
+    :param block_length: number of time points per block (default: all of them at once)
+    :param pad_length: number of padding points per side (default: 10 periods of the lowest cut off frequency)
+    :return: generator of (first time index, projected block (time x sensors))
+    """
+    n_times = signals.shape[0]
+    if block_length is None:
+        block_length = n_times
+    block_length = max(int(block_length), 1)
+    filter_flag = fs is not None and (lowcut is not None or highcut is not None)
+    if not filter_flag or block_length >= n_times:
+        pad_length = 0
+    elif pad_length is None:
+        pad_length = int(np.ceil(10 * fs / np.min([cut for cut in [lowcut, highcut] if cut is not None])))
+    for start in range(0, n_times, block_length):
+        stop = min(start + block_length, n_times)
+        padded_start = max(start - pad_length, 0)
+        padded_stop = min(stop + pad_length, n_times)
+        # Sensors x time, so that filtering runs along contiguous memory
+        block = gain_matrix.dot(signals[padded_start:padded_stop].T)
+        if filter_flag:
+            block = filtfilt_data(block, fs, lowcut, highcut, mode, order, axis=-1)
+        yield start, block[:, start - padded_start:stop - padded_start].T
+
+
 #TODO: Decide upon this commented method
 # def compute_envelope(data, time, samp_rate, hp_freq=5.0, lp_freq=0.1, benv_cut=100, cut_tails=None, order=3):
 #     if cut_tails is not None:
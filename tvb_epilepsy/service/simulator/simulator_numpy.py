@@ -0,0 +1,199 @@
+"""
+Mechanism for launching batches of simulations of the EpileptorDP2D and EpileptorDP models,
+with difference coupling, no time delays and additive white noise, vectorized in NumPy.
+"""
+
+import sys
+import time
+import numpy
+from tvb_epilepsy.base.constants.model_constants import WHITE_NOISE
+from tvb_epilepsy.base.utils.log_error_utils import initialize_logger, raise_value_error
+from tvb_epilepsy.base.utils.data_structures_utils import isequal_string
+from tvb_epilepsy.service.simulator.simulator import ABCSimulator
+
+
+class _BatchModelParameters(object):
+    """
+    Proxy of a model, whose parameters are replaced by their (..., n_batch) batch values, if any,
+    so that the model's dfun can be applied to a (nvar, n_regions, n_batch) state,
+    i.e., with the batch in the place of TVB's modes.
+    """
+
+    def __init__(self, model, batch_parameters):
+        self._model = model
+        self._batch_parameters = batch_parameters
+
+    def __getattr__(self, attr):
+        if attr in self._batch_parameters:
+            return self._batch_parameters[attr]
+        return getattr(self._model, attr)
+
+
+class SimulatorNumPy(ABCSimulator):
+    """
+    This class integrates a batch of n_batch parameter sets of an EpileptorDP2D or EpileptorDP model,
+    as a single (nvar, n_regions, n_batch) state array, with the Euler-Maruyama method,
+    reusing the dfun of the model.
+    """
+    logger = initialize_logger(__name__)
+
+    AVAILABLE_MODELS = ["EpileptorDP2D", "EpileptorDP"]
+
+    def __init__(self, connectivity, model_configuration, model, simulation_settings, batch_parameters={}):
+        """
+        :param batch_parameters: dictionary of model parameters' names and values of shape (n_batch, )
+                                 or (n_batch, n_regions), with the model's (not the model configuration's) conventions
+                                 (e.g., K has the opposite sign)
+        """
+        if model._ui_name not in self.AVAILABLE_MODELS:
+            raise_value_error("Model " + model._ui_name + " is not one of the models available for SimulatorNumPy: "
+                              + str(self.AVAILABLE_MODELS) + "!")
+        self.model = model
+        self.simulation_settings = simulation_settings
+        self.model_configuration = model_configuration
+        self.connectivity = connectivity
+        self.n_regions = self.connectivity.number_of_regions
+        self._configure_model_parameters()
+        self.n_batch = 1
+        self.batch_parameters = {}
+        self.set_batch_parameters(batch_parameters)
+        self.initial_conditions = None
+
+    def _configure_model_parameters(self):
+        # As the TVB simulator does, make sure that spatialized model parameters have the shape (n_regions, 1):
+        excluded_params = ("state_variable_range", "variables_of_interest", "noise", "psi_table", "nerf_table")
+        for param in self.model.trait.keys():
+            if param not in excluded_params:
+                region_parameters = getattr(self.model, param)
+                if region_parameters.size == self.n_regions:
+                    setattr(self.model, param, region_parameters.reshape((self.n_regions, 1)))
+
+    def set_batch_parameters(self, batch_parameters):
+        n_batch = []
+        self.batch_parameters = {}
+        for p_name, p_values in batch_parameters.iteritems():
+            p_values = numpy.array(p_values, dtype="float64")
+            if p_values.ndim == 1:
+                p_values = numpy.expand_dims(p_values, 1)
+            if p_values.ndim != 2 or p_values.shape[1] not in [1, self.n_regions]:
+                raise_value_error("Batch parameter " + p_name + " is neither of shape (n_batch, ) " +
+                                  "nor (n_batch, n_regions), but " + str(p_values.shape) + "!")
+            n_batch.append(p_values.shape[0])
+            # Store them as (n_regions or 1, n_batch) to broadcast against the model's (n_regions, 1) parameters:
+            self.batch_parameters[p_name] = p_values.T
+        if len(numpy.unique(n_batch)) > 1:
+            raise_value_error("Batch parameters are not of the same batch size: " + str(n_batch) + "!")
+        if len(n_batch) > 0:
+            self.n_batch = n_batch[0]
+        else:
+            self.n_batch = 1
+        return self
+
+    def _model_connectivity(self):
+        if isinstance(self.model_configuration.model_connectivity, numpy.ndarray):
+            return self.model_configuration.model_connectivity
+        else:
+            return self.connectivity.normalized_weights
+
+    def config_simulation(self, initial_conditions=None, **kwargs):
+        if not (isequal_string(self.simulation_settings.noise_type, WHITE_NOISE)):
+            raise_value_error("SimulatorNumPy supports only additive white noise!")
+        self.configure_initial_conditions(initial_conditions)
+
+    def configure_initial_conditions(self, initial_conditions=None):
+        # Initial conditions of shape (nvar, n_regions) or (n_batch, nvar, n_regions):
+        if not (isinstance(initial_conditions, numpy.ndarray)):
+            initial_conditions = self.prepare_initial_conditions(1)[0, :, :, 0]
+        initial_conditions = numpy.array(initial_conditions, dtype="float64")
+        if initial_conditions.ndim == 2:
+            initial_conditions = numpy.tile(initial_conditions, (self.n_batch, 1, 1))
+        if initial_conditions.shape != (self.n_batch, self.model._nvar, self.n_regions):
+            raise_value_error("Initial conditions' shape " + str(initial_conditions.shape) +
+                              " is not equal to (n_batch, nvar, n_regions) = " +
+                              str((self.n_batch, self.model._nvar, self.n_regions)) + "!")
+        self.initial_conditions = initial_conditions
+
+    def _compile_variables_of_interest(self):
+        # Each variable of interest is either the index of a state variable,
+        # or an expression of the state variables (e.g., "x2 - x1"), compiled once before the integration
+        state_variables = list(self.model.state_variables)
+        return [state_variables.index(voi) if voi in state_variables else compile(voi, "<voi>", "eval")
+                for voi in self.model.variables_of_interest]
+
+    def _add_variables_of_interest(self, vois, state, voi_sum):
+        # Add the variables of interest of state (nvar, n_regions, n_batch) to voi_sum (nvoi, n_regions, n_batch)
+        state_dict = None
+        for ivoi, voi in enumerate(vois):
+            if isinstance(voi, int):
+                voi_sum[ivoi] += state[voi]
+            else:
+                if state_dict is None:
+                    state_dict = dict(zip(self.model.state_variables, state))
+                voi_sum[ivoi] += eval(voi, {}, state_dict)
+
+    def launch_simulation(self, report_every_n_monitor_steps=None):
+        """
+        :return: time (n_samples, ), data (n_samples, nvoi, n_regions, n_batch), status,
+                 i.e., with the batch dimension at the position of TVB's modes,
+                 so that data[:, :, :, 0] corresponds to the first parameter set
+        """
+        if self.initial_conditions is None:
+            self.configure_initial_conditions()
+        dt = self.simulation_settings.integration_step
+        n_steps = int(numpy.round(self.simulation_settings.simulated_period / dt))
+        # Temporal average monitor:
+        n_steps_per_sample = int(max(1, numpy.round(self.simulation_settings.monitor_sampling_period / dt)))
+        n_samples = n_steps / n_steps_per_sample
+        if report_every_n_monitor_steps >= 1:
+            n_report_blocks = max(report_every_n_monitor_steps * numpy.round(n_samples / 100.0), 1.0)
+        else:
+            n_report_blocks = 1
+        block_length = n_samples / n_report_blocks
+        curr_block = 1.0
+
+        model = _BatchModelParameters(self.model, self.batch_parameters)
+        dfun = self.model.dfun.im_func
+        w = self._model_connectivity()
+        w_sum = numpy.sum(w, axis=1)
+        cvar = self.model.cvar
+        # Additive white noise: sqrt(2 * nsig * dt) * N(0, 1), for each state variable
+        noise_std = numpy.sqrt(2.0 * dt * numpy.array(self.simulation_settings.noise_intensity) *
+                               numpy.ones((self.model._nvar,)))[:, numpy.newaxis, numpy.newaxis]
+        random_state = numpy.random.RandomState(self.simulation_settings.noise_seed)
+
+        # state of shape (nvar, n_regions, n_batch)
+        state = numpy.transpose(self.initial_conditions, (1, 2, 0)).copy()
+        vois = self._compile_variables_of_interest()
+        n_vois = len(vois)
+        tavg_time = numpy.empty((n_samples,))
+        tavg_data = numpy.empty((n_samples, n_vois, self.n_regions, self.n_batch))
+        voi_sum = numpy.zeros((n_vois, self.n_regions, self.n_batch))
+
+        start = time.time()
+        try:
+            for step in range(1, n_samples * n_steps_per_sample + 1):
+                # Difference coupling: sum_j(wij * (xj - xi))
+                coupling = numpy.array([numpy.dot(w, state[icvar]) for icvar in cvar]) - \
+                           state[cvar] * w_sum[:, numpy.newaxis]
+                state += dt * dfun(model, state, coupling) + noise_std * random_state.randn(*state.shape)
+                self._add_variables_of_interest(vois, state, voi_sum)
+                if step % n_steps_per_sample == 0:
+                    i_sample = step / n_steps_per_sample - 1
+                    tavg_time[i_sample] = (step - n_steps_per_sample / 2.0) * dt
+                    tavg_data[i_sample] = voi_sum / n_steps_per_sample
+                    voi_sum[:] = 0.0
+                    if n_report_blocks > 1 and i_sample + 1 >= curr_block * block_length:
+                        print_this = "\r" + "..." + str(100.0 * (i_sample + 1) / n_samples) + "% done in " + \
+                                     str(time.time() - start) + " secs"
+                        sys.stdout.write(print_this)
+                        sys.stdout.flush()
+                        curr_block += 1.0
+        except Exception, error_message:
+            self.logger.warning("Something went wrong with this simulation...:" + "\n" + str(error_message))
+            return None, None, False
+
+        if not (numpy.all(numpy.isfinite(tavg_data))):
+            self.logger.warning("Simulation diverged to non finite values!")
+            return tavg_time, tavg_data, False
+
+        return tavg_time, tavg_data, True
@@ -5,12 +5,14 @@ Mechanism for launching TVB simulations.
 import sys
 import time
 import numpy
+import h5py
 from tvb.datatypes import connectivity
 from tvb.simulator import coupling, integrators, simulator
 from tvb_epilepsy.base.constants.model_constants import TIME_DELAYS_FLAG
 from tvb_epilepsy.base.utils.log_error_utils import initialize_logger
+from tvb_epilepsy.io.h5_writer import H5TimeSeriesWriter
 from tvb_epilepsy.service.simulator.simulator import ABCSimulator
-from tvb_epilepsy.service.epileptor_model_factory import model_build_dict
+from tvb_epilepsy.service.epileptor_model_factory import model_build_dict, model_configuration_params_dict
 
 
 class SimulatorTVB(ABCSimulator):
@@ -55,7 +57,17 @@ class SimulatorTVB(ABCSimulator):
 
         self.configure_initial_conditions(initial_conditions=initial_conditions)
 
-    def launch_simulation(self, report_every_n_monitor_steps=None):
+    def launch_simulation(self, report_every_n_monitor_steps=None, output_path=None, compression=None,
+                          buffer_length=1024):
+        """
+        :param report_every_n_monitor_steps: frequency of progress reports (and of writing blocks, if streaming)
+        :param output_path: if not None, stream the monitor samples into the "time" and "data" datasets
+                            of a resizable, chunked HDF5 file at this path, instead of keeping them in memory
+        :param compression: optional h5py compression filter (e.g., "gzip", "lzf") for the streamed datasets
+        :param buffer_length: maximum number of monitor samples kept in memory before writing them to file
+        :return: time, data, status, where, when streaming, time and data are lazy h5py datasets
+                 of the file opened for reading (close it via data.file.close())
+        """
         if report_every_n_monitor_steps >= 1:
             time_length_avg = numpy.round(self.simulation_settings.simulated_period / self.simTVB.monitors[0].period)
             n_report_blocks = max(report_every_n_monitor_steps * numpy.round(time_length_avg / 100), 1.0)
@@ -66,7 +78,10 @@ class SimulatorTVB(ABCSimulator):
 
         status = True
 
-        if n_report_blocks < 2:
+        if output_path is not None:
+            return self._launch_simulation_to_h5(n_report_blocks, output_path, compression, buffer_length)
+
+        elif n_report_blocks < 2:
             try:
                 tavg_time, tavg_data = self.simTVB.run()[0]
 
@@ -99,12 +114,7 @@ class SimulatorTVB(ABCSimulator):
                         tavg_data.append(tavg[0][1])
 
                     if curr_time_step >= curr_block * block_length:
-                        end_block = time.time()
-                        # TODO: correct this part to print percentage of simulation at the same line by erasing previous
-                        print_this = "\r" + "..." + str(100 * curr_time_step / sim_length) + "% done in " + \
-                                     str(end_block - start) + " secs"
-                        sys.stdout.write(print_this)
-                        sys.stdout.flush()
+                        self._report_progress(curr_time_step, sim_length, start)
                         curr_block += 1.0
             except Exception, error_message:
                 status = False
@@ -113,6 +123,63 @@ class SimulatorTVB(ABCSimulator):
 
             return numpy.array(tavg_time), numpy.array(tavg_data), status
 
+    def _report_progress(self, curr_time_step, sim_length, start):
+        # TODO: correct this part to print percentage of simulation at the same line by erasing previous
+        print_this = "\r" + "..." + str(100 * curr_time_step / sim_length) + "% done in " + \
+                     str(time.time() - start) + " secs"
+        sys.stdout.write(print_this)
+        sys.stdout.flush()
+
+    def _launch_simulation_to_h5(self, n_report_blocks, output_path, compression=None, buffer_length=1024):
+        sim_length = self.simTVB.simulation_length / self.simTVB.monitors[0].period
+        block_length = sim_length / n_report_blocks
+        buffer_length = int(max(1, buffer_length))
+        curr_time_step = 0.0
+        curr_block = 1.0
+
+        # Chunks of at most buffer_length samples and about 1MB
+        ts_writer = H5TimeSeriesWriter(output_path, self.simTVB.monitors[0].period, compression=compression,
+                                       chunk_length=buffer_length)
+        time_buffer, data_buffer = [], []
+
+        def flush():
+            # Append the buffered samples to the resizable datasets
+            if len(time_buffer) > 0:
+                ts_writer.append("time", numpy.array(time_buffer))
+                ts_writer.append("data", numpy.array(data_buffer))
+                del time_buffer[:]
+                del data_buffer[:]
+                ts_writer.flush()
+
+        start = time.time()
+
+        try:
+            for tavg in self.simTVB():
+
+                curr_time_step += 1.0
+
+                if not tavg is None:
+                    time_buffer.append(tavg[0][0])
+                    data_buffer.append(tavg[0][1])
+                    if len(time_buffer) >= buffer_length:
+                        flush()
+
+                if curr_time_step >= curr_block * block_length:
+                    flush()
+                    if n_report_blocks > 1:
+                        self._report_progress(curr_time_step, sim_length, start)
+                    curr_block += 1.0
+            flush()
+        except Exception, error_message:
+            ts_writer.close()
+            self.logger.warning("Something went wrong with this simulation...:" + "\n" + str(error_message))
+            return None, None, False
+
+        ts_writer.close()
+        # Return lazy handles to the written datasets:
+        h5_file = h5py.File(output_path, 'r', libver='latest')
+        return h5_file["time"], h5_file["data"], True
+
     def configure_model(self, **kwargs):
         self.model = model_build_dict[self.model._ui_name](self.model_configuration, **kwargs)
 
@@ -123,3 +190,39 @@ class SimulatorTVB(ABCSimulator):
 
         else:
             self.simTVB.initial_conditions = self.prepare_initial_conditions(self.simTVB.good_history_shape[0])
+
+    def set_model_parameters(self, **params):
+        # Set parameters of the model of the configured TVB simulator in place,
+        # in the (number_of_regions, 1) shape of the spatialized parameters
+        for p_name, p_value in params.iteritems():
+            p_value = numpy.array(p_value)
+            if p_value.size == self.connectivity.number_of_regions:
+                p_value = p_value.reshape((self.connectivity.number_of_regions, 1))
+            setattr(self.model, p_name, p_value)
+
+    def update_model_configuration(self, model_configuration):
+        # Update in place only the model parameters that follow from the model configuration,
+        # instead of building and configuring a new TVB simulator
+        self.model_configuration = model_configuration
+        new_model = model_build_dict[self.model._ui_name](model_configuration)
+        self.set_model_parameters(**dict([(p_name, getattr(new_model, p_name))
+                                          for p_name in model_configuration_params_dict[self.model._ui_name]]))
+
+    def set_noise_intensity(self, noise_intensity):
+        self.simulation_settings.noise_intensity = noise_intensity
+        self.simTVB.integrator.noise.nsig = numpy.array(noise_intensity)
+        # Let TVB reshape nsig for the configured model and connectivity
+        self.simTVB._configure_integrator_noise()
+
+    def get_noise_random_state(self):
+        if hasattr(self.simTVB.integrator, "noise"):
+            return self.simTVB.integrator.noise.random_stream.get_state()
+        return None
+
+    def reset_simulation(self, noise_random_state=None):
+        # Prepare the configured TVB simulator for a new simulation from time 0,
+        # optionally resetting the state of its noise, so that it can be launched again without reconfiguration
+        self.simTVB.current_step = 0
+        self.simTVB._configure_monitors()
+        if noise_random_state is not None:
+            self.simTVB.integrator.noise.random_stream.set_state(noise_random_state)
@@ -10,6 +10,7 @@ from tvb_epilepsy.base.simulation_settings import SimulationSettings
 from tvb_epilepsy.service.epileptor_model_factory import model_build_dict, model_noise_intensity_dict, VOIS, \
                                                             AVAILABLE_DYNAMICAL_MODELS_NAMES, EPILEPTOR_MODEL_NVARS
 from tvb_epilepsy.service.simulator.simulator_java import EpileptorModel, java_model_builder, SimulatorJava
+from tvb_epilepsy.service.simulator.simulator_numpy import SimulatorNumPy
 from tvb_epilepsy.service.simulator.simulator_tvb import SimulatorTVB
 
 
@@ -165,9 +166,33 @@ class SimulatorBuilder(object):
 
         return simulator_instance, sim_settings, model
 
+    def build_simulator_numpy_from_model_sim_settings(self, model_configuration, connectivity, model, sim_settings,
+                                                      **kwargs):
+        model.variables_of_interest = [me.replace('lfp', 'x2 - x1') for me in sim_settings.monitor_expressions]
+        sim_settings.noise_type = WHITE_NOISE
+        sim_settings.noise_intensity = kwargs.get("noise_intensity", sim_settings.noise_intensity)
+        self._check_noise_intesity_size(sim_settings.noise_intensity)
+
+        simulator_instance = SimulatorNumPy(connectivity, model_configuration, model, sim_settings,
+                                            kwargs.get("batch_parameters", {}))
+        simulator_instance.config_simulation(initial_conditions=kwargs.get("initial_conditions", None))
+
+        return simulator_instance, sim_settings, model
+
+    def build_simulator_numpy(self, model_configuration, connectivity, **kwargs):
+
+        model = self.generate_model(model_configuration)
+
+        sim_settings = self.build_sim_settings()
+
+        return self.build_simulator_numpy_from_model_sim_settings(model_configuration, connectivity,
+                                                                  model, sim_settings, **kwargs)
+
     def build_simulator(self, model_configuration, connectivity, **kwargs):
         if isequal_string(self.simulator, "java"):
             return self.build_simulator_java_from_model_configuration(model_configuration, connectivity, **kwargs)
+        elif isequal_string(self.simulator, "numpy"):
+            return self.build_simulator_numpy(model_configuration, connectivity, **kwargs)
         else:
             return self.build_simulator_TVB(model_configuration, connectivity, **kwargs)
 
@@ -95,10 +95,8 @@ def set_parameter(name, use="manual", **kwargs):
     return parameter
 
 
-def generate_stochastic_parameter(name="Parameter", low=-CalculusConfig.MAX_SINGLE_VALUE, 
-                                  high=CalculusConfig.MAX_SINGLE_VALUE, loc=0.0, scale=1.0,
-                                  p_shape=(), probability_distribution=ProbabilityDistributionTypes.UNIFORM,
-                                  optimize_pdf=False, use="scipy", **target_params):
+def stochastic_parameter_class(probability_distribution=ProbabilityDistributionTypes.UNIFORM, optimize_pdf=False,
+                               use="scipy"):
     thisProbabilityDistribution = probability_distribution_factory(probability_distribution.lower(), get_instance=False)
 
     class StochasticParameter(StochasticParameterBase, thisProbabilityDistribution):
@@ -133,4 +131,12 @@ def generate_stochastic_parameter(name="Parameter", low=-CalculusConfig.MAX_SING
         def _numpy(self, size=(1,)):
             return self.numpy(self.loc, self.scale, size)
 
+    return StochasticParameter
+
+
+def generate_stochastic_parameter(name="Parameter", low=-CalculusConfig.MAX_SINGLE_VALUE,
+                                  high=CalculusConfig.MAX_SINGLE_VALUE, loc=0.0, scale=1.0,
+                                  p_shape=(), probability_distribution=ProbabilityDistributionTypes.UNIFORM,
+                                  optimize_pdf=False, use="scipy", **target_params):
+    StochasticParameter = stochastic_parameter_class(probability_distribution, optimize_pdf, use)
     return StochasticParameter(name, low, high, loc, scale, p_shape, **target_params)
@@ -0,0 +1,51 @@
+import numpy
+from scipy.signal import sosfilt, spectrogram
+from tvb_epilepsy.base.computations.analyzers_utils import BlockFilter, BlockDecimator, running_sum, \
+    spectral_analysis, time_spectral_analysis
+from tvb_epilepsy.top.scripts.seeg_data_scripts import bipolar_montage
+from tvb_epilepsy.tests.base import BaseTest
+
+
+class TestAnalyzersUtils(BaseTest):
+
+    def test_block_filter(self):
+        x = numpy.random.normal(size=(1000, 3))
+        block_filter = BlockFilter(128.0, 10.0, 60.0, "bandpass", order=3)
+        y = numpy.concatenate([block_filter(x[start:start + 130]) for start in range(0, 1000, 130)])
+        assert numpy.allclose(y, sosfilt(block_filter.sos, x, axis=0))
+
+    def test_block_decimator(self):
+        x = numpy.random.normal(size=(1000, 2))
+        decimator = BlockDecimator(512.0, 4)
+        y = numpy.concatenate([decimator(x[start:start + 99]) for start in range(0, 1000, 99)])
+        assert numpy.allclose(y, sosfilt(decimator.filter.sos, x, axis=0)[::4])
+
+    def test_running_sum(self):
+        x = numpy.random.normal(size=(200, 3))
+        for n in [1, 4, 5, 150]:
+            expected = numpy.stack([numpy.convolve(x[:, i], numpy.ones((n,)), mode='same') for i in range(3)],
+                                   axis=1)
+            assert numpy.allclose(running_sum(x, n), expected)
+
+    def test_bipolar_montage(self):
+        labels, montage = bipolar_montage(["A1", "A2", "A3", "B'1", "B'2", "C3", "C5"])
+        assert labels == ["A1-A2", "A2-A3", "B'1-B'2"]
+        data = numpy.random.normal(size=(10, 7))
+        bipolar = montage.T.dot(data.T).T
+        assert numpy.allclose(bipolar, data[:, [0, 1, 3]] - data[:, [1, 2, 4]])
+
+    def test_time_spectral_analysis(self):
+        x = numpy.random.normal(size=(3000, 4))
+        freq = numpy.arange(1.0, 51.0)
+        stf, t, freq, psd = time_spectral_analysis(x, 256.0, freq=freq, nperseg=64)
+        assert stf.shape == (t.size, freq.size, 4)
+        assert psd.shape == (freq.size, 4)
+        f, t1, s1 = spectrogram(x[:, 1], fs=256.0, nperseg=64, window='hanning', scaling='spectrum')
+        assert numpy.allclose(t, t1)
+        # The spectrogram resolution is 4 Hz
+        assert numpy.allclose(stf[:, 3, 1], s1[1])
+        assert numpy.allclose(psd[:, 2], spectral_analysis(x[:, 2:3], 256.0, freq=freq)[0][:, 0])
+        # Chunks give the same result as the whole time series
+        stf_chunks, t_chunks, _, _ = time_spectral_analysis(x, 256.0, freq=freq, nperseg=64, chunk_len=500)
+        assert numpy.allclose(t_chunks, t)
+        assert numpy.allclose(stf_chunks, stf)
@@ -0,0 +1,76 @@
+import os
+import sys
+from tvb_epilepsy.service.model_inversion.stan.stan_factory import generate_cmdstan_options, \
+    generate_cmdstan_chain_commands
+from tvb_epilepsy.service.model_inversion.stan.cmdstan_chains import CmdStanChain, CmdStanChainScheduler
+from tvb_epilepsy.service.model_inversion.stan.stan_service import StanService
+from tvb_epilepsy.tests.base import BaseTest
+
+# Writes a Stan like output csv file of n_draws draws, sleeping sleep seconds before each draw
+FAKE_CMDSTAN = """
+import sys
+import time
+output_file, n_draws, sleep = sys.argv[1], int(sys.argv[2]), float(sys.argv[3])
+with open(output_file, "w") as f:
+    f.write("# model = fake\\nlp__,x\\n")
+    for i_draw in range(n_draws):
+        time.sleep(sleep)
+        f.write("%d,%d\\n" % (i_draw, i_draw))
+        f.flush()
+"""
+
+
+class _StanService(StanService):
+
+    def compile_stan_model(self, save_model=True, **kwargs):
+        pass
+
+    def set_model_from_file(self, **kwargs):
+        pass
+
+    def fit(self, model_data, **kwargs):
+        pass
+
+
+class TestCmdStanChains(BaseTest):
+
+    def _chain(self, chain_id, n_draws, sleep):
+        script = os.path.join(self.config.out.FOLDER_TEMP, "fake_cmdstan.py")
+        with open(script, "w") as f:
+            f.write(FAKE_CMDSTAN)
+        output_filepath = os.path.join(self.config.out.FOLDER_TEMP, "output%d.csv" % chain_id)
+        command = " ".join([sys.executable, script, output_filepath, str(n_draws), str(sleep)])
+        return CmdStanChain(chain_id, command, output_filepath, n_draws=n_draws)
+
+    def test_generate_cmdstan_chain_commands(self):
+        options = generate_cmdstan_options("sample", chains=3, random_seed=10)
+        chains = generate_cmdstan_chain_commands("sample", options, "model", "data.R", "/out/output.csv", "")
+        assert [output for _, output, _ in chains] == ["/out/output1.csv", "/out/output2.csv", "/out/output3.csv"]
+        assert [diagnostic for _, _, diagnostic in chains] == \
+               ["/out/diagnostic1.csv", "/out/diagnostic2.csv", "/out/diagnostic3.csv"]
+        for i_chain, (command, _, _) in enumerate(chains):
+            assert "random seed=%d" % (10 + i_chain) in command
+            assert "id=%d" % (i_chain + 1) in command
+
+    def test_run_chains(self):
+        chains = [self._chain(chain_id, 5, 0.05) for chain_id in range(1, 4)]
+        finished = CmdStanChainScheduler(chains, n_parallel=2, poll_period=0.05).run()
+        assert finished == chains
+        for chain in chains:
+            assert chain.status == CmdStanChain.DONE
+            assert chain.draws == 5
+            assert os.path.isfile(chain.log_filepath)
+        # The chains' log files are not read as chains' outputs
+        samples = _StanService(config=self.config).read_output_samples(
+            os.path.join(self.config.out.FOLDER_TEMP, "output.csv"))
+        assert len(samples) == 3
+        for chain_samples in samples:
+            assert sorted(chain_samples.keys()) == ["lp__", "x"]
+            assert chain_samples["x"].shape[0] == 5
+
+    def test_stalled_chain(self):
+        chains = [self._chain(1, 3, 0.05), self._chain(2, 2, 30.0)]
+        finished = CmdStanChainScheduler(chains, stall_timeout=1.0, poll_period=0.05).run()
+        assert finished == chains[:1]
+        assert chains[1].status == CmdStanChain.TIMED_OUT
+        assert chains[1].draws == 0
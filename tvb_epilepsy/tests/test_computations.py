@@ -1,13 +1,16 @@
+import os
 import numpy
 from sympy import Matrix
+from scipy.sparse import csr_matrix
 from tvb_epilepsy.base.computations.calculations_utils import calc_x0cr_r, calc_x0, calc_model_x0_to_x0_val, calc_dfun, \
     calc_jac, calc_coupling, calc_coupling_diff, calc_fx1z, calc_fx1z_diff, calc_fx1_2d_taylor, calc_fx1y1_6d_diff_x1, \
-    calc_fz_jac_square_taylor
+    calc_fz_jac_square_taylor, prepare_model_parameters, calc_dfun_prepared, calc_jac_prepared
 from tvb_epilepsy.base.computations.equilibrium_computation import calc_eq_z, calc_eq_11d, calc_eq_6d, \
     eq_x1_hypo_x0_optimize, eq_x1_hypo_x0_optimize_fun, eq_x1_hypo_x0_optimize_jac, eq_x1_hypo_x0_linTaylor
 from tvb_epilepsy.base.computations.symbolic_utils import symbol_vars, symbol_eqtn_x0cr_r, symbol_eqtn_coupling, \
     symbol_calc_coupling_diff, symbol_eqtn_fx1z, symbol_eqtn_fx1z_diff, symbol_eqtn_fx2y2, symbol_calc_2d_taylor, \
-    symbol_calc_fx1y1_6d_diff_x1, symbol_calc_fz_jac_square_taylor
+    symbol_calc_fx1y1_6d_diff_x1, symbol_calc_fz_jac_square_taylor, symbol_kernel, SYMBOL_KERNELS
+from tvb_epilepsy.base.constants.config import CalculusConfig
 from tvb_epilepsy.base.constants.model_constants import K_DEF, YC_DEF, I_EXT1_DEF, SLOPE_DEF, I_EXT2_DEF, A_DEF, B_DEF, \
     D_DEF, S_DEF, GAMMA_DEF, TAU1_DEF, TAU2_DEF, TAU0_DEF, X1_DEF, X1_EQ_CR_DEF, X0_DEF, X0_CR_DEF
 from tvb_epilepsy.base.utils.data_structures_utils import assert_arrays
@@ -163,6 +166,10 @@ class TestComputations(BaseTest):
         coupling_diff = calc_coupling_diff(sK, sw)
         scoupling_diff = symbol_calc_coupling_diff(n, ix=None, jx=None, K="K")[:2]
         assert coupling_diff.shape == scoupling_diff[1].shape
+        assert numpy.allclose(calc_coupling_diff(K, w), scoupling_diff[0](K, w))
+        # Sparse connectivity gives the same numerical coupling and derivative
+        assert numpy.allclose(calc_coupling(x1, K, csr_matrix(w)), calc_coupling(x1, K, w))
+        assert numpy.allclose(calc_coupling_diff(K, csr_matrix(w)), calc_coupling_diff(K, w))
 
         # ------------------------------------- Test the fz with substitution of z via fx1 ----------------------------------
         fx1z = calc_fx1z(sx1, sx0, sK, sw, syc, sIext1, sa, sb, sd, stau1, stau0, zmode=zmode)
@@ -231,3 +238,80 @@ class TestComputations(BaseTest):
 
         assert list(calc_fz_jac_square_taylor(z, yc, Iext1, K, w, tau1=tau1, tau0=tau0)[0]) == list(
             lfz_jac_square_taylor(zeq, yc, Iext1, K, w, a, b, d, tau1, tau0, x1sq)[0])
+
+    def test_symbol_kernel_cache(self):
+        cache_folder = CalculusConfig.SYMBOLIC_KERNELS_CACHE_FOLDER
+        CalculusConfig.SYMBOLIC_KERNELS_CACHE_FOLDER = self.config.out.FOLDER_TEMP
+        SYMBOL_KERNELS.clear()
+        try:
+            n = 3
+            zeq = numpy.array([2.95, 3.0, 3.1])
+            w = numpy.array([[0, 0.1, 0.9], [0.1, 0, 0.0], [0.9, 0.0, 0]])
+            args = [zeq, w] + [value * numpy.ones((n,)) for value in
+                               [YC_DEF, I_EXT1_DEF, K_DEF / n, A_DEF, B_DEF, D_DEF, TAU1_DEF, TAU0_DEF, X1_DEF]]
+            args = args[0:1] + args[2:5] + args[1:2] + args[5:]
+            kernel = symbol_kernel(symbol_calc_fz_jac_square_taylor, n)
+            # The same key returns the same compiled function...
+            assert symbol_kernel(symbol_calc_fz_jac_square_taylor, n) is kernel
+            assert numpy.allclose(kernel(*args), symbol_calc_fz_jac_square_taylor(n)[0](*args))
+            # ...and, once out of memory, it is reconstructed from the disk cache
+            assert len(os.listdir(self.config.out.FOLDER_TEMP)) == 1
+            SYMBOL_KERNELS.clear()
+            cached_kernel = symbol_kernel(symbol_calc_fz_jac_square_taylor, n)
+            assert cached_kernel is not kernel
+            assert numpy.allclose(cached_kernel(*args), kernel(*args))
+        finally:
+            CalculusConfig.SYMBOLIC_KERNELS_CACHE_FOLDER = cache_folder
+            SYMBOL_KERNELS.clear()
+
+    def test_prepared_dfun_jac(self):
+        n = 3
+        random_state = numpy.random.RandomState(0)
+        w = numpy.array([[0, 0.1, 0.9], [0.1, 0, 0.0], [0.9, 0.0, 0]])
+        yc = YC_DEF * numpy.ones((n,))
+        Iext1 = I_EXT1_DEF * numpy.ones((n,))
+        x0 = -2.5 + random_state.rand(n)
+        K = -K_DEF / n * numpy.ones((n,))
+        x1 = -1.5 + 0.2 * random_state.rand(n)
+        z = 3.0 + random_state.rand(n)
+        y1, x2, y2, g = random_state.randn(n), -0.1 + random_state.rand(n), random_state.rand(n), random_state.randn(n)
+        x0_var, slope_var = x0 + 0.1 * random_state.randn(n), SLOPE_DEF + 0.1 * random_state.randn(n)
+        Iext1_var, Iext2_var = Iext1 + 0.1 * random_state.randn(n), I_EXT2_DEF + 0.1 * random_state.randn(n)
+        K_var = K + 0.1 * random_state.randn(n)
+        states = {2: [x1, z], 6: [x1, y1, z, x2, y2, g],
+                  11: [x1, y1, z, x2, y2, g, x0_var, slope_var, Iext1_var, Iext2_var, K_var]}
+        states_kwargs = {2: {}, 6: {"y1": y1, "x2": x2, "y2": y2, "g": g},
+                         11: {"y1": y1, "x2": x2, "y2": y2, "g": g, "x0_var": x0_var, "slope_var": slope_var,
+                              "Iext1_var": Iext1_var, "Iext2_var": Iext2_var, "K_var": K_var}}
+        eps = 10 ** -6
+        for model_vars, pmode, x1_neg, z_pos in [(2, "const", True, True), (2, "const", False, False),
+                                                 (6, "const", True, True), (6, "const", False, False),
+                                                 (11, "const", True, True), (11, "g", False, True),
+                                                 (11, "z", True, False), (11, "z*g", False, False)]:
+            state = numpy.array(states[model_vars])
+            params = prepare_model_parameters(n, yc, Iext1, x0, K, w, model_vars, pmode=pmode)
+            dfun = numpy.empty((model_vars, n))
+            jac = numpy.empty((model_vars * n, model_vars * n))
+            # The results are written into the given buffers...
+            assert calc_dfun_prepared(params, state, dfun, x1_neg, z_pos, x2_neg=False) is dfun
+            assert calc_jac_prepared(params, state, jac, x1_neg, z_pos, x2_neg=False) is jac
+            # ...and agree with the ones of the non prepared functions
+            expected_dfun = calc_dfun(x1, z, yc, Iext1, x0, K, w, model_vars, pmode=pmode, x1_neg=x1_neg,
+                                      z_pos=z_pos, x2_neg=False, **states_kwargs[model_vars])
+            assert numpy.allclose(dfun, numpy.array(expected_dfun, dtype="float64"))
+            # The symbolic calc_jac() of the 11D model is slow, so it is compared for one pmode only,
+            # whereas eqtn_jac_x1_2d() does not differentiate the x1 >= 0 branch of the 2D model
+            if model_vars == 6 or (model_vars == 2 and x1_neg) or pmode == "z":
+                assert numpy.allclose(jac, numpy.array(calc_jac(x1, z, yc, Iext1, x0, K, w, model_vars, pmode=pmode,
+                                                                x1_neg=x1_neg, z_pos=z_pos, x2_neg=False,
+                                                                **states_kwargs[model_vars]), dtype="float64"))
+            # The jacobian matches the central differences of the dfun
+            jac_diff = numpy.empty(jac.shape)
+            for ix in range(model_vars * n):
+                dstate = numpy.zeros((model_vars * n,))
+                dstate[ix] = eps
+                dstate = dstate.reshape(state.shape)
+                jac_diff[:, ix] = (calc_dfun_prepared(params, state + dstate, None, x1_neg, z_pos, False) -
+                                   calc_dfun_prepared(params, state - dstate, None, x1_neg, z_pos, False)).flatten() \
+                                  / (2 * eps)
+            assert numpy.allclose(jac, jac_diff, atol=10 ** -5)
@@ -0,0 +1,54 @@
+import os
+import numpy
+from tvb_epilepsy.io.csv import parse_csv
+from tvb_epilepsy.tests.base import BaseTest
+
+
+class TestCSV(BaseTest):
+
+    def _write_stan_csv(self, filename, samples):
+        # samples: lp__ (draws,), x1 (draws, 3, 2), sig (draws,)
+        path = os.path.join(self.config.out.FOLDER_TEMP, filename)
+        names = ["lp__"] + ["x1.%d.%d" % (i + 1, j + 1) for j in range(3) for i in range(2)] + ["sig"]
+        with open(path, "w") as f:
+            f.write("# model = vep\n# method = sample (Default)\n")
+            f.write(",".join(names) + "\n")
+            f.write("# Adaptation terminated\n# Step size = 0.1\n# Diagonal elements of inverse mass matrix:\n# 1, 1\n")
+            for i_draw in range(samples["lp__"].shape[0]):
+                # Stan writes matrices in column major order
+                values = [samples["lp__"][i_draw]] + samples["x1"][i_draw].flatten().tolist() + \
+                         [samples["sig"][i_draw]]
+                f.write(",".join(["%.17g" % value for value in values]) + "\n")
+            f.write("\n# Elapsed Time: 0.1 seconds (Warm-up)\n")
+        return path
+
+    def _random_samples(self, n_draws):
+        return {"lp__": numpy.random.normal(size=(n_draws,)), "x1": numpy.random.normal(size=(n_draws, 3, 2)),
+                "sig": numpy.random.normal(size=(n_draws,))}
+
+    def test_parse_csv(self):
+        samples = self._random_samples(25)
+        path = self._write_stan_csv("TestStanOutput.csv", samples)
+
+        data = parse_csv(path, block_lines=7)
+
+        assert sorted(data.keys()) == ["lp__", "sig", "x1"]
+        for key in samples.keys():
+            assert numpy.array_equal(data[key], samples[key])
+
+        data = parse_csv(path, parameters=["x1"], cache=True)
+
+        assert data.keys() == ["x1"]
+        assert numpy.array_equal(data["x1"], samples["x1"])
+        # The second time the output is read from the cache file
+        assert numpy.array_equal(parse_csv(path, parameters=["x1"], cache=True)["x1"], samples["x1"])
+
+    def test_parse_csv_chains(self):
+        samples = [self._random_samples(10), self._random_samples(5)]
+        for i_chain, chain_samples in enumerate(samples):
+            self._write_stan_csv("TestStanChains%d.csv" % (i_chain + 1), chain_samples)
+
+        data = parse_csv(os.path.join(self.config.out.FOLDER_TEMP, "TestStanChains*"), parameters="sig",
+                         cache=True)
+
+        assert numpy.array_equal(data["sig"], numpy.concatenate([samples[0]["sig"], samples[1]["sig"]]))
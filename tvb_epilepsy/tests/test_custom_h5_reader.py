@@ -1,11 +1,16 @@
 import os
+import shutil
+import cPickle as pickle
 import numpy
 from tvb_epilepsy.base.constants.config import InputConfig
+from tvb_epilepsy.base.model.disease_hypothesis import DiseaseHypothesis
 from tvb_epilepsy.base.model.model_configuration import ModelConfiguration
+from tvb_epilepsy.base.model.statistical_models.sde_statistical_model import SDEStatisticalModel
 from tvb_epilepsy.base.model.vep.sensors import Sensors
 from tvb_epilepsy.base.simulation_settings import SimulationSettings
 from tvb_epilepsy.io.h5_reader import H5Reader
 from tvb_epilepsy.io.h5_writer import H5Writer
+from tvb_epilepsy.io.head_cache import read_cached_head, memmap_reference
 from tvb_epilepsy.service.hypothesis_builder import HypothesisBuilder
 from tvb_epilepsy.service.lsa_service import LSAService
 from tvb_epilepsy.service.model_configuration_builder import ModelConfigurationBuilder
@@ -171,3 +176,93 @@ class TestCustomH5Reader(BaseTest):
         assert dummy_sim_settings.monitor_sampling_period == sim_settings.monitor_sampling_period
         assert dummy_sim_settings.monitor_expressions == sim_settings.monitor_expressions
         assert numpy.array_equal(dummy_sim_settings.initial_conditions, sim_settings.initial_conditions)
+
+    def test_read_timeseries(self):
+        test_file = os.path.join(self.config.out.FOLDER_TEMP, "TestTimeSeries.h5")
+        data = numpy.random.normal(size=(100, 5))
+        self.writer.write_ts(data, 0.5, test_file)
+
+        time, full_data = self.reader.read_timeseries(test_file)
+
+        assert numpy.allclose(time, 0.5 * numpy.arange(100))
+        assert numpy.allclose(full_data, data)
+
+        time, selected_data = self.reader.read_timeseries(test_file, channels=[3, 0], start_time=10.0, end_time=20.0,
+                                                          stride=2)
+
+        assert numpy.allclose(time, numpy.arange(10.0, 20.0, 1.0))
+        assert numpy.allclose(selected_data, data[20:40:2][:, [3, 0]])
+
+        dataset = self.reader.open_timeseries(test_file)
+
+        assert dataset.shape == data.shape
+        assert numpy.allclose(dataset[10:20, 1], data[10:20, 1])
+        dataset.file.close()
+
+    def test_read_generic(self):
+        test_file = "TestGeneric.h5"
+        hypothesis = HypothesisBuilder(3).set_e_hypothesis([0], [0.9]).build_hypothesis()
+        statistical_model = SDEStatisticalModel("vep_sde", 3, [0, 1], 2, 10, 0.1)
+        dummy_dict = {"hypothesis": hypothesis, "statistical_model": statistical_model,
+                      "list": ["a", 1, None, {"b": numpy.nan}], "array": numpy.array([[1.0, 2.0]]), 2: ()}
+        self.writer.write_generic(dummy_dict, self.config.out.FOLDER_TEMP, test_file)
+
+        read_dict = self.reader.read_generic(os.path.join(self.config.out.FOLDER_TEMP, test_file))
+
+        assert isinstance(read_dict["hypothesis"], DiseaseHypothesis)
+        assert numpy.array_equal(read_dict["hypothesis"].e_values, hypothesis.e_values)
+        read_model = read_dict["statistical_model"]
+        assert isinstance(read_model, SDEStatisticalModel)
+        assert read_model.active_regions == [0, 1]
+        assert read_model.parameters["K"].type == statistical_model.parameters["K"].type
+        assert read_model.parameters["K"].mean == statistical_model.parameters["K"].mean
+        assert read_dict["list"][:3] == ["a", 1, None]
+        assert numpy.isnan(read_dict["list"][3]["b"])
+        assert numpy.array_equal(read_dict["array"], dummy_dict["array"])
+        assert read_dict[2] == ()
+
+    def test_read_cached_head(self):
+        cache_folder = os.path.join(self.config.out.FOLDER_TEMP, "head_cache")
+        head = self.reader.read_head(self.in_head)
+
+        cached_head = read_cached_head(self.reader, self.in_head, cache_folder)
+        assert len(os.listdir(cache_folder)) == 1
+        # The second time the head is read only from the cache, without reading the head folder
+        failing_reader = H5Reader()
+
+        def read_head(path, use_cache=False, cache_folder=None):
+            raise AssertionError("The head should have been read from the cache!")
+
+        failing_reader.read_head = read_head
+        cached_head = read_cached_head(failing_reader, self.in_head, cache_folder)
+        assert len(os.listdir(cache_folder)) == 1
+
+        assert isinstance(cached_head.connectivity.normalized_weights, numpy.memmap)
+        assert numpy.array_equal(cached_head.connectivity.normalized_weights, head.connectivity.normalized_weights)
+        assert numpy.array_equal(cached_head.connectivity.region_labels, head.connectivity.region_labels)
+        assert numpy.array_equal(cached_head.sensorsSEEG[0].gain_matrix, head.sensorsSEEG[0].gain_matrix)
+        assert cached_head.number_of_regions == head.number_of_regions
+
+        # Other processes can map the cached arrays from a pickled reference
+        reference = pickle.loads(pickle.dumps(memmap_reference(cached_head.connectivity.normalized_weights)))
+        assert numpy.array_equal(reference.load(), head.connectivity.normalized_weights)
+        assert memmap_reference(head.connectivity.normalized_weights) is None
+        assert memmap_reference(cached_head.connectivity.normalized_weights[1:]) is None
+
+        # H5Reader reads the head via the cache of a given folder, or of InputConfig.HEAD_CACHE_FOLDER, if asked to
+        cached_head = self.reader.read_head(self.in_head, use_cache=True, cache_folder=cache_folder)
+        assert len(os.listdir(cache_folder)) == 1
+        assert isinstance(cached_head.connectivity.normalized_weights, numpy.memmap)
+        head_cache_folder = InputConfig.HEAD_CACHE_FOLDER
+        InputConfig.HEAD_CACHE_FOLDER = cache_folder
+        try:
+            cached_head = self.reader.read_head(self.in_head, use_cache=True)
+        finally:
+            InputConfig.HEAD_CACHE_FOLDER = head_cache_folder
+        assert len(os.listdir(cache_folder)) == 1
+        assert isinstance(cached_head.connectivity.normalized_weights, numpy.memmap)
+        # No head is cached by default
+        assert InputConfig.HEAD_CACHE_FOLDER is None
+        cached_head = self.reader.read_head(self.in_head, use_cache=True)
+        assert not (isinstance(cached_head.connectivity.normalized_weights, numpy.memmap))
+        shutil.rmtree(cache_folder)
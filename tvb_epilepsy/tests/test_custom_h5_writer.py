@@ -1,9 +1,10 @@
 import os
 import numpy
+import h5py
 from tvb_epilepsy.base.constants.model_constants import X1_EQ_CR_DEF
 from tvb_epilepsy.base.model.model_configuration import ModelConfiguration
 from tvb_epilepsy.base.simulation_settings import SimulationSettings
-from tvb_epilepsy.io.h5_writer import H5Writer
+from tvb_epilepsy.io.h5_writer import H5Writer, KEY_MAX, KEY_MIN, KEY_STEPS, KEY_CHANNELS, KEY_SV
 from tvb_epilepsy.service.hypothesis_builder import HypothesisBuilder
 from tvb_epilepsy.service.lsa_service import LSAService
 from tvb_epilepsy.service.model_configuration_builder import ModelConfigurationBuilder
@@ -164,6 +165,41 @@ class TestCustomH5writer(BaseTest):
 
         assert os.path.exists(test_file)
 
+    def test_write_ts(self):
+        test_file = os.path.join(self.config.out.FOLDER_TEMP, "TestTimeSeries.h5")
+        data = numpy.random.normal(size=(100, 3))
+
+        assert not os.path.exists(test_file)
+
+        self.writer.write_ts({"data": data}, 0.1, test_file)
+
+        assert os.path.exists(test_file)
+        h5_file = h5py.File(test_file, 'r')
+        assert numpy.allclose(h5_file["/data"][()], data)
+        assert h5_file["/data"].attrs[KEY_MAX] == data.max()
+        assert h5_file["/data"].attrs[KEY_STEPS] == 100
+        h5_file.close()
+
+    def test_open_ts(self):
+        test_file = os.path.join(self.config.out.FOLDER_TEMP, "TestTimeSeriesBlocks.h5")
+        data = numpy.random.normal(size=(100, 4, 2))
+
+        with self.writer.open_ts(test_file, 0.1, chunk_length=16) as ts_writer:
+            for i_block in range(0, 100, 30):
+                ts_writer.append("/data", data[i_block:i_block + 30])
+
+        h5_file = h5py.File(test_file, 'r')
+        dataset = h5_file["/data"]
+        assert dataset.chunks == (16, 4, 2)
+        assert dataset.compression == "gzip"
+        assert numpy.allclose(dataset[()], data)
+        assert dataset.attrs[KEY_MAX] == data.max()
+        assert dataset.attrs[KEY_MIN] == data.min()
+        assert dataset.attrs[KEY_STEPS] == 100
+        assert dataset.attrs[KEY_CHANNELS] == 4
+        assert dataset.attrs[KEY_SV] == 2
+        h5_file.close()
+
     @classmethod
     def teardown_class(cls):
         head_dir = os.path.join(cls.config.out.FOLDER_TEMP, "test_head")
@@ -0,0 +1,70 @@
+import numpy
+import pytest
+from tvb_epilepsy.base.constants.config import CalculusConfig
+from tvb_epilepsy.base.epileptor_models import EpileptorDP, EpileptorDPrealistic, EpileptorDP2D
+from tvb_epilepsy.base.computations.epileptor_kernels import NUMBA_IMPORT, compiled_dfun, dfun_buffer, \
+    benchmark_dfun
+from tvb_epilepsy.tests.base import BaseTest
+
+
+class TestEpileptorKernels(BaseTest):
+    n_regions = 10
+
+    def _build_model(self, model_class, zmode, pmode=None):
+        model = model_class()
+        model.zmode = numpy.array(zmode)
+        if pmode is not None:
+            model.pmode = numpy.array(pmode)
+        model.x0 = numpy.linspace(-3.0, -1.0, self.n_regions).reshape((self.n_regions, 1))
+        model.K = -numpy.ones((self.n_regions, 1))
+        return model
+
+    def test_compiled_dfun(self):
+        for model_class in [EpileptorDP2D, EpileptorDP, EpileptorDPrealistic]:
+            for zmode in ["lin", "sig"]:
+                for pmode in (["const", "g", "z", "z*g"] if model_class is EpileptorDPrealistic else [None]):
+                    model = self._build_model(model_class, zmode, pmode)
+                    results = benchmark_dfun(model, n_regions=self.n_regions, n_modes=3, n_evaluations=1)
+                    assert numpy.allclose(results["numpy"]["max_abs_diff"], 0.0)
+
+    def test_compiled_dfun_fallback(self):
+        model = self._build_model(EpileptorDP2D, "lin")
+        state = numpy.zeros((2, self.n_regions, 1))
+        coupling = numpy.zeros((2, self.n_regions, 1))
+        assert compiled_dfun(model, state, coupling, backend="numpy") is None
+        # Parameters that do not fit to the state are left to the NumPy dfun
+        assert compiled_dfun(model, state[:, :5], coupling[:, :5]) is None
+        assert compiled_dfun(model, state, coupling, local_coupling=numpy.ones((self.n_regions,))) is None
+        if NUMBA_IMPORT and CalculusConfig.DFUN_BACKEND == "numba":
+            # In place changes of the parameters are followed by the kernels
+            ydot = compiled_dfun(model, state, coupling)
+            model.x0[0] += 1.0
+            assert numpy.allclose(compiled_dfun(model, state, coupling)[1, 0] - ydot[1, 0],
+                                  -4.0 * model.tau1 / model.tau0)
+
+    def test_dfun_buffer(self):
+        model = self._build_model(EpileptorDP2D, "lin")
+        random_state = numpy.random.RandomState(0)
+        state = random_state.randn(2, self.n_regions, 1)
+        coupling = random_state.randn(2, self.n_regions, 1)
+        if NUMBA_IMPORT and CalculusConfig.DFUN_BACKEND == "numba":
+            out = numpy.empty(state.shape)
+            assert compiled_dfun(model, state, coupling, out=out) is out
+            assert numpy.allclose(out, compiled_dfun(model, state, coupling))
+            assert numpy.allclose(compiled_dfun(model, state[:, :, 0], coupling[:, :, 0], out=out[:, :, 0]),
+                                  out[:, :, 0])
+            with pytest.raises(ValueError):
+                compiled_dfun(model, state, coupling, out=numpy.empty((2, 3, 1)))
+        # The buffer is reused once the previous result is released...
+        buffer = dfun_buffer(model, state)
+        buffer_id = id(buffer)
+        del buffer
+        for _ in range(3):
+            state += 0.01 * model.dfun(state, coupling)
+            assert id(dfun_buffer(model, state)) == buffer_id
+        # ...but not while it is still referenced, e.g., by the first stage of a Heun step
+        ydot0 = model.dfun(state, coupling)
+        ydot0_copy = ydot0.copy()
+        ydot1 = model.dfun(state + 1.0, coupling)
+        assert ydot1 is not ydot0
+        assert numpy.array_equal(ydot0, ydot0_copy)
@@ -0,0 +1,60 @@
+import numpy
+from tvb_epilepsy.base.computations.equilibrium_computation import calc_eq_z, calc_eq_x1, eq_x1_hypo_x0_optimize, \
+    EquilibriumSolver
+from tvb_epilepsy.base.constants.model_constants import K_DEF, YC_DEF, I_EXT1_DEF
+from tvb_epilepsy.tests.base import BaseTest
+
+
+class TestEquilibriumSolver(BaseTest):
+    n_regions = 6
+    ix0 = [0, 1, 2, 3]
+    iE = [4, 5]
+
+    def _prepare_inputs(self):
+        random_state = numpy.random.RandomState(0)
+        w = random_state.rand(self.n_regions, self.n_regions)
+        numpy.fill_diagonal(w, 0.0)
+        w /= numpy.sum(w)
+        K = K_DEF / self.n_regions * numpy.ones((self.n_regions,))
+        yc = YC_DEF * numpy.ones((self.n_regions,))
+        Iext1 = I_EXT1_DEF * numpy.ones((self.n_regions,))
+        x1EQ = -4.0 / 3 * numpy.ones((self.n_regions,))
+        x1EQ[self.iE] = [-1.4, -1.5]
+        zEQ = calc_eq_z(x1EQ, yc, Iext1, "2d")
+        return w, K, yc, Iext1, x1EQ, zEQ
+
+    def test_eq_x1_hypo_x0_optimize(self):
+        w, K, yc, Iext1, x1EQ, zEQ = self._prepare_inputs()
+        x0 = numpy.array([0.3, 0.5, 0.7, 0.9])
+        solver = EquilibriumSolver()
+        for x0_scale in [1.0, 1.05, 1.1]:
+            x1EQ_sol, x0_sol = eq_x1_hypo_x0_optimize(self.ix0, self.iE, numpy.array(x1EQ), numpy.array(zEQ),
+                                                      x0_scale * x0, K, w, yc, Iext1)
+            x1EQ_warm, x0_warm = solver.eq_x1_hypo_x0_optimize(self.ix0, self.iE, numpy.array(x1EQ),
+                                                               numpy.array(zEQ), x0_scale * x0, K, w, yc, Iext1)
+            assert numpy.allclose(x1EQ_sol, x1EQ_warm, atol=1e-6)
+            assert numpy.allclose(x0_sol, x0_warm, atol=1e-6)
+        # Warm started solves need fewer function evaluations than the first one
+        assert len(solver.n_function_evaluations) == 3
+        assert numpy.all(numpy.array(solver.n_function_evaluations[1:]) < solver.n_function_evaluations[0])
+
+    def test_continuation(self):
+        w, K, yc, Iext1, x1EQ, zEQ = self._prepare_inputs()
+        x0 = numpy.array([0.3, 0.5, 0.7, 0.9])
+        solver = EquilibriumSolver(continuation_steps=3)
+        solver.eq_x1_hypo_x0_optimize(self.ix0, self.iE, numpy.array(x1EQ), numpy.array(zEQ), x0, K, w, yc, Iext1)
+        x1EQ_cont, x0_cont = solver.eq_x1_hypo_x0_optimize(self.ix0, self.iE, numpy.array(x1EQ), numpy.array(zEQ),
+                                                           1.2 * x0, K, w, yc, Iext1)
+        x1EQ_sol, x0_sol = eq_x1_hypo_x0_optimize(self.ix0, self.iE, numpy.array(x1EQ), numpy.array(zEQ),
+                                                  1.2 * x0, K, w, yc, Iext1)
+        assert numpy.allclose(x1EQ_sol, x1EQ_cont, atol=1e-6)
+        assert numpy.allclose(x0_sol, x0_cont, atol=1e-6)
+
+    def test_calc_eq_x1(self):
+        w, K, yc, Iext1 = self._prepare_inputs()[:4]
+        x0 = numpy.array([-2.3, -2.2, -2.5, -2.1, -2.4, -2.45])
+        solver = EquilibriumSolver()
+        for x0_scale in [1.0, 1.01]:
+            assert numpy.allclose(calc_eq_x1(yc, Iext1, x0_scale * x0, K, w),
+                                  solver.calc_eq_x1(yc, Iext1, x0_scale * x0, K, w), atol=1e-6)
+        assert solver.n_function_evaluations[1] < solver.n_function_evaluations[0]
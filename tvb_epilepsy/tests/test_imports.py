@@ -0,0 +1,38 @@
+import os
+import sys
+import subprocess
+import tempfile
+import shutil
+from tvb_epilepsy.tests.base import BaseTest
+
+IMPORT_SCRIPT = """
+import sys
+import time
+start = time.time()
+import tvb_epilepsy.service.lsa_service
+import tvb_epilepsy.service.pse.lsa_pse_service
+import tvb_epilepsy.service.hypothesis_builder
+import tvb_epilepsy.service.head_service
+import tvb_epilepsy.service.sensitivity_analysis_service
+print("import time: " + str(time.time() - start))
+heavy_modules = ["sympy", "tvb.simulator", "matplotlib", "sklearn", "SALib", "h5py"]
+print("heavy modules: " + ",".join([module for module in heavy_modules if module in sys.modules]))
+"""
+
+
+class TestImports(BaseTest):
+
+    def test_lazy_imports(self):
+        # Import in a fresh interpreter, from an empty working directory
+        working_folder = tempfile.mkdtemp()
+        try:
+            env = dict(os.environ)
+            env["PYTHONPATH"] = os.pathsep.join([p for p in [os.getcwd(), env.get("PYTHONPATH")] if p])
+            output = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT], cwd=working_folder, env=env)
+            import_time, heavy_modules = [line.split(":")[1].strip() for line in output.strip().split("\n")[-2:]]
+            assert heavy_modules == ""
+            assert float(import_time) < 2.0
+            # No logging or output folders are created at import time
+            assert os.listdir(working_folder) == []
+        finally:
+            shutil.rmtree(working_folder)
@@ -0,0 +1,75 @@
+import os
+import time
+import shutil
+import logging
+from multiprocessing import Pool
+from tvb_epilepsy.base.utils.log_error_utils import initialize_logger, set_loggers_level, QueueHandler
+from tvb_epilepsy.tests.base import BaseTest
+
+
+def _log_from_worker(args):
+    target_folder, i_task = args
+    logger = initialize_logger("test_worker_logger", target_folder)
+    for handler in logger.handlers:
+        if isinstance(handler, QueueHandler) and "_handle" not in handler.__dict__:
+            # Slow down the thread of this worker, so that its records are still queued when the worker exits
+            def slow_handle(record, handle=handler._handle):
+                time.sleep(0.2)
+                handle(record)
+            handler._handle = slow_handle
+    logger.error("Test worker error %d", i_task)
+    return os.getpid()
+
+
+class TestLogErrorUtils(BaseTest):
+
+    def test_initialize_logger_once(self):
+        logger = initialize_logger("test_logger", self.config.out.FOLDER_LOGS)
+        n_handlers = len(logger.handlers)
+        assert initialize_logger("test_logger", self.config.out.FOLDER_LOGS) is logger
+        assert len(logger.handlers) == n_handlers
+        # Loggers of different names share the same handlers
+        other_logger = initialize_logger("test_other_logger", self.config.out.FOLDER_LOGS)
+        assert other_logger.handlers == logger.handlers
+
+    def test_set_loggers_level(self):
+        logger = initialize_logger("test_logger", self.config.out.FOLDER_LOGS)
+        set_loggers_level("WARNING")
+        assert logger.level == logging.WARNING
+        set_loggers_level(logging.DEBUG)
+        assert logger.level == logging.DEBUG
+
+    def test_queue_handler(self):
+        logger = initialize_logger("test_queue_logger", self.config.out.FOLDER_TEMP)
+        logger.info("Test message %d", 1)
+        logger.error("Test error")
+        for handler in logger.handlers:
+            if isinstance(handler, QueueHandler):
+                # Closing waits for the queued records to be written
+                handler.close()
+                logger.removeHandler(handler)
+        with open(os.path.join(self.config.out.FOLDER_TEMP, "logs.log")) as log_file:
+            logs = log_file.read()
+        assert "Test message 1" in logs
+        assert "Test error" in logs
+        with open(os.path.join(self.config.out.FOLDER_TEMP, "log_errors.log")) as log_file:
+            assert "Test message" not in log_file.read()
+
+    def test_queue_handler_pool_workers(self):
+        target_folder = os.path.join(self.config.out.FOLDER_TEMP, "workers_logs")
+        pool = Pool(2)
+        try:
+            pids = pool.map(_log_from_worker, [(target_folder, i_task) for i_task in range(4)])
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        assert os.getpid() not in pids
+        # The workers write their queued records before they exit
+        with open(os.path.join(target_folder, "log_errors.log")) as log_file:
+            logs = log_file.read()
+        for i_task in range(4):
+            assert "Test worker error %d" % i_task in logs
+        shutil.rmtree(target_folder)
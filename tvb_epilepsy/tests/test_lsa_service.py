@@ -0,0 +1,110 @@
+import numpy
+from tvb_epilepsy.base.computations.calculations_utils import calc_fz_jac_square_taylor, \
+    calc_fz_jac_square_taylor_batch
+from tvb_epilepsy.service.hypothesis_builder import HypothesisBuilder
+from tvb_epilepsy.service.lsa_service import LSAService
+from tvb_epilepsy.service.model_configuration_builder import ModelConfigurationBuilder
+from tvb_epilepsy.tests.base import BaseTest
+
+
+class TestLSAService(BaseTest):
+    n_samples = 3
+
+    def _prepare_model_configuration(self):
+        connectivity = self._prepare_dummy_head().connectivity
+        hypothesis = HypothesisBuilder(connectivity.number_of_regions, self.config).set_x0_hypothesis(
+            [1, 2], [0.8, 0.7]).set_e_hypothesis([10], [0.9]).build_hypothesis()
+        model_configuration = ModelConfigurationBuilder(connectivity.number_of_regions).build_model_from_hypothesis(
+            hypothesis, connectivity.normalized_weights)
+        for attr in ["x1EQ", "zEQ", "K"]:
+            setattr(model_configuration, attr, getattr(model_configuration, attr).astype("float64"))
+        return hypothesis, model_configuration
+
+    def _stack(self, values):
+        return numpy.tile(values, (self.n_samples, 1))
+
+    def test_calc_fz_jac_square_taylor_batch(self):
+        model_configuration = self._prepare_model_configuration()[1]
+        zEQ = self._stack(model_configuration.zEQ) + numpy.array([[0.0], [0.01], [0.02]])
+        jacobians = calc_fz_jac_square_taylor_batch(zEQ, model_configuration.yc, model_configuration.Iext1,
+                                                    model_configuration.K, model_configuration.model_connectivity)
+
+        for isample in range(self.n_samples):
+            assert numpy.allclose(jacobians[isample],
+                                  calc_fz_jac_square_taylor(zEQ[isample], model_configuration.yc,
+                                                            model_configuration.Iext1, model_configuration.K,
+                                                            model_configuration.model_connectivity))
+
+    def test_run_lsa_batch(self):
+        hypothesis, model_configuration = self._prepare_model_configuration()
+        lsa_service = LSAService()
+        lsa_hypothesis = lsa_service.run_lsa(hypothesis, model_configuration)
+
+        eigen_values, eigen_vectors, eigen_vectors_number, lsa_propagation_strengths, elbows = \
+            LSAService().run_lsa_batch(self._stack(model_configuration.zEQ), self._stack(model_configuration.K),
+                                       self._stack(model_configuration.x1EQ), model_configuration.model_connectivity)
+
+        n_regions = hypothesis.number_of_regions
+        assert eigen_vectors.shape == (self.n_samples, n_regions, n_regions)
+        for isample in range(self.n_samples):
+            # run_lsa() normalizes in place the eigenvalues used as weights:
+            assert numpy.allclose(eigen_values[isample, eigen_vectors_number[isample]:],
+                                  lsa_service.eigen_values[lsa_service.eigen_vectors_number:])
+            assert eigen_vectors_number[isample] == lsa_service.eigen_vectors_number
+            propagation_indices = lsa_propagation_strengths[isample].argsort()[-elbows[isample]:]
+            assert numpy.all(numpy.sort(propagation_indices) == numpy.sort(lsa_hypothesis.lsa_propagation_indices))
+
+    def _prepare_ring_model_configuration(self, n_regions, x0_indices, x0_values):
+        # A sparse, symmetric, ring connectivity:
+        model_connectivity = numpy.roll(numpy.eye(n_regions), 1, axis=1) + numpy.roll(numpy.eye(n_regions), -1, axis=1)
+        hypothesis = HypothesisBuilder(n_regions, self.config).set_x0_hypothesis(x0_indices, x0_values).\
+            build_hypothesis()
+        model_configuration = ModelConfigurationBuilder(n_regions).build_model_from_hypothesis(hypothesis,
+                                                                                               model_connectivity)
+        return hypothesis, model_configuration
+
+    def _run_lsa_full_and_leading(self, hypothesis, model_configuration, eigen_vectors_number):
+        lsa_services = []
+        lsa_hypotheses = []
+        for eigen_solver in ["full", "leading"]:
+            lsa_services.append(LSAService(eigen_vectors_number=eigen_vectors_number, eigen_solver=eigen_solver))
+            lsa_hypotheses.append(lsa_services[-1].run_lsa(hypothesis, model_configuration))
+        return lsa_services, lsa_hypotheses
+
+    def _assert_leading_eigen_vectors(self, lsa_services, eigen_vectors_number):
+        lsa_service, lsa_service_leading = lsa_services
+        assert lsa_service_leading.eigen_vectors.shape == (lsa_service.eigen_vectors.shape[0], eigen_vectors_number)
+        assert numpy.allclose(lsa_service_leading.eigen_values, lsa_service.eigen_values[:eigen_vectors_number])
+        # Eigenvectors are equal, including their sign:
+        assert numpy.allclose(lsa_service_leading.eigen_vectors, lsa_service.eigen_vectors[:, :eigen_vectors_number])
+
+    def test_run_lsa_leading_eigen_solver_symmetric(self):
+        # Identical regions lead to a symmetric Jacobian
+        hypothesis, model_configuration = self._prepare_ring_model_configuration(30, [], [])
+        lsa_services = self._run_lsa_full_and_leading(hypothesis, model_configuration, 1)[0]
+        self._assert_leading_eigen_vectors(lsa_services, 1)
+
+    def test_run_lsa_leading_eigen_solver_sparse(self):
+        n_regions = 60
+        hypothesis, model_configuration = \
+            self._prepare_ring_model_configuration(n_regions, range(0, n_regions, 2),
+                                                   numpy.linspace(0.1, 0.9, n_regions / 2))
+        lsa_services = self._run_lsa_full_and_leading(hypothesis, model_configuration, 3)[0]
+        self._assert_leading_eigen_vectors(lsa_services, 3)
+
+        lsa_hypotheses = self._run_lsa_full_and_leading(hypothesis, model_configuration, 1)[1]
+        assert numpy.all(numpy.sort(lsa_hypotheses[0].lsa_propagation_indices) ==
+                         numpy.sort(lsa_hypotheses[1].lsa_propagation_indices))
+
+    def test_run_lsa_leading_eigen_solver_propagation_strengths(self):
+        n_regions = 60
+        hypothesis, model_configuration = \
+            self._prepare_ring_model_configuration(n_regions, range(0, n_regions, 2),
+                                                   numpy.linspace(0.1, 0.9, n_regions / 2))
+        # The sums of more than one eigenvector are the same for both solvers
+        for eigen_vectors_number in [3, 5]:
+            lsa_hypotheses = self._run_lsa_full_and_leading(hypothesis, model_configuration, eigen_vectors_number)[1]
+            assert numpy.allclose(lsa_hypotheses[0].lsa_propagation_strengths,
+                                  lsa_hypotheses[1].lsa_propagation_strengths)
+            assert numpy.all(numpy.sort(lsa_hypotheses[0].lsa_propagation_indices) ==
+                             numpy.sort(lsa_hypotheses[1].lsa_propagation_indices))
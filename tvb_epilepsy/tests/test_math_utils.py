@@ -0,0 +1,21 @@
+import numpy
+from tvb_epilepsy.base.computations.math_utils import compute_gain_matrix
+from tvb_epilepsy.tests.base import BaseTest
+
+
+class TestMathUtils(BaseTest):
+
+    def test_compute_gain_matrix(self):
+        random_state = numpy.random.RandomState(0)
+        locations1 = 30.0 * random_state.randn(7, 3)
+        locations2 = 30.0 * random_state.randn(50, 3)
+        expected = numpy.zeros((7, 50))
+        for i1 in range(7):
+            for i2 in range(50):
+                expected[i1, i2] = 1.0 / numpy.sum((locations1[i1] - locations2[i2]) ** 2)
+
+        assert numpy.array_equal(compute_gain_matrix(locations1, locations2, normalize=None, ceil=None), expected)
+        expected /= numpy.percentile(expected, 95)
+        expected[expected > 1.0] = 1.0
+        for chunk_size in [None, 1, 3, 100]:
+            assert numpy.array_equal(compute_gain_matrix(locations1, locations2, chunk_size=chunk_size), expected)
@@ -0,0 +1,118 @@
+import os
+import shutil
+import numpy
+from tvb_epilepsy.io.h5_reader import H5Reader
+from tvb_epilepsy.io.head_cache import read_cached_head
+from tvb_epilepsy.service.hypothesis_builder import HypothesisBuilder
+from tvb_epilepsy.service.lsa_service import LSAService
+from tvb_epilepsy.service.model_configuration_builder import ModelConfigurationBuilder
+from tvb_epilepsy.service.pse.lsa_pse_service import LSAPSEService
+from tvb_epilepsy.service.pse.simulation_pse_service import SimulationPSEService
+from tvb_epilepsy.service.simulator_builder import SimulatorBuilder
+from tvb_epilepsy.tests.base import BaseTest
+
+
+class TestPSEService(BaseTest):
+    n_samples = 6
+
+    def _prepare_lsa_pse(self):
+        connectivity = self._prepare_dummy_head().connectivity
+        hypothesis = HypothesisBuilder(connectivity.number_of_regions, self.config).set_x0_hypothesis(
+            [1, 2], [0.8, 0.7]).set_e_hypothesis([10], [0.9]).build_hypothesis()
+        random_state = numpy.random.RandomState(0)
+        params_pse = []
+        for ii, x0_value in enumerate(hypothesis.x0_values):
+            params_pse.append({"path": "hypothesis.x0_values", "indices": [ii],
+                               "samples": x0_value + 0.03 * random_state.randn(self.n_samples)})
+        return LSAPSEService(hypothesis=hypothesis, params_pse=params_pse), connectivity.normalized_weights
+
+    def test_run_pse_parallel(self):
+        pse, conn_matrix = self._prepare_lsa_pse()
+        lsa_service = LSAService()
+        results, execution_status = pse.run_pse(conn_matrix, False, None, lsa_service)
+        results_parallel, execution_status_parallel = pse.run_pse_parallel(conn_matrix, False, 2, None, lsa_service)
+
+        assert len(results_parallel) == self.n_samples
+        assert all(execution_status)
+        assert execution_status_parallel == execution_status
+        for result, result_parallel in zip(results, results_parallel):
+            assert numpy.allclose(result["lsa_propagation_strengths"], result_parallel["lsa_propagation_strengths"])
+            assert numpy.allclose(result["x1EQ"], result_parallel["x1EQ"])
+
+    def test_run_pse_parallel_cached_head(self):
+        pse, conn_matrix = self._prepare_lsa_pse()
+        cache_folder = os.path.join(self.config.out.FOLDER_TEMP, "pse_head_cache")
+        try:
+            # The workers map the connectivity of the cached head, instead of receiving a copy of it
+            cached_conn_matrix = read_cached_head(H5Reader(), self.config.input.HEAD,
+                                                  cache_folder).connectivity.normalized_weights
+            assert isinstance(cached_conn_matrix, numpy.memmap)
+            results, execution_status = pse.run_pse(conn_matrix, False, None, LSAService())
+            results_parallel, execution_status_parallel = \
+                pse.run_pse_parallel(cached_conn_matrix, False, 2, None, LSAService())
+        finally:
+            shutil.rmtree(cache_folder, ignore_errors=True)
+
+        assert execution_status_parallel == execution_status
+        for result, result_parallel in zip(results, results_parallel):
+            assert numpy.allclose(result["lsa_propagation_strengths"], result_parallel["lsa_propagation_strengths"])
+
+    def test_run_pse_copy_free(self):
+        pse, conn_matrix = self._prepare_lsa_pse()
+        lsa_service = LSAService(eigen_vectors_number=None)
+        model_configuration_builder = ModelConfigurationBuilder(conn_matrix.shape[0])
+        results, execution_status = pse.run_pse(conn_matrix, False, model_configuration_builder, lsa_service)
+        x0_values = numpy.array(pse.hypothesis.x0_values)
+        pse.copy_free = True
+        results_copy_free, execution_status_copy_free = \
+            pse.run_pse(conn_matrix, False, model_configuration_builder, lsa_service)
+
+        assert execution_status_copy_free == execution_status
+        for result, result_copy_free in zip(results, results_copy_free):
+            assert numpy.allclose(result["lsa_propagation_strengths"], result_copy_free["lsa_propagation_strengths"])
+            assert numpy.allclose(result["x0_values"], result_copy_free["x0_values"])
+        # The objects of the PSE are rolled back after every loop
+        assert numpy.array_equal(pse.hypothesis.x0_values, x0_values)
+        assert lsa_service.eigen_vectors_number is None
+        assert len(lsa_service.eigen_values) == 0
+
+    def test_run_pse_batch(self):
+        pse, conn_matrix = self._prepare_lsa_pse()
+        lsa_service = LSAService()
+        results, execution_status = pse.run_pse(conn_matrix, False, None, lsa_service)
+        results_batch, execution_status_batch = pse.run_pse_batch(conn_matrix, False, None, lsa_service)
+
+        assert execution_status_batch == execution_status
+        for result, result_batch in zip(results, results_batch):
+            assert numpy.allclose(result["x1EQ"], result_batch["x1EQ"])
+            assert numpy.allclose(result["lsa_propagation_strengths"], result_batch["lsa_propagation_strengths"])
+
+    def test_run_simulation_pse_parallel(self):
+        connectivity = self._prepare_dummy_head().connectivity
+        hypothesis = HypothesisBuilder(connectivity.number_of_regions, self.config).set_x0_hypothesis(
+            [1, 2], [0.8, 0.7]).build_hypothesis()
+        random_state = numpy.random.RandomState(0)
+        params_pse = [{"path": "hypothesis.x0_values", "indices": [1],
+                       "samples": 0.8 + 0.05 * random_state.randn(4)}]
+        conn_matrix = connectivity.normalized_weights
+        simulator_builder = SimulatorBuilder().set_model_name("EpileptorDP2D").set_simulated_period(20.0)
+        pse = SimulationPSEService(None, params_pse, output_mode="features")
+        model_configuration = pse.update_hypo_model_config(hypothesis, pse.params_vals[0], conn_matrix)[1]
+        pse.simulator = simulator_builder.build_simulator(model_configuration, connectivity)[0]
+        results, execution_status = pse.run_pse(conn_matrix, False, hypothesis)
+        results_parallel, execution_status_parallel = pse.run_pse_parallel(conn_matrix, False, 2, hypothesis)
+        pse.copy_free = True
+        results_copy_free = pse.run_pse(conn_matrix, False, hypothesis)[0]
+
+        assert all(execution_status)
+        assert execution_status_parallel == execution_status
+        for result, result_parallel in zip(results, results_parallel):
+            assert result["execution_time"] > 0.0
+            assert numpy.allclose(result["features"]["max"], result_parallel["features"]["max"])
+        for result, result_copy_free in zip(results, results_copy_free):
+            assert numpy.allclose(result["features"]["max"], result_copy_free["features"]["max"])
+        # The simulator updated in place gives the same results as a simulator configured from scratch
+        pse_model_configuration = pse.update_hypo_model_config(hypothesis, pse.params_vals[-1], conn_matrix)[1]
+        time, data, _ = simulator_builder.build_simulator(pse_model_configuration, connectivity)[0].launch_simulation()
+        assert numpy.allclose(results[-1]["features"]["max"], numpy.max(data, axis=0))
+        assert numpy.allclose(results[-1]["features"]["mean"], numpy.mean(data, axis=0))
@@ -0,0 +1,53 @@
+import os
+import numpy
+from tvb_epilepsy.io.rdump import rdump, rload, json_dump, json_load
+from tvb_epilepsy.tests.base import BaseTest
+
+
+class TestRDump(BaseTest):
+
+    data = {"signals": numpy.random.normal(size=(20, 3)), "time": numpy.arange(20) * 0.1,
+            "mixing": numpy.random.uniform(size=(3, 2, 4)), "n_times": 20, "sig": 0.1, "DEBUG": True,
+            "nans": numpy.array([1.0, numpy.nan, numpy.inf, -numpy.inf])}
+
+    def _assert_data(self, loaded):
+        assert set(loaded.keys()) == set(self.data.keys())
+        for key, val in self.data.iteritems():
+            assert numpy.array_equal(numpy.nan_to_num(loaded[key]), numpy.nan_to_num(val))
+
+    def test_rdump(self):
+        path = os.path.join(self.config.out.FOLDER_TEMP, "ModelData.R")
+        assert rdump(path, self.data)
+        self._assert_data(rload(path))
+
+    def test_json_dump(self):
+        path = os.path.join(self.config.out.FOLDER_TEMP, "ModelData.json")
+        assert json_dump(path, self.data)
+        self._assert_data(json_load(path))
+
+    def test_json_dump_single_element_arrays(self):
+        path = os.path.join(self.config.out.FOLDER_TEMP, "ModelDataSingle.json")
+        data = {"vector": numpy.array([0.5]), "matrix": numpy.array([[2]]), "scalar": numpy.array(3.0)}
+        json_dump(path, data)
+        with open(path, "r") as fd:
+            text = fd.read()
+        assert '"vector": [0.5]' in text
+        assert '"matrix": [[2]]' in text
+        assert '"scalar": 3.0' in text
+        loaded = json_load(path)
+        for key, val in data.iteritems():
+            assert numpy.shape(loaded[key]) == val.shape
+            assert numpy.array_equal(loaded[key], val)
+
+    def test_rdump_cache(self):
+        path = os.path.join(self.config.out.FOLDER_TEMP, "ModelDataCached.R")
+        assert rdump(path, self.data, cache=True)
+        # Unchanged data are not rewritten
+        assert not rdump(path, dict(self.data), cache=True)
+        data = dict(self.data)
+        data["sig"] = 0.2
+        assert rdump(path, data, cache=True)
+        assert rload(path)["sig"] == 0.2
+        # Writing without cache invalidates it
+        assert rdump(path, self.data)
+        assert rdump(path, data, cache=True)
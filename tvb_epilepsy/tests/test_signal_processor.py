@@ -0,0 +1,20 @@
+import numpy
+from tvb_epilepsy.base.computations.analyzers_utils import filtfilt_data
+from tvb_epilepsy.service.signal_processor import project_signals
+from tvb_epilepsy.tests.base import BaseTest
+
+
+class TestSignalProcessor(BaseTest):
+
+    def test_project_signals(self):
+        signals = numpy.random.normal(size=(5000, 6))
+        gain_matrix = numpy.random.uniform(size=(4, 6))
+        blocks = list(project_signals(signals, gain_matrix))
+        assert len(blocks) == 1
+        assert numpy.allclose(blocks[0][1], signals.dot(gain_matrix.T))
+        expected = filtfilt_data(signals.dot(gain_matrix.T), 1000.0, 10.0, 400.0, axis=0)
+        projected = numpy.empty(expected.shape)
+        for start, block in project_signals(signals, gain_matrix, 1000.0, 10.0, 400.0, block_length=1200):
+            assert block.shape[1] == 4
+            projected[start:start + block.shape[0]] = block
+        assert numpy.allclose(projected, expected)
@@ -1,9 +1,12 @@
 # coding=utf-8
 
-import numpy as np
+import os
+import numpy
+from tvb.simulator import noise
 from tvb_epilepsy.service.hypothesis_builder import HypothesisBuilder
 from tvb_epilepsy.service.model_configuration_builder import ModelConfigurationBuilder
 from tvb_epilepsy.service.simulator_builder import SimulatorBuilder
+from tvb_epilepsy.io.h5_reader import H5Reader
 from tvb_epilepsy.io.tvb_data_reader import TVBReader
 from tvb_epilepsy.tests.base import BaseTest
 
@@ -13,7 +16,7 @@ class TestSimulationRun(BaseTest):
     time_length = 30.0
     report_every_n_monitor_steps = 10.0
 
-    zmode = np.array("lin")
+    zmode = numpy.array("lin")
     epileptor_model = "EpileptorDP2D"
     noise_intensity = 10 ** -8
 
@@ -34,6 +37,89 @@ class TestSimulationRun(BaseTest):
         ttavg, tavg_data, status = simulator.launch_simulation(100)
         assert status == True
 
+    def test_tvb_simulation_to_h5(self):
+        connectivity = H5Reader().read_connectivity(os.path.join(self.config.input.HEAD, "Connectivity.h5"))
+        model_configuration = self._prepare_model_for_simulation(connectivity)
+
+        simulator_builder = SimulatorBuilder().set_model_name("EpileptorDP2D").set_simulated_period(20.0)
+        simulator, _, _ = simulator_builder.build_simulator(model_configuration, connectivity)
+        ttavg, tavg_data, status = simulator.launch_simulation(10)
+        assert status == True
+
+        simulator, _, _ = simulator_builder.build_simulator(model_configuration, connectivity)
+        h5_path = os.path.join(self.config.out.FOLDER_TEMP, "TestSimulation.h5")
+        h5_ttavg, h5_tavg_data, status = simulator.launch_simulation(10, output_path=h5_path, compression="gzip",
+                                                                     buffer_length=7)
+        assert status == True
+        assert h5_tavg_data.maxshape[0] is None
+        assert h5_tavg_data.shape == tavg_data.shape
+        assert numpy.allclose(h5_ttavg[:], ttavg)
+        # The data streamed to the file are the ones of the same simulation in memory
+        assert numpy.allclose(h5_tavg_data[:], tavg_data)
+        h5_tavg_data.file.close()
+
+    def test_numpy_simulation(self):
+        connectivity = H5Reader().read_connectivity(os.path.join(self.config.input.HEAD, "Connectivity.h5"))
+        model_configuration = self._prepare_model_for_simulation(connectivity)
+
+        simulator_builder = SimulatorBuilder("numpy").set_model_name("EpileptorDP2D").set_simulated_period(20.0)
+        simulator, _, model = simulator_builder.build_simulator(model_configuration, connectivity,
+                                                                noise_intensity=0.0)
+        ttavg, tavg_data, status = simulator.launch_simulation(10)
+        assert status == True
+        assert tavg_data.shape == (ttavg.size, len(model.variables_of_interest), connectivity.number_of_regions, 1)
+
+        # A batch of the same parameters reproduces the single simulation for every member of the batch
+        x0 = numpy.array(model.x0).flatten()
+        simulator, _, _ = simulator_builder.build_simulator(model_configuration, connectivity, noise_intensity=0.0,
+                                                            batch_parameters={"x0": numpy.tile(x0, (3, 1))})
+        batch_ttavg, batch_tavg_data, status = simulator.launch_simulation()
+        assert status == True
+        assert numpy.allclose(batch_ttavg, ttavg)
+        assert batch_tavg_data.shape[3] == 3
+        for ib in range(3):
+            assert numpy.allclose(batch_tavg_data[:, :, :, ib], tavg_data[:, :, :, 0])
+
+        # Variables of interest may also be expressions of the state variables
+        simulator, _, model = simulator_builder.build_simulator(model_configuration, connectivity,
+                                                                noise_intensity=0.0)
+        model.variables_of_interest = ["x1", "z", "z - x1"]
+        vois_ttavg, vois_tavg_data, status = simulator.launch_simulation()
+        assert status == True
+        assert numpy.allclose(vois_tavg_data[:, :2], tavg_data[:, :2])
+        assert numpy.allclose(vois_tavg_data[:, 2], tavg_data[:, 1] - tavg_data[:, 0])
+
+    def test_numpy_vs_tvb_simulation(self):
+        connectivity = H5Reader().read_connectivity(os.path.join(self.config.input.HEAD, "Connectivity.h5"))
+        model_configuration = self._prepare_model_for_simulation(connectivity)
+
+        numpy_simulator, numpy_sim_settings, _ = \
+            SimulatorBuilder("numpy").set_model_name("EpileptorDP2D").set_simulated_period(20.0). \
+                build_simulator(model_configuration, connectivity, noise_intensity=0.0)
+        tvb_simulator, tvb_sim_settings, _ = \
+            SimulatorBuilder().set_model_name("EpileptorDP2D").set_simulated_period(20.0). \
+                build_simulator(model_configuration, connectivity, noise=noise.Additive(nsig=numpy.array([0.0])))
+        assert numpy_sim_settings.integration_step == tvb_simulator.simTVB.integrator.dt
+        assert numpy_sim_settings.monitor_sampling_period == tvb_sim_settings.monitor_sampling_period
+
+        # Start both away from the equilibrium point, so that the two runs follow some dynamics
+        initial_conditions = numpy_simulator.initial_conditions[0].copy()
+        initial_conditions[0] += 0.5
+        numpy_simulator.configure_initial_conditions(initial_conditions)
+        tvb_simulator.configure_initial_conditions(
+            numpy.tile(initial_conditions[numpy.newaxis, :, :, numpy.newaxis],
+                       (tvb_simulator.simTVB.good_history_shape[0], 1, 1, 1)))
+
+        numpy_ttavg, numpy_tavg_data, status = numpy_simulator.launch_simulation()
+        assert status == True
+        tvb_ttavg, tvb_tavg_data, status = tvb_simulator.launch_simulation()
+        assert status == True
+        assert numpy.allclose(numpy_ttavg, tvb_ttavg)
+        assert numpy_tavg_data.shape == tvb_tavg_data.shape
+        assert numpy.max(numpy.abs(tvb_tavg_data[-1] - tvb_tavg_data[0])) > 0.5
+        # Euler-Maruyama (SimulatorNumPy) vs Heun (TVB) integration differ by O(dt)
+        assert numpy.allclose(numpy_tavg_data, tvb_tavg_data, atol=0.05)
+
     # This can be ran only locally for the moment
 
     # def test_custom_simulation(self):
@@ -0,0 +1,27 @@
+# coding=utf-8
+
+import numpy as np
+from tvb_epilepsy.base.constants.config import Config
+from tvb_epilepsy.base.utils.log_error_utils import initialize_logger
+from tvb_epilepsy.base.epileptor_models import EpileptorDP, EpileptorDPrealistic, EpileptorDP2D
+from tvb_epilepsy.base.computations.epileptor_kernels import NUMBA_IMPORT, benchmark_dfun
+
+
+def main_dfun_benchmark(config=Config(), n_regions=88, n_evaluations=10000):
+    logger = initialize_logger(__name__, config.out.FOLDER_LOGS)
+    if not NUMBA_IMPORT:
+        logger.warning("\nnumba is not installed! Only the numpy dfun backend is available.")
+    for model_class in [EpileptorDP2D, EpileptorDP, EpileptorDPrealistic]:
+        # A single simulation and a batch of 100 simulations (e.g., of SimulatorNumPy):
+        for n_modes in [1, 100]:
+            model = model_class()
+            model.x0 = np.linspace(-2.5, -1.5, n_regions).reshape((n_regions, 1))
+            results = benchmark_dfun(model, n_regions, n_modes, n_evaluations)
+            logger.info("\n" + model._ui_name + ", state of shape " + str((model._nvar, n_regions, n_modes)) + ":" +
+                        "".join(["\n" + backend + ": " + str(1000000 * result["time"]) + " usecs per evaluation" +
+                                 ", max abs difference: " + str(result["max_abs_diff"])
+                                 for backend, result in results.iteritems()]))
+
+
+if __name__ == "__main__":
+    main_dfun_benchmark()
@@ -211,7 +211,7 @@ def main_fit_sim_hyplsa(ep_name="ep_l_frontal_complex", stats_model_name="vep_sd
             region_mode = "all"
         # -------------------------- Fit and get estimates: ------------------------------------------------------------
         ests, samples, summary = stan_service.fit(debug=0, simulate=0, model_data=model_data, merge_outputs=False,
-                                                  chains=1, refresh=1, num_warmup=5, num_samples=5,
+                                                  chains=4, refresh=1, num_warmup=5, num_samples=5,
                                                   max_depth=7, delta=0.8, **kwargs)
         writer.write_generic(ests, config.out.FOLDER_RES, hyp.name + "_fit_est.h5")
         writer.write_generic(samples, config.out.FOLDER_RES, hyp.name + "_fit_samples.h5")
@@ -1,9 +1,7 @@
 # coding=utf-8
 
 import numpy as np
-from copy import deepcopy
 from tvb_epilepsy.base.constants.config import Config
-from tvb_epilepsy.io.h5_model import read_h5_model
 from tvb_epilepsy.base.utils.data_structures_utils import assert_equal_objects
 from tvb_epilepsy.base.utils.log_error_utils import initialize_logger
 from tvb_epilepsy.io.h5_writer import H5Writer
@@ -21,7 +19,6 @@ def main_h5_model(config=Config()):
     logger.info("Reading from: %s", config.input.HEAD)
     head = reader.read_head(config.input.HEAD)
 
-    empty_hypothesis = HypothesisBuilder().build_hypothesis()
     x0_indices = [20]
     x0_values = [0.9]
     e_indices = [70]
@@ -40,22 +37,13 @@ def main_h5_model(config=Config()):
     logger.info("Writing object to h5 file...")
     writer.write_generic(obj, config.out.FOLDER_RES, "test_h5_model.h5")
 
-    h5_model1 = read_h5_model(config.out.FOLDER_RES + "/test_h5_model.h5")
-    obj1 = h5_model1.convert_from_h5_model(deepcopy(obj))
+    obj1 = H5Reader().read_generic(config.out.FOLDER_RES + "/test_h5_model.h5")
 
     if assert_equal_objects(obj, obj1):
         logger.info("Read identical object: %s", obj1)
     else:
         logger.error("Comparison failed!: %s", obj1)
 
-    h5_model2 = read_h5_model(config.out.FOLDER_RES + "/test_h5_model.h5")
-    obj2 = h5_model2.convert_from_h5_model(obj={"DiseaseHypothesis": empty_hypothesis})
-
-    if assert_equal_objects(obj, obj2):
-        logger.info("Read object as dictionary: %s", obj2)
-    else:
-        logger.error("Comparison failed!: %s", obj2)
-
 
 if __name__ == "__main__":
     main_h5_model()
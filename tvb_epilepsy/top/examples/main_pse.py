@@ -15,7 +15,9 @@ def main_pse(config=Config()):
     # -------------------------------Reading data-----------------------------------
     reader = Reader()
     writer = H5Writer()
-    head = reader.read_head(config.input.HEAD)
+    # The PSE workers share the memory-mapped connectivity of the cached head
+    head = reader.read_head(config.input.HEAD, use_cache=True,
+                            cache_folder=os.path.join(config.out.FOLDER_TEMP, "head_cache"))
     logger = initialize_logger(__name__, config.out.FOLDER_LOGS)
 
     # --------------------------Manual Hypothesis definition-----------------------------------
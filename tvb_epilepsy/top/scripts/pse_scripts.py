@@ -111,7 +111,16 @@ def pse_from_lsa_hypothesis(lsa_hypothesis, model_connectivity, region_labels,
     # pse_results, execution_status = pse_old.run_pse(model_connectivity, grid_mode=False, lsa_service_input=lsa_service,
     #                                             model_configuration_builder_input=model_configuration_builder)
     pse = LSAPSEService(hypothesis=lsa_hypothesis, params_pse=pse_params_list)
-    pse_results, execution_status = pse.run_pse(model_connectivity, False, model_configuration_builder, lsa_service)
+    n_processes = kwargs.get("n_processes", 1)
+    if kwargs.get("batch_mode", False):
+        pse_results, execution_status = pse.run_pse_batch(model_connectivity, False, model_configuration_builder,
+                                                          lsa_service)
+    elif n_processes == 1:
+        pse_results, execution_status = pse.run_pse(model_connectivity, False, model_configuration_builder,
+                                                    lsa_service)
+    else:
+        pse_results, execution_status = pse.run_pse_parallel(model_connectivity, False, n_processes,
+                                                             model_configuration_builder, lsa_service)
     # Call to new PSEService:
     # pse = LSAPSEService(lsa_hypothesis, pse_params_list)
     # pse_results, execution_status = pse.run_pse(model_connectivity, False, lsa_service, model_configuration_builder)
@@ -1,62 +1,110 @@
+import re
 import numpy as np
-from scipy.signal import decimate
+from scipy.sparse import lil_matrix
+from scipy.signal import decimate, detrend
 from scipy.stats import zscore
+from tvb_epilepsy.base.utils.log_error_utils import initialize_logger
 from tvb_epilepsy.plot.plotter import Plotter
-from tvb_epilepsy.base.computations.analyzers_utils import filter_data
+from tvb_epilepsy.base.computations.analyzers_utils import BlockFilter, BlockDecimator, running_sum
+
+
+logger = initialize_logger(__name__)
+
+
+def bipolar_montage(channels):
+    """
+    Bipolar derivations of consecutive contacts of the same electrode, e.g., "A1-A2"
+    :param channels: list of contacts' labels, in the order of the data columns
+    :return: bipolar labels, and sparse matrix (contacts x bipolar channels) such that bipolar_data = data * matrix
+    """
+    bipolar_channels = []
+    bipolar_ch_inds = []
+    for iS in range(len(channels) - 1):
+        contact = re.match(r"(\D+)(\d+)", channels[iS])
+        next_contact = re.match(r"(\D+)(\d+)", channels[iS + 1])
+        if contact is not None and next_contact is not None and contact.group(1) == next_contact.group(1) \
+                and int(contact.group(2)) == int(next_contact.group(2)) - 1:
+            bipolar_channels.append(channels[iS] + "-" + channels[iS + 1])
+            bipolar_ch_inds.append(iS)
+    montage = lil_matrix((len(channels), len(bipolar_ch_inds)))
+    for iB, iS in enumerate(bipolar_ch_inds):
+        montage[iS, iB] = 1.0
+        montage[iS + 1, iB] = -1.0
+    return bipolar_channels, montage.tocsc()
 
 
 def prepare_seeg_observable(seeg_path, on_off_set, channels, win_len=5.0, low_freq=10.0, high_freq=None, log_flag=True,
-                            plot_flag=False):
-    import re
-    from pylab import detrend_linear
+                            plot_flag=False, fs=128.0, block_len=10.0, pad_len=None):
+    """
+    Reads the selected channels of an EDF file, only within the seizure's on/off set window, in blocks of time,
+    and computes a bipolar, filtered and smoothed log-envelope of them, to be fitted as observation.
+    :param fs: target sampling frequency (the recording is decimated by the integer factor closest to it)
+    :param block_len: duration (sec) of the blocks of data read and filtered at once
+    :param pad_len: duration (sec) read before the window, for the filters to settle (default: win_len)
+    :return: observation, times, sampling frequency of the observation
+    """
     from mne.io import read_raw_edf
-    raw_data = read_raw_edf(seeg_path, preload=True)
+    if high_freq is None:
+        high_freq = 60.0
+    if pad_len is None:
+        pad_len = win_len
+    raw_data = read_raw_edf(seeg_path, preload=False)
     rois = np.where([np.in1d(s.split("POL ")[-1], channels) for s in raw_data.ch_names])[0]
-    raw_data.resample(128.0)
-    fs = raw_data.info['sfreq']
-    data, times = raw_data[:, :]
-    data = data[rois].T
-    plotter = Plotter()
+    channels = [raw_data.ch_names[iS].split("POL ")[-1] for iS in rois]
+    raw_fs = raw_data.info['sfreq']
+    q = max(int(np.round(raw_fs / fs)), 1)
+    if not np.allclose(raw_fs / q, fs):
+        logger.warning("Decimating the recording from " + str(raw_fs) + " Hz by " + str(q) + " to " +
+                       str(raw_fs / q) + " Hz, instead of " + str(fs) + " Hz!")
+    fs = raw_fs / q
+    bipolar_channels, montage = bipolar_montage(channels)
+    window = (on_off_set[0] - 2 * win_len, on_off_set[1] + 2 * win_len)
+    start = max(int(np.floor((window[0] - pad_len) * raw_fs)), 0)
+    stop = min(int(np.ceil(window[1] * raw_fs)) + q + 1, raw_data.n_times)
+    block_size = max(int(np.round(block_len * raw_fs)), q)
+    # Keep the band pass filter's upper frequencies
+    decimator = BlockDecimator(raw_fs, q, cutoff=0.95)
+    bandpass = BlockFilter(fs, low_freq, high_freq, "bandpass", order=3)
     if plot_flag:
-        plotter.plot_spectral_analysis_raster(times, data, time_units="sec", freq=np.array(range(1, 51, 1)),
-                                              title='Spectral Analysis', figure_name='Spectral Analysis',
-                                              labels=channels, log_scale=True)
-    data_bipolar = []
-    bipolar_channels = []
-    data_filtered = []
-    bipolar_ch_inds = []
-    for iS in range(data.shape[1]-1):
-        if (channels[iS][0] == channels[iS+1][0]) and \
-                (int(re.findall(r'\d+', channels[iS])[0]) == int(re.findall(r'\d+', channels[iS+1])[0])-1):
-            data_bipolar.append(data[:, iS] - data[:, iS+1])
-            bipolar_channels.append(channels[iS] + "-" + channels[iS+1])
-            data_filtered.append(filter_data(data_bipolar[-1], fs, low_freq, 60.0,  "bandpass", order=3))
-            bipolar_ch_inds.append(iS)
-    data_bipolar = np.array(data_bipolar).T
-    data_filtered = np.array(data_filtered).T
-    # filter_data, times = raw_data.filter(low_freq, 100.0, picks=rois)[:, :]
+        data_decimator = BlockDecimator(raw_fs, q, cutoff=0.95)
+        data = []
+        data_bipolar = []
+        data_filtered = []
+    observation = []
+    times = []
+    for block_start in range(start, stop, block_size):
+        block_stop = min(block_start + block_size, stop)
+        block = raw_data.get_data(picks=rois, start=block_start, stop=block_stop).T
+        times.append(np.arange(block_start, block_stop)[decimator.offset::q] / raw_fs)
+        if plot_flag:
+            data.append(data_decimator(block))
+        block = decimator(montage.T.dot(block.T).T)
+        filtered = bandpass(block)
+        if plot_flag:
+            data_bipolar.append(block)
+            data_filtered.append(filtered)
+        filtered = np.abs(filtered)
+        if log_flag:
+            filtered = np.log(filtered)
+        observation.append(filtered)
+    times = np.concatenate(times)
+    observation = np.concatenate(observation)
     if plot_flag:
-        plotter.plot_spectral_analysis_raster(times, data_bipolar, time_units="sec", freq=np.array(range(1, 51, 1)),
-                                              title='Spectral Analysis', figure_name='Spectral Analysis Bipolar',
-                                              labels=bipolar_channels, log_scale=True)
-        plotter.plot_spectral_analysis_raster(times, data_filtered, time_units="sec", freq=np.array(range(1, 51, 1)),
-                                              title='Spectral Analysis_bipolar',
-                                              figure_name='Spectral Analysis Filtered', labels=bipolar_channels,
-                                              log_scale=True)
-    del data
-    t_onset = np.where(times > (on_off_set[0] - 2 * win_len))[0][0]
-    t_offset = np.where(times > (on_off_set[1] + 2 * win_len))[0][0]
-    times = times[t_onset:t_offset]
-    data_filtered = data_filtered[t_onset:t_offset]
-    observation = np.abs(data_filtered)
-    del data_filtered
-    if log_flag:
-        observation = np.log(observation)
-    for iS in range(observation.shape[1]):
-        observation[:, iS] = detrend_linear(observation[:, iS])
+        plotter = Plotter()
+        for plot_data, labels, title, figure_name in \
+                zip([data, data_bipolar, data_filtered], [channels, bipolar_channels, bipolar_channels],
+                    ['Spectral Analysis', 'Spectral Analysis', 'Spectral Analysis_bipolar'],
+                    ['Spectral Analysis', 'Spectral Analysis Bipolar', 'Spectral Analysis Filtered']):
+            plotter.plot_spectral_analysis_raster(times, np.concatenate(plot_data), time_units="sec",
+                                                  freq=np.array(range(1, 51, 1)), title=title,
+                                                  figure_name=figure_name, labels=labels, log_scale=True)
+        del data, data_bipolar, data_filtered
+    # Drop the filters' settling time
+    in_window = np.logical_and(times > window[0], times <= window[1])
+    times = times[in_window]
+    observation = detrend(observation[in_window], axis=0, type="linear")
     observation -= observation.min()
-    for iS in range(observation.shape[1]):
-        observation[:, iS] = np.convolve(observation[:, iS], np.ones((np.int(np.round(win_len * fs),))), mode='same')
+    observation = running_sum(observation, int(np.round(win_len * fs)))
     n_times = times.shape[0]
     dtimes = n_times - 4096
     t_onset = int(np.ceil(dtimes / 2.0))
@@ -1,12 +1,12 @@
 import os
 import numpy as np
 from tvb_epilepsy.base.constants.config import Config
-from tvb_epilepsy.base.utils.log_error_utils import initialize_logger
+from tvb_epilepsy.base.utils.log_error_utils import initialize_logger, raise_value_error
 from tvb_epilepsy.base.utils.data_structures_utils import ensure_list, isequal_string
-from tvb_epilepsy.base.computations.analyzers_utils import filter_data
 from tvb_epilepsy.base.model.vep.sensors import Sensors
 from tvb_epilepsy.io.h5_reader import H5Reader
 from tvb_epilepsy.io.h5_writer import H5Writer
+from tvb_epilepsy.service.signal_processor import project_signals
 from tvb_epilepsy.plot.plotter import Plotter
 from tvb_epilepsy.base.epileptor_models import EpileptorDP2D
 from tvb_epilepsy.service.simulator_builder import build_simulator_TVB_realistic, \
@@ -23,50 +23,62 @@ def prepare_vois_ts_dict(vois, data):
     return vois_ts_dict
 
 
+def _compute_seeg(signals, gain_matrix, fs=None, lowcut=None, highcut=None, block_length=None):
+    seeg = np.empty((signals.shape[0], gain_matrix.shape[0]), dtype=np.result_type(signals, gain_matrix))
+    for start, block in project_signals(signals, gain_matrix, fs, lowcut, highcut, block_length=block_length):
+        seeg[start:start + block.shape[0]] = block
+    seeg -= np.min(seeg)
+    seeg /= np.max(seeg)
+    return seeg
+
+
 def compute_seeg_and_write_ts_h5_file(folder, filename, model, vois_ts_dict, dt, time_length, hpf_flag=False,
-                                      hpf_low=10.0, hpf_high=256.0, sensors_list=[], save_flag=True):
+                                      hpf_low=10.0, hpf_high=256.0, sensors_list=[], save_flag=True,
+                                      block_length=None):
+    """
+    :param block_length: number of time points projected, filtered and written to the TS file at once
+                         (default: all of them)
+    """
     fsAVG = 1000.0 / dt
-    sensors_list = ensure_list(sensors_list)
+    sensors_list = [sensor for sensor in ensure_list(sensors_list) if isinstance(sensor, Sensors)]
     # Optionally high pass filter, and compute SEEG:
     if isinstance(model, EpileptorDP2D):
-        raw_data = np.dstack(
-            [vois_ts_dict["x1"], vois_ts_dict["z"], vois_ts_dict["x1"]])
+        raw_vois = ["x1", "z", "x1"]
         vois_ts_dict["lfp"] = vois_ts_dict["x1"]
-        idx_proj = -1
-        for sensor in sensors_list:
-            if isinstance(sensor, Sensors):
-                idx_proj += 1
-                sensor_name = sensor.s_type + '%d' % idx_proj
-                vois_ts_dict[sensor_name] = vois_ts_dict['x1'].dot(sensor.gain_matrix.T)
-                vois_ts_dict[sensor_name] -= np.min(vois_ts_dict[sensor_name])
-                vois_ts_dict[sensor_name] /= np.max(vois_ts_dict[sensor_name])
+        fs = None
     else:
+        raw_vois = ["x1", "z", "x2"]
         vois_ts_dict["lfp"] = vois_ts_dict["x2"] - vois_ts_dict["x1"]
-        raw_data = np.dstack([vois_ts_dict["x1"], vois_ts_dict["z"], vois_ts_dict["x2"]])
         if hpf_flag:
             hpf_low = max(hpf_low, 1000.0 / time_length)
             hpf_high = min(fsAVG / 2.0 - 10.0, hpf_high)
-        idx_proj = -1
-        for sensor in sensors_list:
-            if isinstance(sensor, Sensors):
-                idx_proj += 1
-                sensor_name = sensor.s_type + '%d' % idx_proj
-                vois_ts_dict[sensor_name] = vois_ts_dict['lfp'].dot(sensor.gain_matrix.T)
-                if hpf_flag:
-                    for i in range(vois_ts_dict[sensor_name].shape[1]):
-                        vois_ts_dict[sensor_name][:, i] = \
-                            filter_data(vois_ts_dict[sensor_name][:, i], fsAVG, hpf_low, hpf_high)
-                vois_ts_dict[sensor_name] -= np.min(vois_ts_dict[sensor_name])
-                vois_ts_dict[sensor_name] /= np.max(vois_ts_dict[sensor_name])
-
+            fs = fsAVG
+        else:
+            fs = None
+    sensor_names = []
+    for idx_proj, sensor in enumerate(sensors_list):
+        sensor_names.append(sensor.s_type + '%d' % idx_proj)
+        # All sensors are projected and (zero phase) filtered at once, block by block
+        vois_ts_dict[sensor_names[-1]] = _compute_seeg(vois_ts_dict["lfp"], sensor.gain_matrix, fs, hpf_low, hpf_high,
+                                                       block_length)
     if save_flag:
-        h5_writer = H5Writer()
-        h5_writer.write_ts_epi(raw_data, dt, os.path.join(folder, filename), vois_ts_dict["lfp"])
-        # Write files:
-        if idx_proj > -1:
-            for i_sensor, sensor in enumerate(sensors_list):
-                h5_writer.write_ts_seeg_epi(vois_ts_dict[sensor.s_type + '%d' % i_sensor], dt,
-                                            os.path.join(folder, filename))
+        # Each sensor set is written to its own dataset, named after its number of channels
+        seeg_datasets = ["/SeegSensors-%d" % vois_ts_dict[sensor_name].shape[1] for sensor_name in sensor_names]
+        if len(set(seeg_datasets)) < len(seeg_datasets):
+            raise_value_error("More than one sensor set would be written to the same dataset of the TS file: " +
+                              str(seeg_datasets) + "!", logger)
+        n_times = vois_ts_dict["lfp"].shape[0]
+        if block_length is None:
+            write_length = n_times
+        else:
+            write_length = max(int(block_length), 1)
+        with H5Writer().open_ts(os.path.join(folder, filename), dt, chunk_length=block_length) as ts_writer:
+            for start in range(0, n_times, write_length):
+                block = slice(start, start + write_length)
+                ts_writer.append("/data", np.dstack([vois_ts_dict[voi][block] for voi in raw_vois]))
+                ts_writer.append("/lfpdata", vois_ts_dict["lfp"][block][:, :, np.newaxis])
+                for sensor_name, seeg_dataset in zip(sensor_names, seeg_datasets):
+                    ts_writer.append(seeg_dataset, vois_ts_dict[sensor_name][block])
     return vois_ts_dict
 
 